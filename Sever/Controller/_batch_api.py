@@ -0,0 +1,95 @@
+"""OpenAI 兼容 Batch API 的最小封装（OpenAI / DashScope 均支持 /v1/chat/completions 批处理）。
+
+上传 JSONL → 创建 batch → 轮询直到结束 → 下载结果并按 custom_id 拆分。
+端点不支持批处理时返回 None，调用方回落到逐条请求。
+"""
+from __future__ import annotations
+
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_POLL_INTERVAL = 30.0
+BATCH_TERMINAL = ("completed", "failed", "expired", "cancelled")
+
+
+def build_batch_jsonl(requests: List[Tuple[str, Dict[str, Any]]]) -> bytes:
+    """requests 为 (custom_id, chat.completions 请求体) 列表。"""
+    lines = [
+        json.dumps(
+            {"custom_id": cid, "method": "POST", "url": BATCH_ENDPOINT, "body": body},
+            ensure_ascii=False,
+        )
+        for cid, body in requests
+    ]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def parse_batch_output(raw: bytes) -> Dict[str, Tuple[str, Optional[str]]]:
+    """解析结果文件：custom_id -> (回复文本, finish_reason)；失败条目不出现在结果中。"""
+    out: Dict[str, Tuple[str, Optional[str]]] = {}
+    for line in raw.splitlines():
+        if not line.strip():
+            continue
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            continue
+        resp = rec.get("response") or {}
+        if rec.get("error") or resp.get("status_code") != 200:
+            continue
+        choices = (resp.get("body") or {}).get("choices") or []
+        if not choices:
+            continue
+        content = (choices[0].get("message") or {}).get("content") or ""
+        out[str(rec.get("custom_id"))] = (content, choices[0].get("finish_reason"))
+    return out
+
+
+def run_chat_batch(
+    api_key: str,
+    base_url: str,
+    requests: List[Tuple[str, Dict[str, Any]]],
+    *,
+    tag: str = "BATCH",
+    poll_interval: float = BATCH_POLL_INTERVAL,
+) -> Optional[Dict[str, Tuple[str, Optional[str]]]]:
+    """提交一次批处理并阻塞等待结果（custom_id -> (回复文本, finish_reason)）；端点不支持 Batch API 时返回 None。"""
+    from openai import APIStatusError, OpenAI
+
+    if not requests:
+        return {}
+    client = OpenAI(api_key=api_key, base_url=base_url)
+    try:
+        try:
+            up = client.files.create(file=("batch_input.jsonl", build_batch_jsonl(requests)), purpose="batch")
+            batch = client.batches.create(
+                input_file_id=up.id,
+                endpoint=BATCH_ENDPOINT,
+                completion_window="24h",
+            )
+        except APIStatusError as e:
+            if e.status_code in (400, 404, 405, 501):
+                print(f"[{tag}] batch api not supported by endpoint ({e.status_code}), fallback", flush=True)
+                return None
+            raise
+        print(f"[{tag}] batch submitted id={batch.id} requests={len(requests)}", flush=True)
+
+        while batch.status not in BATCH_TERMINAL:
+            time.sleep(poll_interval)
+            batch = client.batches.retrieve(batch.id)
+            counts = batch.request_counts
+            if counts is not None:
+                print(
+                    f"\r[{tag}] batch status={batch.status} completed={counts.completed}/{counts.total} failed={counts.failed}",
+                    end="",
+                    flush=True,
+                )
+        print()
+        if batch.status != "completed" or not batch.output_file_id:
+            print(f"[{tag}] batch ended with status={batch.status}", flush=True)
+            return {}
+        return parse_batch_output(client.files.content(batch.output_file_id).content)
+    finally:
+        client.close()
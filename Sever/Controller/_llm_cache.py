@@ -0,0 +1,104 @@
+"""LLM 回复持久缓存：key = blake2b(系统提示词 | 模型 | 用户内容 [| 采样参数])，value 为回复文本。
+
+SQLite（WAL）落盘，进程内再叠一层小 LRU；重跑或中断续跑时相同输入直接命中，不再消耗 token。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Mapping, Optional, Union
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from config.config import DATA_ROOT  # noqa: E402
+
+CACHE_PATH = Path(DATA_ROOT) / "cache" / "llm_cache.sqlite"
+LRU_SIZE = 1024
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+_lru: "OrderedDict[str, str]" = OrderedDict()
+
+
+def make_key(
+    sys_prompt: str,
+    model: str,
+    user_content: Union[str, bytes],
+    params: Optional[Mapping[str, Any]] = None,
+) -> str:
+    """params 为影响回复的采样参数（max_tokens / temperature / response_format 等），一并计入 key。"""
+    if isinstance(user_content, str):
+        user_content = user_content.encode("utf-8", errors="ignore")
+    h = hashlib.blake2b(digest_size=16)
+    h.update(sys_prompt.encode("utf-8", errors="ignore"))
+    h.update(b"\0")
+    h.update(model.encode("utf-8", errors="ignore"))
+    h.update(b"\0")
+    h.update(user_content)
+    if params:
+        h.update(b"\0")
+        h.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+def make_body_key(body: Mapping[str, Any]) -> str:
+    """chat.completions 请求体的 key：messages 之外的字段（temperature / max_tokens 等）作为采样参数计入。"""
+    msgs = body["messages"]
+    params = {k: v for k, v in body.items() if k not in ("model", "messages")}
+    return make_key(msgs[0]["content"], body["model"], msgs[1]["content"], params)
+
+
+def _db() -> sqlite3.Connection:
+    # 调用方持有 _lock
+    global _conn
+    if _conn is None:
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        _conn = sqlite3.connect(str(CACHE_PATH), check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    return _conn
+
+
+def get(key: str) -> Optional[str]:
+    with _lock:
+        val = _lru.get(key)
+        if val is not None:
+            _lru.move_to_end(key)
+            return val
+        row = _db().execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        _remember(key, row[0])
+        return row[0]
+
+
+def put(key: str, value: str) -> None:
+    if not value:
+        return
+    with _lock:
+        conn = _db()
+        conn.execute("INSERT OR REPLACE INTO llm_cache (key, value) VALUES (?, ?)", (key, value))
+        conn.commit()
+        _remember(key, value)
+
+
+def _remember(key: str, value: str) -> None:
+    _lru[key] = value
+    _lru.move_to_end(key)
+    if len(_lru) > LRU_SIZE:
+        _lru.popitem(last=False)
+
+
+def close() -> None:
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+        _lru.clear()
@@ -0,0 +1,46 @@
+"""命令行进度输出：后台线程合并高频进度更新，以 ≤10 Hz 覆盖写同一行。
+
+llm_select_theme / paper_assets 的异步主循环共用；完成回调里只做一次 queue.put，不阻塞事件循环。
+"""
+from __future__ import annotations
+
+import queue
+import sys
+import threading
+from typing import Any, Callable, Optional, Tuple
+
+
+class ProgressPrinter:
+    """后台线程合并进度更新并以 ≤10 Hz 输出，完成回调里只做一次 queue.put。"""
+
+    def __init__(self, fmt: Callable[..., str], interval: float = 0.1) -> None:
+        self.fmt = fmt
+        self.interval = interval
+        self.queue: "queue.Queue[Tuple[Any, ...]]" = queue.Queue()
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def update(self, *state: Any) -> None:
+        self.queue.put(state)
+
+    def close(self) -> None:
+        self.stop.set()
+        self.thread.join()
+
+    def _loop(self) -> None:
+        latest: Optional[Tuple[Any, ...]] = None
+        while True:
+            stopping = self.stop.wait(self.interval)
+            fresh = None
+            while True:
+                try:
+                    fresh = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if fresh is not None and fresh != latest:
+                latest = fresh
+                sys.stdout.write("\r" + self.fmt(*latest))
+                sys.stdout.flush()
+            if stopping:
+                return
@@ -1,19 +1,28 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import hashlib
 import json
 import logging
 import os
+import random
 import re
+import sqlite3
 import sys
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Any
 
-from openai import OpenAI
+import httpx
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI, RateLimitError
+
+try:
+    import orjson
+except ImportError:  # 可选加速依赖，缺失时回落到标准库 json
+    orjson = None
 
 ROOT = Path(os.path.dirname(os.path.dirname(__file__)))
 sys.path.insert(0, str(ROOT))
@@ -26,9 +35,24 @@ from config.config import (  # noqa: E402
     theme_select_max_tokens,
     theme_select_temperature,
     theme_select_concurrency,
+    theme_select_rpm,
     theme_select_system_prompt,
     PAPER_DEDUP_DIR,
 )
+from Controller._progress import ProgressPrinter  # noqa: E402
+
+_WS_RE = re.compile(r"\s+")
+_SCORE_RE = re.compile(r"([0-1](?:\.\d+)?)")
+_BATCH_SCORE_RE = re.compile(r"[01](?:\.\d+)?")
+
+# 批量评分：每次请求打包的论文数量上限（超过 ~16 篇后收益递减）
+BATCH_SIZE_DEFAULT = 8
+BATCH_SIZE_MAX = 16
+BATCH_PROMPT_ADDENDUM = (
+    "\n\n本次输入包含多篇论文，按编号列出。"
+    "请为每篇论文分别给出相关性分数，按输入顺序输出一个 JSON 数组，例如 [0.8, 0.1]。"
+    "Return a JSON list of floats in [0,1], one per input, in order."
+)
 
 
 # ---------------------------------------------------------------------------
@@ -68,11 +92,15 @@ def _resolve_prompt_preset(user_id: int, preset_id: Any) -> str:
         return ""
 
 
-def make_client_for_user(user_id: Optional[int] = None) -> Tuple[OpenAI, Dict[str, Any]]:
+def make_client_for_user(
+    user_id: Optional[int] = None,
+    max_in_flight: int = 1,
+) -> Tuple[AsyncOpenAI, Dict[str, Any]]:
     """Return (client, effective_cfg) honouring user overrides when *user_id* is given.
 
     effective_cfg keys: model, temperature, max_tokens, system_prompt.
     Falls back to config.py values when no user preset is found.
+    The HTTP/2 connection pool is sized for *max_in_flight* concurrent requests.
     """
     # Global defaults
     key: str = (qwen_api_key or "").strip()
@@ -114,7 +142,14 @@ def make_client_for_user(user_id: Optional[int] = None) -> Tuple[OpenAI, Dict[st
 
     if not key:
         raise SystemExit("theme_select: no api_key available (global config or user preset)")
-    client = OpenAI(api_key=key, base_url=base)
+    pool_size = max(1, int(max_in_flight)) * 2
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        http2=True,
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    )
+    # SDK 自身不重试：429/5xx/连接错误的退避统一由 _create_with_retry 负责
+    client = AsyncOpenAI(api_key=key, base_url=base, http_client=http_client, max_retries=0)
     return client, {
         "model": model_name,
         "temperature": temperature,
@@ -131,17 +166,34 @@ def setup_logging() -> logging.Logger:
     sh.setFormatter(fmt)
     logger.addHandler(sh)
 
-    log_root = ROOT / "logs" / datetime.now().strftime("%Y-%m-%d")
+    now = datetime.now()
+    log_root = ROOT / "logs" / now.strftime("%Y-%m-%d")
     log_root.mkdir(parents=True, exist_ok=True)
-    log_file = log_root / (datetime.now().strftime("%H%M%S") + "_llm_select_theme.log")
+    log_file = log_root / (now.strftime("%H%M%S") + "_llm_select_theme.log")
     fh = logging.FileHandler(log_file, encoding="utf-8")
     fh.setFormatter(logging.Formatter("%(asctime)s " + fmt._fmt))
     logger.addHandler(fh)
     return logger
 
 
+def _json_loads(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, bytes):
+        data = data.decode("utf-8", errors="ignore")
+    return json.loads(data)
+
+
+def _json_dumps(obj: Any, indent: bool = False) -> bytes:
+    """序列化为 UTF-8 字节（不转义中文）；indent=True 时与原先 indent=2 的排版一致。"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
+
+
 def normalize_text(s: str) -> str:
-    return re.sub(r"\s+", " ", (s or "")).strip()
+    return _WS_RE.sub(" ", s or "").strip()
 
 
 def find_latest_json(root: Path, explicit: Optional[str]) -> Path:
@@ -152,16 +204,18 @@ def find_latest_json(root: Path, explicit: Optional[str]) -> Path:
         return p
     if not root.exists():
         raise SystemExit(f"json dir not found: {root}")
-    files = sorted([p for p in root.glob("*.json") if p.is_file()])
-    if not files:
+    # 只需取文件名最大者；DirEntry.is_file() 复用目录扫描时的 stat 信息
+    with os.scandir(root) as it:
+        entries = [e for e in it if e.name.endswith(".json") and e.is_file()]
+    if not entries:
         raise SystemExit(f"no json in {root}")
-    return files[-1]
+    return Path(max(entries, key=lambda e: e.name).path)
 
 
 def load_json_papers(path: Path) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
-    text = path.read_text(encoding="utf-8", errors="ignore").strip()
+    raw = path.read_bytes().strip()
     try:
-        obj = json.loads(text) if text else {}
+        obj = _json_loads(raw) if raw else {}
     except json.JSONDecodeError:
         obj = {}
     if isinstance(obj, dict):
@@ -183,7 +237,7 @@ class PaperRecord:
     arxiv_id: str
 
 
-def make_client() -> OpenAI:
+def make_client() -> AsyncOpenAI:
     """Legacy wrapper kept for compatibility; prefer make_client_for_user()."""
     client, _ = make_client_for_user(user_id=None)
     return client
@@ -198,7 +252,7 @@ def build_user_prompt(title: str, abstract: str) -> str:
 def parse_score(text: str) -> float:
     if not text:
         return 0.0
-    m = re.search(r"([0-1](?:\.\d+)?)", text)
+    m = _SCORE_RE.search(text)
     if not m:
         return 0.0
     try:
@@ -212,7 +266,57 @@ def parse_score(text: str) -> float:
     return val
 
 
-def score_one(client: OpenAI, block: PaperRecord, effective_cfg: Dict[str, Any]) -> float:
+# 可重试：429 / 5xx / 超时 / 连接错误；400 等客户端错误直接抛出
+LLM_MAX_ATTEMPTS = 3
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (RateLimitError, APIConnectionError)):
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code >= 500
+    return False
+
+
+class RateLimiter:
+    """简单令牌桶：按 rate_per_min 匀速放行请求，容量为一分钟的配额。"""
+
+    def __init__(self, rate_per_min: float) -> None:
+        self.rate = rate_per_min / 60.0
+        self.capacity = max(1.0, float(rate_per_min))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self.tokens) / self.rate)
+
+
+# 由 run() 按 theme_select_rpm 初始化；None 表示不限速
+_rate_limiter: Optional[RateLimiter] = None
+
+
+async def _create_with_retry(client: AsyncOpenAI, **kwargs: Any) -> Any:
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        if _rate_limiter is not None:
+            await _rate_limiter.acquire()
+        try:
+            return await client.chat.completions.create(**kwargs)
+        except Exception as exc:
+            if attempt == LLM_MAX_ATTEMPTS - 1 or not _is_retryable(exc):
+                raise
+            await asyncio.sleep((2 ** attempt) + random.random())
+
+
+async def score_one(client: AsyncOpenAI, block: PaperRecord, effective_cfg: Dict[str, Any]) -> float:
     user_content = build_user_prompt(block.title, block.abstract)
     kwargs: Dict[str, Any] = {}
     temp = effective_cfg.get("temperature")
@@ -221,7 +325,8 @@ def score_one(client: OpenAI, block: PaperRecord, effective_cfg: Dict[str, Any])
         kwargs["temperature"] = float(temp)
     if max_tok is not None:
         kwargs["max_tokens"] = int(max_tok)
-    resp = client.chat.completions.create(
+    resp = await _create_with_retry(
+        client,
         model=effective_cfg.get("model") or theme_select_model,
         messages=[
             {"role": "system", "content": effective_cfg.get("system_prompt") or theme_select_system_prompt},
@@ -234,6 +339,95 @@ def score_one(client: OpenAI, block: PaperRecord, effective_cfg: Dict[str, Any])
     return parse_score(content)
 
 
+def build_batch_user_prompt(blocks: List[PaperRecord]) -> str:
+    parts: List[str] = []
+    for i, blk in enumerate(blocks, 1):
+        parts.append(f"{i}) 标题：{blk.title}\n摘要：{blk.abstract or '无'}")
+    return "\n".join(parts)
+
+
+async def score_batch(
+    client: AsyncOpenAI,
+    blocks: List[PaperRecord],
+    effective_cfg: Dict[str, Any],
+) -> List[float]:
+    """Score several papers with a single request; falls back to score_one on a malformed reply."""
+    if len(blocks) == 1:
+        return [await score_one(client, blocks[0], effective_cfg)]
+    kwargs: Dict[str, Any] = {}
+    temp = effective_cfg.get("temperature")
+    max_tok = effective_cfg.get("max_tokens")
+    if temp is not None:
+        kwargs["temperature"] = float(temp)
+    if max_tok is not None:
+        # 单篇只需几个 token；批量时按篇数放大输出预算
+        kwargs["max_tokens"] = max(int(max_tok), 8 * len(blocks))
+    sys_prompt = (effective_cfg.get("system_prompt") or theme_select_system_prompt) + BATCH_PROMPT_ADDENDUM
+    resp = await _create_with_retry(
+        client,
+        model=effective_cfg.get("model") or theme_select_model,
+        messages=[
+            {"role": "system", "content": sys_prompt},
+            {"role": "user", "content": build_batch_user_prompt(blocks)},
+        ],
+        stream=False,
+        **kwargs,
+    )
+    content = resp.choices[0].message.content if resp.choices else ""
+    found = _BATCH_SCORE_RE.findall(content or "")
+    if len(found) != len(blocks):
+        results = await asyncio.gather(
+            *(score_one(client, blk, effective_cfg) for blk in blocks),
+            return_exceptions=True,
+        )
+        scores: List[float] = []
+        for blk, res in zip(blocks, results):
+            if isinstance(res, BaseException):
+                # 单篇失败只置零该篇，不拖累同批其它论文
+                logging.getLogger("llm_select_theme").warning(
+                    "Score failed after retries for [%s]: %r", blk.arxiv_id or blk.title, res
+                )
+                scores.append(0.0)
+            else:
+                scores.append(res)
+        return scores
+    return [min(1.0, max(0.0, float(x))) for x in found]
+
+
+class ScoreCache:
+    """跨运行的评分缓存：(model, 系统提示词哈希, 标题, 摘要) → score，存于 .score_cache.sqlite。"""
+
+    def __init__(self, path: Path, model: str, sys_prompt: str) -> None:
+        self.conn = sqlite3.connect(str(path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, score REAL NOT NULL)"
+        )
+        self.prefix = f"{model}\0{hashlib.sha256(sys_prompt.encode('utf-8')).hexdigest()}\0"
+
+    def _key(self, title: str, abstract: str) -> str:
+        raw = f"{self.prefix}{title}\0{abstract}".encode("utf-8", errors="ignore")
+        return hashlib.sha256(raw).hexdigest()
+
+    def get_many(self, pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], float]:
+        out: Dict[Tuple[str, str], float] = {}
+        for pair in pairs:
+            row = self.conn.execute("SELECT score FROM scores WHERE key = ?", (self._key(*pair),)).fetchone()
+            if row is not None:
+                out[pair] = float(row[0])
+        return out
+
+    def put_many(self, items: Dict[Tuple[str, str], float]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO scores (key, score) VALUES (?, ?)",
+                [(self._key(*pair), score) for pair, score in items.items()],
+            )
+
+    def close(self) -> None:
+        self.conn.close()
+
+
 def run() -> None:
     logger = setup_logging()
     print("============开始主题相关性评分==============", flush=True)
@@ -241,6 +435,12 @@ def run() -> None:
     ap.add_argument("--json", default=None, help="input json from paperList_remove_duplications")
     ap.add_argument("--outdir", default=None, help="output dir (default data/llm_select_theme)")
     ap.add_argument("--user-id", type=int, default=None, help="user id for per-user LLM/prompt preset override")
+    ap.add_argument(
+        "--batch-size",
+        type=int,
+        default=BATCH_SIZE_DEFAULT,
+        help=f"papers scored per LLM request (1 disables batching, capped at {BATCH_SIZE_MAX})",
+    )
     args = ap.parse_args()
 
     input_dir = ROOT / PAPER_DEDUP_DIR
@@ -257,32 +457,76 @@ def run() -> None:
         arxiv_id = str(p.get("arxiv_id", "")).strip()
         records.append(PaperRecord(title=title, abstract=abstract, arxiv_id=arxiv_id))
     if not records:
-        out_path.write_text(json.dumps(meta_obj, ensure_ascii=False, indent=2), encoding="utf-8")
+        out_path.write_bytes(_json_dumps(meta_obj, indent=True))
         logger.warning("No paper records found; wrote original json to %s", out_path)
         return
 
-    client, effective_cfg = make_client_for_user(args.user_id)
-    scores: Dict[str, float] = {}
     workers = max(1, int(theme_select_concurrency or 1))
-    logger.info("Scoring %d paper(s) with %d worker(s) [user_id=%s]", len(records), workers, args.user_id)
-
-    total = len(records)
-    done = 0
-    with ThreadPoolExecutor(max_workers=workers) as pool:
-        future_map = {pool.submit(score_one, client, blk, effective_cfg): blk for blk in records}
-        for future in as_completed(future_map):
-            blk = future_map[future]
+    # 协程不占线程栈，可把并发放大到线程池的数倍
+    max_in_flight = workers * 4
+    client, effective_cfg = make_client_for_user(args.user_id, max_in_flight)
+
+    # 标题+摘要完全相同的记录只评一次；已缓存的直接复用
+    unique: Dict[Tuple[str, str], PaperRecord] = {}
+    for r in records:
+        unique.setdefault((r.title, r.abstract), r)
+    cache = ScoreCache(
+        out_dir / ".score_cache.sqlite",
+        effective_cfg.get("model") or theme_select_model,
+        effective_cfg.get("system_prompt") or theme_select_system_prompt,
+    )
+    key2score: Dict[Tuple[str, str], float] = cache.get_many(list(unique))
+    to_score = [r for k, r in unique.items() if k not in key2score]
+    logger.info(
+        "Scoring %d paper(s): %d unique, %d cached, %d to request, %d worker(s) [user_id=%s]",
+        len(records), len(unique), len(key2score), len(to_score), workers, args.user_id,
+    )
+
+    batch_size = min(BATCH_SIZE_MAX, max(1, int(args.batch_size or 1)))
+    batches = [to_score[i : i + batch_size] for i in range(0, len(to_score), batch_size)]
+    logger.info("Batching %d paper(s) into %d request(s) of up to %d", len(to_score), len(batches), batch_size)
+
+    total = len(to_score)
+    fresh: Dict[Tuple[str, str], float] = {}
+    sem = asyncio.Semaphore(max_in_flight)
+
+    async def sem_score(chunk: List[PaperRecord]) -> Tuple[List[PaperRecord], Optional[List[float]]]:
+        async with sem:
             try:
-                score = future.result()
+                return chunk, await score_batch(client, chunk, effective_cfg)
             except Exception as exc:
-                logger.warning("Score failed for %s: %r", blk.title, exc)
-                score = 0.0
-            scores[blk.arxiv_id or blk.title] = score
-            done += 1
-            sys.stdout.write(f"\r[PROGRESS] scoring {done}/{total}")
-            sys.stdout.flush()
-            time.sleep(0.05)
+                ids = ", ".join(blk.arxiv_id or blk.title for blk in chunk)
+                logger.warning("Score failed after retries for [%s]: %r", ids, exc)
+                return chunk, None
+
+    async def main() -> None:
+        global _rate_limiter
+        if theme_select_rpm and theme_select_rpm > 0:
+            _rate_limiter = RateLimiter(float(theme_select_rpm))
+        done = 0
+        progress = ProgressPrinter(lambda n: f"[PROGRESS] scoring {n}/{total}")
+        tasks = [asyncio.create_task(sem_score(chunk)) for chunk in batches]
+        for fut in asyncio.as_completed(tasks):
+            chunk, chunk_scores = await fut
+            for i, blk in enumerate(chunk):
+                key = (blk.title, blk.abstract)
+                if chunk_scores is None:
+                    key2score[key] = 0.0  # 失败降级为 0 分，但不写入缓存
+                else:
+                    key2score[key] = fresh[key] = chunk_scores[i]
+            done += len(chunk)
+            progress.update(done)
+        progress.close()
+        await client.close()
+
+    asyncio.run(main())
     print()
+    cache.put_many(fresh)
+    cache.close()
+
+    scores: Dict[str, float] = {}
+    for r in records:
+        scores[r.arxiv_id or r.title] = key2score[(r.title, r.abstract)]
 
     for p in papers:
         key = str(p.get("arxiv_id", "")).strip() or str(p.get("title", "")).strip()
@@ -291,8 +535,8 @@ def run() -> None:
 
     meta_obj["papers"] = papers
     meta_obj["selected"] = len(papers)
-    meta_obj["generated_utc"] = datetime.utcnow().isoformat() + "Z"
-    out_path.write_text(json.dumps(meta_obj, ensure_ascii=False, indent=2), encoding="utf-8")
+    meta_obj["generated_utc"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    out_path.write_bytes(_json_dumps(meta_obj, indent=True))
     logger.info("Saved: %s", out_path)
     print("============结束主题相关性评分==============", flush=True)
 
@@ -1,16 +1,33 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import functools
+import hashlib
 import json
 import os
+import pickle
+import random
 import re
+import sqlite3
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Set, Tuple, Any
 
-from openai import OpenAI
+if TYPE_CHECKING:  # openai / httpx 仅在真正创建客户端时导入（无待处理论文时直接返回）
+    from openai import AsyncOpenAI
+
+try:
+    import orjson
+except ImportError:  # 可选加速依赖，缺失时回落到标准库 json
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:  # 可选：按需解析 pdf_info 大文件
+    simdjson = None
 
 import sys
 
@@ -30,10 +47,26 @@ from config.config import (  # noqa: E402
     summary_input_hard_limit,
     summary_input_safety_margin,
     summary_concurrency,
+    summary_json_mode,
+    summary_prompt_cache,
     paper_assets_system_prompt,
     DATA_ROOT,
     SLLM,
 )
+from Controller._progress import ProgressPrinter  # noqa: E402
+
+_ARXIV_RE = re.compile(r"(\d{4}\.\d{4,5})(v\d+)?")
+_ARXIV_ID_ONLY_RE = re.compile(r"^\d{4}\.\d{4,5}(v\d+)?$")
+_YEAR_RE = re.compile(r"(\d{4})")
+_SECTION_SPLIT_RE = re.compile(r"^(?=## )", re.M)
+_DATA_IMAGE_RE = re.compile(r"^\s*!\[.*\]\(data:image")
+_REF_LINE_RE = re.compile(r"^\s*(?:\[\d+\]|\d+\.\s+[A-Z])")
+
+# 输出预算估计：blocks JSON 的长度与输入大致成正比，按 基数 + approx_input_tokens(输入) 估计并以配置上限封顶
+# （按 UTF-8 字节计，中文笔记不会被低估；回复仍被截断时以完整 max_tokens 重试一次）
+OUTPUT_BUDGET_BASE = 1024
+# 超过该行数的 ``` 代码块整体丢弃
+MAX_CODE_BLOCK_LINES = 40
 
 
 # ---------------------------------------------------------------------------
@@ -60,20 +93,62 @@ def _resolve_llm_preset(user_id: int, preset_id: Any) -> Dict[str, Any]:
         return {}
 
 
+def _json_loads(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, bytes):
+        data = data.decode("utf-8", errors="ignore")
+    return json.loads(data)
+
+
+def _json_dumps(obj: Any, indent: bool = False) -> bytes:
+    """序列化为 UTF-8 字节（不转义中文）；indent=True 时与原先 indent=2 的排版一致。"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
+
+
+def _json_line(obj: Any) -> bytes:
+    """序列化为一行 JSONL（含结尾换行），orjson 直接在 C 层追加换行，省去一次字节拼接。"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+
 def approx_input_tokens(text: str) -> int:
     if not text:
         return 0
+    if text.isascii():
+        return len(text)
     return len(text.encode("utf-8", errors="ignore"))
 
 
-def crop_to_input_tokens(text: str, limit_tokens: int) -> str:
-    budget = int(limit_tokens)
+# 默认系统提示词与用户消息前缀在进程内不变，其长度只算一次
+_SYS_PROMPT = (paper_assets_system_prompt or "").strip()
+_SYS_TOKENS = approx_input_tokens(_SYS_PROMPT)
+_USER_PREFIX = "下面是某篇论文的中文摘要/笔记文本，请根据系统提示词只构造 blocks 字段的内容：\n\n"
+_USER_PREFIX_TOKENS = approx_input_tokens(_USER_PREFIX)
+
+
+def _crop_bytes(text: str, b: bytes, budget: int) -> str:
+    """按字节预算裁剪已编码的 text；在 UTF-8 字符边界处截断，无需 errors="ignore" 重扫。"""
     if budget <= 0:
         return ""
-    b = text.encode("utf-8", errors="ignore")
     if len(b) <= budget:
         return text
-    return b[:budget].decode("utf-8", errors="ignore")
+    i = budget
+    # 回退到字符起始字节（续字节形如 0b10xxxxxx，最多回退 3 次）
+    while i > 0 and (b[i] & 0xC0) == 0x80:
+        i -= 1
+    return b[:i].decode("utf-8")
+
+
+def crop_to_input_tokens(text: str, limit_tokens: int) -> str:
+    budget = int(limit_tokens)
+    if budget > 0 and text.isascii() and len(text) <= budget:
+        return text
+    return _crop_bytes(text, text.encode("utf-8", errors="ignore"), budget)
 
 
 def today_str() -> str:
@@ -89,7 +164,10 @@ def _global_sllm_connection() -> Tuple[str, str, str]:
     return (qwen_api_key or "").strip(), (summary_base_url or "").strip(), summary_model
 
 
-def make_client_for_user(user_id: Optional[int] = None) -> Tuple[OpenAI, Dict[str, Any]]:
+HTTP_POOL_SIZE = 64
+
+
+def make_client_for_user(user_id: Optional[int] = None) -> Tuple[AsyncOpenAI, Dict[str, Any]]:
     """Return (client, effective_cfg) honouring user overrides when *user_id* is given.
 
     effective_cfg keys: model, temperature, max_tokens, input_hard_limit,
@@ -133,11 +211,42 @@ def make_client_for_user(user_id: Optional[int] = None) -> Tuple[OpenAI, Dict[st
         raise SystemExit("paper_assets: no api_key available (global config or user preset)")
     if not base:
         raise SystemExit("paper_assets: no base_url available (global config or user preset)")
-    client = OpenAI(api_key=key, base_url=base)
+    import httpx
+    from openai import AsyncOpenAI
+
+    # 长连接池：并发请求复用 TCP/TLS 连接；transport 与 SDK 均不重试，退避统一由 _create_with_retry 负责
+    transport = httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(
+            max_connections=HTTP_POOL_SIZE,
+            max_keepalive_connections=HTTP_POOL_SIZE,
+            keepalive_expiry=300.0,
+        ),
+    )
+    http_client = httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(60.0, connect=10.0),
+    )
+    client = AsyncOpenAI(api_key=key, base_url=base, http_client=http_client, max_retries=0)
+    cfg["prompt_cache"] = bool(summary_prompt_cache) and _is_anthropic_endpoint(base)
     return client, cfg
 
 
-def make_client() -> OpenAI:
+def _is_anthropic_endpoint(base_url: str) -> bool:
+    """只有 Anthropic 端点确定接受消息内的 cache_control 标记；经 OpenAI 兼容网关转发的 Claude 模型不算。"""
+    return "anthropic" in (base_url or "").lower()
+
+
+def _system_message(sys_prompt: str, prompt_cache: bool = False) -> Dict[str, Any]:
+    """系统消息；prompt_cache 时以 content 块形式附带 cache_control，固定前缀可被后端缓存复用。"""
+    if not prompt_cache:
+        return {"role": "system", "content": sys_prompt}
+    return {
+        "role": "system",
+        "content": [{"type": "text", "text": sys_prompt, "cache_control": {"type": "ephemeral"}}],
+    }
+
+
+def make_client() -> AsyncOpenAI:
     """Legacy wrapper kept for compatibility; prefer make_client_for_user()."""
     client, _ = make_client_for_user(user_id=None)
     return client
@@ -152,33 +261,81 @@ def get_assets_model() -> str:
 def extract_arxiv_id(source: str) -> Optional[str]:
     if not source:
         return None
-    m = re.search(r"(\d{4}\.\d{4,5})(v\d+)?", source)
+    m = _ARXIV_RE.search(source)
     if not m:
         return None
     version = m.group(2) or ""
     return f"{m.group(1)}{version}"
 
 
+# pdf_info 条目中下游（process_one）实际会读取的字段
+PDF_META_FIELDS = ("title", "published")
+
+
+def _iter_pdf_info_items(raw: bytes) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """逐条产出 (source, {title, published})，其余嵌套字段不做物化。"""
+    if simdjson is not None:
+        # On-Demand：只有被访问的字段才会转成 Python 对象
+        doc = simdjson.Parser().parse(raw)
+        if not isinstance(doc, simdjson.Array):
+            return
+        for item in doc:
+            if not isinstance(item, simdjson.Object):
+                continue
+            yield str(item.get("source") or ""), {k: item.get(k) for k in PDF_META_FIELDS}
+        return
+    data = _json_loads(raw)
+    if not isinstance(data, list):
+        return
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        yield str(item.get("source", "") or ""), {k: item.get(k) for k in PDF_META_FIELDS}
+
+
+# pickle 缓存格式版本：索引结构变化时递增，使旧缓存失效
+PDF_INFO_MAP_FORMAT = 2
+
+
+@functools.lru_cache(maxsize=8)
 def load_pdf_info_map(date_str: str) -> Dict[str, Dict[str, Any]]:
-    """加载 pdf_info/<date>.json，按 arxiv_id 建立映射。"""
-    info_path = Path(DATA_ROOT) / "pdf_info" / f"{date_str}.json"
+    """加载 pdf_info/<date>.json，按 arxiv_id 建立映射（仅保留 title / published）。
+
+    带版本号的条目同时以去掉版本号的 id 建索引（不覆盖已有条目），查询时无需再跑正则。
+    解析结果以 pickle 缓存在同目录的 .<date>.map.pkl，源文件 mtime 不变时直接复用。
+    """
+    info_dir = Path(DATA_ROOT) / "pdf_info"
+    info_path = info_dir / f"{date_str}.json"
     if not info_path.exists():
         return {}
+    cache_path = info_dir / f".{date_str}.map.pkl"
+    mtime = info_path.stat().st_mtime
+    if cache_path.exists():
+        try:
+            with cache_path.open("rb") as f:
+                cached = pickle.load(f)
+            if cached.get("mtime") == mtime and cached.get("format") == PDF_INFO_MAP_FORMAT:
+                return cached["map"]
+        except Exception:
+            pass
+
+    out: Dict[str, Dict[str, Any]] = {}
     try:
-        data = json.loads(info_path.read_text(encoding="utf-8", errors="ignore"))
-    except json.JSONDecodeError:
-        return {}
-    if not isinstance(data, list):
+        for source, meta in _iter_pdf_info_items(info_path.read_bytes()):
+            arxiv_id = extract_arxiv_id(source)
+            if not arxiv_id:
+                continue
+            out[arxiv_id] = meta
+            base_id, sep, _ = arxiv_id.rpartition("v")
+            if sep:
+                out.setdefault(base_id, meta)
+    except ValueError:
         return {}
-    out: Dict[str, Dict[str, Any]] = {}
-    for item in data:
-        if not isinstance(item, dict):
-            continue
-        source = str(item.get("source", "") or "")
-        arxiv_id = extract_arxiv_id(source)
-        if not arxiv_id:
-            continue
-        out[arxiv_id] = item
+    try:
+        with cache_path.open("wb") as f:
+            pickle.dump({"mtime": mtime, "format": PDF_INFO_MAP_FORMAT, "map": out}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass
     return out
 
 
@@ -188,9 +345,9 @@ def get_pdf_meta_for_id(pdf_info_map: Dict[str, Dict[str, Any]], paper_id: str)
     info = pdf_info_map.get(paper_id)
     if info is not None:
         return info
-    # 再尝试去掉版本号匹配
-    base_id = re.sub(r"v\d+$", "", paper_id)
-    if base_id != paper_id:
+    # 再尝试去掉版本号匹配（load_pdf_info_map 已为带版本条目建了无版本索引）
+    base_id, sep, ver = paper_id.rpartition("v")
+    if sep and ver.isdigit():
         return pdf_info_map.get(base_id)
     return None
 
@@ -198,7 +355,7 @@ def get_pdf_meta_for_id(pdf_info_map: Dict[str, Dict[str, Any]], paper_id: str)
 def parse_year(published: str) -> Optional[int]:
     if not published:
         return None
-    m = re.match(r"(\d{4})", published.strip())
+    m = _YEAR_RE.match(published.strip())
     if not m:
         return None
     try:
@@ -210,81 +367,358 @@ def parse_year(published: str) -> Optional[int]:
 def build_url(paper_id: str) -> str:
     if not paper_id:
         return ""
-    if re.match(r"^\d{4}\.\d{4,5}(v\d+)?$", paper_id):
+    if _ARXIV_ID_ONLY_RE.match(paper_id):
         return f"https://arxiv.org/abs/{paper_id}"
     return ""
 
 
+BLOCK_KEYS = (
+    "background",
+    "objective",
+    "method",
+    "data",
+    "experiment",
+    "metrics",
+    "results",
+    "limitations",
+)
+
+
+def _norm_bullets(bullets: List[Any]) -> List[str]:
+    out: List[str] = []
+    for b in bullets:
+        s = b.strip() if isinstance(b, str) else str(b).strip()
+        if s:
+            out.append(s)
+    return out
+
+
+def _is_well_formed_block(raw: Any) -> bool:
+    return (
+        isinstance(raw, dict)
+        and isinstance(raw.get("text", ""), str)
+        and isinstance(raw.get("bullets", []), list)
+    )
+
+
 def ensure_blocks_structure(blocks: Any) -> Dict[str, Dict[str, List[str]]]:
     """确保 blocks 结构完整且类型正确。"""
-    expected_keys = [
-        "background",
-        "objective",
-        "method",
-        "data",
-        "experiment",
-        "metrics",
-        "results",
-        "limitations",
-    ]
+    # 快速路径：模型按 schema 返回（绝大多数情况），省去逐项的防御性转换
+    if isinstance(blocks, dict) and all(_is_well_formed_block(blocks.get(k)) for k in BLOCK_KEYS):
+        return {
+            k: {
+                "text": blocks[k].get("text", "").strip(),
+                "bullets": _norm_bullets(blocks[k].get("bullets", [])),
+            }
+            for k in BLOCK_KEYS
+        }
+    return _ensure_blocks_slow(blocks)
+
+
+def _ensure_blocks_slow(blocks: Any) -> Dict[str, Dict[str, List[str]]]:
     out: Dict[str, Dict[str, List[str]]] = {}
     if not isinstance(blocks, dict):
         blocks = {}
-    for key in expected_keys:
-        raw = blocks.get(key, {}) if isinstance(blocks, dict) else {}
+    for key in BLOCK_KEYS:
+        raw = blocks.get(key, {})
         text = raw.get("text") if isinstance(raw, dict) else ""
         bullets = raw.get("bullets") if isinstance(raw, dict) else []
         if not isinstance(text, str):
             text = "" if text is None else str(text)
         if not isinstance(bullets, list):
             bullets = []
-        norm_bullets: List[str] = []
-        for b in bullets:
-            if isinstance(b, str):
-                s = b.strip()
-            else:
-                s = str(b).strip()
-            if s:
-                norm_bullets.append(s)
-        out[key] = {"text": text.strip(), "bullets": norm_bullets}
+        out[key] = {"text": text.strip(), "bullets": _norm_bullets(bullets)}
     return out
 
 
 def parse_json_from_text(text: str) -> Any:
-    """从模型回复中尽量抠出 JSON 对象。"""
+    """从模型回复中尽量抠出 JSON 对象（JSON 模式下整段即为对象，先直接解析）。"""
     if not text:
         return {}
     s = text.strip()
+    if s.startswith("{"):
+        try:
+            return _json_loads(s)
+        except json.JSONDecodeError:
+            pass
     start = s.find("{")
     end = s.rfind("}")
     if start == -1 or end == -1 or end <= start:
         return {}
     snippet = s[start : end + 1]
     try:
-        return json.loads(snippet)
+        return _json_loads(snippet)
     except json.JSONDecodeError:
         return {}
 
 
-def extract_blocks_with_llm(
-    client: OpenAI,
-    md_text: str,
-    effective_cfg: Optional[Dict[str, Any]] = None,
+# 可重试：429 / 5xx / 超时 / 连接错误；400 等客户端错误直接抛出
+LLM_MAX_ATTEMPTS = 3
+
+
+def _is_retryable(exc: Exception) -> bool:
+    from openai import APIConnectionError, APIStatusError, RateLimitError
+
+    if isinstance(exc, (RateLimitError, APIConnectionError)):
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code >= 500
+    return False
+
+
+# 在途请求上限（--concurrency），run() 的事件循环内创建；按单次请求计数，分块抽取的各章节请求同样受限
+_request_sem: Optional[asyncio.Semaphore] = None
+
+
+async def _create_once(client: AsyncOpenAI, **kwargs: Any) -> Any:
+    if _request_sem is None:
+        return await client.chat.completions.create(**kwargs)
+    async with _request_sem:
+        return await client.chat.completions.create(**kwargs)
+
+
+async def _create_with_retry(client: AsyncOpenAI, **kwargs: Any) -> Any:
+    # 退避等待期间不占用并发名额
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        try:
+            return await _create_once(client, **kwargs)
+        except Exception as exc:
+            if attempt == LLM_MAX_ATTEMPTS - 1 or not _is_retryable(exc):
+                raise
+            await asyncio.sleep((2 ** attempt) + random.random())
+
+
+class BlocksCache:
+    """blocks 结果持久缓存：key = blake2b(model | 系统提示词 | 用户内容 | 采样参数)，value 为 JSON 序列化的 blocks。"""
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, blocks BLOB NOT NULL)")
+
+    @staticmethod
+    def make_key(model: str, sys_prompt: str, user_content: str, kwargs: Dict[str, Any]) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(model.encode("utf-8"))
+        h.update(b"|")
+        h.update(sys_prompt.encode("utf-8"))
+        h.update(b"|")
+        h.update(user_content.encode("utf-8", errors="ignore"))
+        h.update(b"|")
+        h.update(json.dumps(kwargs, sort_keys=True).encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Dict[str, List[str]]]]:
+        row = self.conn.execute("SELECT blocks FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            return ensure_blocks_structure(_json_loads(row[0]))
+        except ValueError:
+            return None
+
+    def put(self, key: str, blocks: Dict[str, Dict[str, List[str]]]) -> None:
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO cache (key, blocks) VALUES (?, ?)", (key, _json_dumps(blocks)))
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+# 由 run() 打开；None 表示不使用缓存（--no-cache 或被其他脚本直接调用）
+_blocks_cache: Optional[BlocksCache] = None
+
+
+def _prune_boilerplate(md: str) -> str:
+    """去掉对抽取无用的内容：内嵌 base64 图片、过长的代码块、重复的参考文献行。"""
+    out: List[str] = []
+    seen_refs: Set[str] = set()
+    fence: List[str] = []
+    in_fence = False
+    for line in md.splitlines():
+        if line.lstrip().startswith("```"):
+            if in_fence:
+                fence.append(line)
+                if len(fence) <= MAX_CODE_BLOCK_LINES:
+                    out.extend(fence)
+                fence = []
+            else:
+                fence = [line]
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            fence.append(line)
+            continue
+        if _DATA_IMAGE_RE.match(line):
+            continue
+        if _REF_LINE_RE.match(line):
+            key = line.strip()
+            if key in seen_refs:
+                continue
+            seen_refs.add(key)
+        out.append(line)
+    out.extend(fence)  # 未闭合的代码块原样保留
+    return "\n".join(out)
+
+
+def _estimate_output_budget(user_content: str, max_tokens: int) -> int:
+    return min(int(max_tokens), OUTPUT_BUDGET_BASE + approx_input_tokens(user_content))
+
+
+def split_markdown_sections(text: str, budget: int) -> List[str]:
+    """按 "## " 二级标题切分，再贪心合并成不超过 budget 字节的若干块；单节超长时按字节边界硬切。"""
+    chunks: List[str] = []
+    cur: List[str] = []
+    cur_len = 0
+    for sec in _SECTION_SPLIT_RE.split(text):
+        if not sec:
+            continue
+        b = sec.encode("utf-8", errors="ignore")
+        if cur and cur_len + len(b) > budget:
+            chunks.append("".join(cur))
+            cur, cur_len = [], 0
+        while len(b) > budget:
+            head = _crop_bytes(sec, b, budget)
+            if not head:
+                break
+            chunks.append(head)
+            sec = sec[len(head):]
+            b = sec.encode("utf-8", errors="ignore")
+        cur.append(sec)
+        cur_len += len(b)
+    if cur:
+        chunks.append("".join(cur))
+    return [c for c in chunks if c.strip()]
+
+
+def merge_blocks(parts: List[Dict[str, Dict[str, List[str]]]]) -> Dict[str, Dict[str, List[str]]]:
+    """合并分块抽取结果：text 以换行拼接，bullets 按出现顺序去重合并。"""
+    out: Dict[str, Dict[str, List[str]]] = {}
+    for key in BLOCK_KEYS:
+        texts = [p[key]["text"] for p in parts if p[key]["text"]]
+        bullets = list(dict.fromkeys(b for p in parts for b in p[key]["bullets"]))
+        out[key] = {"text": "\n".join(texts), "bullets": bullets}
+    return out
+
+
+def _reply_of(resp: Any) -> Tuple[str, Optional[str]]:
+    if not resp.choices:
+        return "", None
+    choice = resp.choices[0]
+    return choice.message.content or "", choice.finish_reason
+
+
+def _rejects_json_mode(exc: Exception) -> bool:
+    """400 是否因后端不支持 response_format（上下文超长、内容拒绝等其它 400 不算）。"""
+    text = f"{exc} {getattr(exc, 'body', '')}".lower()
+    return "response_format" in text or "json_object" in text
+
+
+# JSON 模式开关（config.summary_json_mode）；后端以 400 拒绝 response_format 时自动关闭
+_json_mode: bool = bool(summary_json_mode)
+
+
+async def _create_json_completion(
+    client: AsyncOpenAI,
+    model_name: str,
+    messages: List[Dict[str, Any]],
+    kwargs: Dict[str, Any],
+) -> Tuple[str, Optional[str]]:
+    """发送请求并返回 (回复文本, finish_reason)；JSON 模式开启时附带 response_format，后端明确拒绝则本次运行内关闭。"""
+    global _json_mode
+    from openai import APIStatusError
+
+    if _json_mode:
+        try:
+            resp = await _create_with_retry(
+                client,
+                model=model_name,
+                messages=messages,
+                stream=False,
+                response_format={"type": "json_object"},
+                **kwargs,
+            )
+            return _reply_of(resp)
+        except APIStatusError as exc:
+            if exc.status_code != 400 or not _rejects_json_mode(exc):
+                raise
+            # 后端不支持 response_format：本次运行内关闭 JSON 模式
+            _json_mode = False
+    resp = await _create_with_retry(
+        client,
+        model=model_name,
+        messages=messages,
+        stream=False,
+        **kwargs,
+    )
+    return _reply_of(resp)
+
+
+def _single_request_kwargs(user_content: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """单篇请求实际发送的采样参数（max_tokens 按输入长度收紧）。"""
+    if "max_tokens" in kwargs:
+        return {**kwargs, "max_tokens": _estimate_output_budget(user_content, kwargs["max_tokens"])}
+    return kwargs
+
+
+async def _request_blocks(
+    client: AsyncOpenAI,
+    sys_prompt: str,
+    user_content: str,
+    model_name: str,
+    kwargs: Dict[str, Any],
+    prompt_cache: bool = False,
 ) -> Dict[str, Dict[str, List[str]]]:
-    content = (md_text or "").strip()
-    if not content:
-        return ensure_blocks_structure({})
-    cfg = effective_cfg or {}
-    sys_prompt = (cfg.get("system_prompt") or paper_assets_system_prompt or "").strip()
+    full_kwargs = kwargs
+    kwargs = _single_request_kwargs(user_content, kwargs)
+    # 唯一的缓存层：按实际发送的内容（裁剪/分块之后）与采样参数命中，分块抽取时未变化的章节也能复用
+    req_key = ""
+    if _blocks_cache is not None:
+        req_key = BlocksCache.make_key(model_name, sys_prompt, user_content, kwargs)
+        cached = _blocks_cache.get(req_key)
+        if cached is not None:
+            return cached
+
+    messages = [
+        _system_message(sys_prompt, prompt_cache),
+        {
+            "role": "user",
+            "content": _USER_PREFIX + user_content,
+        },
+    ]
+    reply, finish_reason = await _create_json_completion(client, model_name, messages, kwargs)
+    if finish_reason == "length" and kwargs.get("max_tokens") != full_kwargs.get("max_tokens"):
+        # 收紧后的预算不够：放开到配置的 max_tokens 重试一次
+        reply, finish_reason = await _create_json_completion(client, model_name, messages, full_kwargs)
+    obj = parse_json_from_text(reply)
+    # 模型按 prompt 只输出 blocks 对象（8 个键在顶层）；兼容历史上可能返回 {"blocks": {...}} 的情况
+    if isinstance(obj, dict) and "blocks" in obj and isinstance(obj["blocks"], dict):
+        blocks_raw = obj["blocks"]
+    else:
+        blocks_raw = obj
+    blocks = ensure_blocks_structure(blocks_raw)
+    # 只缓存完整且解析成功的回复；截断/空/无法解析的回复下次重跑时重新抽取
+    if _blocks_cache is not None and finish_reason == "stop" and isinstance(blocks_raw, dict) and blocks_raw:
+        _blocks_cache.put(req_key, blocks)
+    return blocks
+
+
+def _request_params(cfg: Dict[str, Any]) -> Tuple[str, int, Dict[str, Any], str]:
+    """返回 (系统提示词, 用户内容字节预算, 采样参数, 模型名)。"""
+    sys_prompt = (cfg.get("system_prompt") or "").strip() or _SYS_PROMPT
     if not sys_prompt:
         raise SystemExit("paper_assets_system_prompt missing in config.config")
 
     hard_limit = int(cfg.get("input_hard_limit") or summary_input_hard_limit)
     safety_margin = int(cfg.get("input_safety_margin") or summary_input_safety_margin)
     limit_total = hard_limit - safety_margin
-    sys_tokens = approx_input_tokens(sys_prompt)
-    user_budget = max(1, limit_total - sys_tokens)
-    user_content = crop_to_input_tokens(content, user_budget)
+    if sys_prompt == _SYS_PROMPT:
+        sys_tokens = _SYS_TOKENS
+    else:
+        sys_tokens = approx_input_tokens(sys_prompt)
+    user_budget = max(1, limit_total - sys_tokens - _USER_PREFIX_TOKENS)
 
     kwargs: Dict[str, Any] = {}
     temp = cfg.get("temperature") if cfg else summary_temperature
@@ -295,31 +729,157 @@ def extract_blocks_with_llm(
         kwargs["max_tokens"] = int(max_tok)
 
     model_name = (cfg.get("model") or get_assets_model()) if cfg else get_assets_model()
+    return sys_prompt, user_budget, kwargs, model_name
 
-    resp = client.chat.completions.create(
-        model=model_name,
-        messages=[
-            {"role": "system", "content": sys_prompt},
-            {
-                "role": "user",
-                "content": "下面是某篇论文的中文摘要/笔记文本，请根据系统提示词只构造 blocks 字段的内容：\n\n" + user_content,
-            },
-        ],
-        stream=False,
-        **kwargs,
-    )
-    reply = resp.choices[0].message.content if resp.choices else ""
-    obj = parse_json_from_text(reply)
-    # 模型按 prompt 只输出 blocks 对象（8 个键在顶层）；兼容历史上可能返回 {"blocks": {...}} 的情况
-    if isinstance(obj, dict) and "blocks" in obj and isinstance(obj["blocks"], dict):
-        blocks_raw = obj["blocks"]
+
+async def extract_blocks_with_llm(
+    client: AsyncOpenAI,
+    md_text: str,
+    effective_cfg: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Dict[str, List[str]]]:
+    """抽取 blocks；超出输入预算时按章节分块并行抽取再合并（cfg["single_shot"] 为真时改为直接截断）。"""
+    content = _prune_boilerplate((md_text or "").strip()).strip()
+    if not content:
+        return ensure_blocks_structure({})
+    cfg = effective_cfg or {}
+    sys_prompt, user_budget, kwargs, model_name = _request_params(cfg)
+    content_bytes = content.encode("utf-8", errors="ignore")
+
+    if len(content_bytes) <= user_budget or cfg.get("single_shot"):
+        user_content = _crop_bytes(content, content_bytes, user_budget)
+        blocks = await _request_blocks(
+            client, sys_prompt, user_content, model_name, kwargs, bool(cfg.get("prompt_cache"))
+        )
     else:
-        blocks_raw = obj
-    return ensure_blocks_structure(blocks_raw)
+        chunks = split_markdown_sections(content, user_budget)
+        parts = await asyncio.gather(
+            *(
+                _request_blocks(client, sys_prompt, chunk, model_name, kwargs, bool(cfg.get("prompt_cache")))
+                for chunk in chunks
+            )
+        )
+        blocks = merge_blocks(list(parts))
+    return blocks
+
+
+BATCH_PROMPT_ADDENDUM = (
+    "\n\n本次输入包含多篇论文，每篇以 `### PAPER_ID: <id>` 开头。"
+    "请为每篇论文分别抽取上述 8 个块，输出一个 JSON 对象，键为 paper_id，值为该论文的 blocks 对象，"
+    '例如 {"2501.00001": {"background": {...}, ...}, "2501.00002": {...}}。'
+)
+_BATCH_USER_PREFIX = "下面是多篇论文的中文摘要/笔记文本，请根据系统提示词分别构造各自 blocks 字段的内容：\n\n"
+# 相对单篇请求多出的固定开销（批量前缀 + 系统提示词附加说明）
+_BATCH_OVERHEAD_TOKENS = (
+    approx_input_tokens(_BATCH_USER_PREFIX) + approx_input_tokens(BATCH_PROMPT_ADDENDUM) - _USER_PREFIX_TOKENS
+)
+
+
+def _pack_batch(items: List[Tuple[str, str, int]], max_bytes: int, batch_size: int) -> List[List[Tuple[str, str, int]]]:
+    """把 (paper_id, content, 字节数) 贪心装箱：每组不超过 batch_size 篇且总字节不超过 max_bytes。"""
+    packs: List[List[Tuple[str, str, int]]] = []
+    cur: List[Tuple[str, str, int]] = []
+    cur_len = 0
+    for item in items:
+        if cur and (len(cur) >= batch_size or cur_len + item[2] > max_bytes):
+            packs.append(cur)
+            cur, cur_len = [], 0
+        cur.append(item)
+        cur_len += item[2]
+    if cur:
+        packs.append(cur)
+    return packs
+
+
+async def extract_blocks_batch(
+    client: AsyncOpenAI,
+    papers: List[Tuple[str, str]],
+    effective_cfg: Optional[Dict[str, Any]] = None,
+    batch_size: int = 8,
+) -> Dict[str, Dict[str, Dict[str, List[str]]]]:
+    """多篇短论文合并为一次请求抽取 blocks，返回 paper_id -> blocks。
+
+    超出单篇预算的论文、以及模型回复中缺失的论文回落到 extract_blocks_with_llm 单篇抽取。
+    """
+    cfg = effective_cfg or {}
+    sys_prompt, user_budget, kwargs, model_name = _request_params(cfg)
+    result: Dict[str, Dict[str, Dict[str, List[str]]]] = {}
+    fallback: Dict[str, str] = {}
+    items: List[Tuple[str, str, int]] = []
+    keys: Dict[str, str] = {}
+
+    for paper_id, md_text in papers:
+        content = _prune_boilerplate((md_text or "").strip()).strip()
+        if not content:
+            result[paper_id] = ensure_blocks_structure({})
+            continue
+        content_bytes = content.encode("utf-8", errors="ignore")
+        if len(content_bytes) > user_budget:
+            fallback[paper_id] = md_text
+            continue
+        if _blocks_cache is not None:
+            # 与单篇请求同一把 key：无论本篇走合并请求还是单篇请求，结果都可互相复用
+            keys[paper_id] = BlocksCache.make_key(
+                model_name, sys_prompt, content, _single_request_kwargs(content, kwargs)
+            )
+            cached = _blocks_cache.get(keys[paper_id])
+            if cached is not None:
+                result[paper_id] = cached
+                continue
+        # 计入 "### PAPER_ID: <id>" 分隔头的长度
+        items.append((paper_id, content, len(content_bytes) + len(paper_id) + 17))
+
+    async def run_pack(pack: List[Tuple[str, str, int]]) -> None:
+        if len(pack) == 1:
+            fallback[pack[0][0]] = pack[0][1]
+            return
+        user_content = "\n\n".join(f"### PAPER_ID: {pid}\n{content}" for pid, content, _ in pack)
+        pack_kwargs = dict(kwargs)
+        if "max_tokens" in pack_kwargs:
+            pack_kwargs["max_tokens"] = _estimate_output_budget(user_content, pack_kwargs["max_tokens"] * len(pack))
+        reply, _ = await _create_json_completion(
+            client,
+            model_name,
+            [
+                _system_message(sys_prompt + BATCH_PROMPT_ADDENDUM, bool(cfg.get("prompt_cache"))),
+                {
+                    "role": "user",
+                    "content": _BATCH_USER_PREFIX + user_content,
+                },
+            ],
+            pack_kwargs,
+        )
+        obj = parse_json_from_text(reply)
+        for pid, content, _ in pack:
+            raw = obj.get(pid) if isinstance(obj, dict) else None
+            if isinstance(raw, dict) and isinstance(raw.get("blocks"), dict):
+                raw = raw["blocks"]
+            if not isinstance(raw, dict) or not raw:
+                fallback[pid] = content
+                continue
+            blocks = ensure_blocks_structure(raw)
+            result[pid] = blocks
+            if _blocks_cache is not None:
+                _blocks_cache.put(keys[pid], blocks)
+
+    pack_budget = max(1, user_budget - _BATCH_OVERHEAD_TOKENS)
+    await asyncio.gather(*(run_pack(pack) for pack in _pack_batch(items, pack_budget, batch_size)))
+
+    if fallback:
+        pids = list(fallback)
+        parts = await asyncio.gather(*(extract_blocks_with_llm(client, fallback[pid], cfg) for pid in pids))
+        result.update(zip(pids, parts))
+    return result
 
 
 def list_md_files(in_dir: Path) -> List[Path]:
-    return sorted(p for p in in_dir.glob("*.md") if p.is_file() and p.name != "full.md")
+    with os.scandir(in_dir) as it:
+        files = [
+            Path(e.path)
+            for e in it
+            if e.name.endswith(".md") and e.name != "full.md" and e.is_file(follow_symlinks=False)
+        ]
+    files.sort()
+    return files
 
 
 def resolve_date_and_input_dir(root: Path, explicit_date: str) -> Tuple[Path, str]:
@@ -355,35 +915,78 @@ def resolve_date_and_input_dir(root: Path, explicit_date: str) -> Tuple[Path, st
     return root, today
 
 
-def process_one(
-    client: OpenAI,
+def read_jsonl_paper_ids(path: Path) -> Set[str]:
+    """读取 JSONL 中已有的 paper_id（文件不存在或行损坏时跳过）。"""
+    ids: Set[str] = set()
+    if not path.exists():
+        return ids
+    with path.open("rb") as f:
+        for line in f:
+            try:
+                pid = _json_loads(line).get("paper_id")
+            except (ValueError, AttributeError):
+                continue
+            if pid:
+                ids.add(str(pid))
+    return ids
+
+
+def sort_jsonl_by_paper_id(path: Path) -> None:
+    keyed: List[Tuple[str, bytes]] = []
+    with path.open("rb") as f:
+        for line in f:
+            try:
+                pid = str(_json_loads(line).get("paper_id", ""))
+            except (ValueError, AttributeError):
+                continue
+            keyed.append((pid, line if line.endswith(b"\n") else line + b"\n"))
+    keyed.sort(key=lambda kv: kv[0])
+    tmp_path = path.with_suffix(".jsonl.tmp")
+    with tmp_path.open("wb", buffering=1 << 20) as f:
+        f.writelines(line for _, line in keyed)
+    os.replace(tmp_path, path)
+
+
+def _load_md(md_path: Path) -> bytes:
+    return md_path.read_bytes()
+
+
+def _digest_md(md_path: Path) -> Optional[bytes]:
+    # 分块流式计算内容摘要，不保留文件内容；全空白文件返回 None
+    h = hashlib.sha256()
+    blank = True
+    with md_path.open("rb") as f:
+        for chunk in iter(functools.partial(f.read, 1 << 16), b""):
+            h.update(chunk)
+            if blank and chunk.strip():
+                blank = False
+    return None if blank else h.digest()
+
+
+async def process_one(
+    client: AsyncOpenAI,
     md_path: Path,
+    raw: bytes,
     pdf_info_map: Dict[str, Dict[str, Any]],
     effective_cfg: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
-    text = md_path.read_text(encoding="utf-8", errors="ignore")
+    """raw 为 _load_md 预读的文件内容，LLM 协程内只做解码。"""
+    text = raw.decode("utf-8", errors="ignore")
     if not text.strip():
-        paper_id = md_path.stem
-        meta = get_pdf_meta_for_id(pdf_info_map, paper_id)
-        title = str(meta.get("title", "") or "").strip() if meta else ""
-        published = str(meta.get("published", "") or "").strip() if meta else ""
-        year = parse_year(published) if published else None
-        return {
-            "paper_id": paper_id,
-            "title": title,
-            "url": build_url(paper_id),
-            "year": year,
-            "blocks": ensure_blocks_structure({}),
-        }
+        return build_record(md_path.stem, pdf_info_map, ensure_blocks_structure({}))
+    blocks = await extract_blocks_with_llm(client, text, effective_cfg)
+    return build_record(md_path.stem, pdf_info_map, blocks)
+
 
-    paper_id = md_path.stem
+def build_record(
+    paper_id: str,
+    pdf_info_map: Dict[str, Dict[str, Any]],
+    blocks: Dict[str, Dict[str, List[str]]],
+) -> Dict[str, Any]:
     meta = get_pdf_meta_for_id(pdf_info_map, paper_id)
     title = str(meta.get("title", "") or "").strip() if meta else ""
     published = str(meta.get("published", "") or "").strip() if meta else ""
     year = parse_year(published) if published else None
-
-    blocks = extract_blocks_with_llm(client, text, effective_cfg)
-
     return {
         "paper_id": paper_id,
         "title": title,
@@ -400,6 +1003,19 @@ def run() -> None:
     ap.add_argument("--date", default="")
     ap.add_argument("--concurrency", type=int, default=summary_concurrency)
     ap.add_argument("--user-id", type=int, default=None, help="user id for per-user LLM preset override")
+    ap.add_argument(
+        "--single-shot",
+        action="store_true",
+        help="truncate oversize markdown to the input budget instead of extracting per section and merging",
+    )
+    ap.add_argument("--no-cache", action="store_true", help="ignore and do not update the on-disk blocks cache")
+    ap.add_argument("--finalize", action="store_true", help="rewrite the output JSONL sorted by paper_id when done")
+    ap.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="pack up to N short papers into one LLM request (1 = one paper per request)",
+    )
     args = ap.parse_args()
 
     in_root = Path(args.input_dir)
@@ -423,48 +1039,150 @@ def run() -> None:
     out_root.mkdir(parents=True, exist_ok=True)
     out_path = out_root / f"{date_str}.jsonl"
 
+    # 检查点：当日 JSONL 中已有的论文不再重复处理；新结果完成即追加写入并 flush
+    done_ids = read_jsonl_paper_ids(out_path)
+    if done_ids:
+        files = [p for p in files if p.stem not in done_ids]
+        print(f"[PAPER_ASSETS] resume: {len(done_ids)} already in {out_path.name}, {len(files)} left", flush=True)
+        if not files:
+            if args.finalize:
+                sort_jsonl_by_paper_id(out_path)
+            print("============结束生成 paper_assets ============", flush=True)
+            return
+
     pdf_info_map = load_pdf_info_map(date_str)
 
+    global _blocks_cache
+    if not args.no_cache:
+        _blocks_cache = BlocksCache(out_root / ".cache.sqlite")
+
     client, effective_cfg = make_client_for_user(args.user_id)
+    effective_cfg["single_shot"] = args.single_shot
     workers = max(1, int(args.concurrency or 0))
+    batch_size = max(1, int(args.batch_size or 1))
     total = len(files)
     print(f"[PAPER_ASSETS] input_dir={in_dir} total={total} concurrency={workers} user_id={args.user_id}", flush=True)
 
-    start = time.monotonic()
-    done = 0
-    errors = 0
-    results: List[Dict[str, Any]] = []
+    # 先并行流式计算摘要用于判空与去重；正文在处理前按有界窗口预读，峰值内存随并发数而非总输入增长
+    with ThreadPoolExecutor(max_workers=16) as io_pool:
+        digest_map = dict(zip(files, io_pool.map(_digest_md, files)))
 
-    def task(p: Path) -> Dict[str, Any]:
-        return process_one(client, p, pdf_info_map, effective_cfg)
-
-    with ThreadPoolExecutor(max_workers=workers) as ex:
-        future_map = {ex.submit(task, p): p for p in files}
-        for fut in as_completed(future_map):
-            src = future_map[fut]
-            try:
-                obj = fut.result()
-                if obj:
-                    results.append(obj)
-            except Exception as e:
-                errors += 1
-                print(f"\r[PAPER_ASSETS] error on {src.name}: {e!r}", end="", flush=True)
+    start = time.monotonic()
+    written = 0
+
+    def fmt_progress(done: int, errors: int, now: float) -> str:
+        elapsed = now - start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        return f"[PAPER_ASSETS] progress done={done}/{total} errors={errors} rate={rate:.2f}/s"
+
+    async def main() -> int:
+        global _request_sem
+        progress = ProgressPrinter(fmt_progress)
+        _request_sem = asyncio.Semaphore(workers)
+        # 预读窗口：最多 2 倍并发数的任务持有已读入的正文
+        prefetch = asyncio.Semaphore(2 * workers)
+        loop = asyncio.get_running_loop()
+        done = 0
+        errors = 0
+        nonlocal written
+
+        # 空文件不进入 LLM 队列：直接写出空 blocks 记录；内容完全相同的文件只抽取一次
+        pending: List[Path] = []
+        empty_buf = bytearray()
+        dup_of: Dict[Path, List[Path]] = {}
+        by_digest: Dict[bytes, Path] = {}
+        for p in files:
+            digest = digest_map.pop(p)
+            if digest is not None:
+                first = by_digest.get(digest)
+                if first is None:
+                    by_digest[digest] = p
+                    dup_of[p] = [p]
+                    pending.append(p)
+                else:
+                    dup_of[first].append(p)
+                continue
+            empty_buf += _json_line(build_record(p.stem, pdf_info_map, ensure_blocks_structure({})))
+            written += 1
             done += 1
-            elapsed = time.monotonic() - start
-            rate = done / elapsed if elapsed > 0 else 0.0
-            print(f"\r[PAPER_ASSETS] progress done={done}/{total} errors={errors} rate={rate:.2f}/s", end="", flush=True)
-
+        if done:
+            out_f.write(empty_buf)
+            out_f.flush()
+            progress.update(done, errors, time.monotonic())
+        n_dups = sum(map(len, dup_of.values())) - len(pending)
+        if n_dups:
+            print(f"[PAPER_ASSETS] dedup: {n_dups} md files duplicate another file's content", flush=True)
+
+        def write_members(p: Path, blocks: Dict[str, Dict[str, List[str]]]) -> None:
+            # 相同内容的每个文件各写一条记录（paper_id/title/url 各自独立，blocks 共享）
+            nonlocal written
+            members = dup_of[p]
+            out_f.write(b"".join(_json_line(build_record(m.stem, pdf_info_map, blocks)) for m in members))
+            written += len(members)
+
+        async def bounded(p: Path) -> None:
+            # 单事件循环内计数器与文件写入无需加锁
+            nonlocal done, errors
+            async with prefetch:
+                try:
+                    raw = await loop.run_in_executor(None, _load_md, p)
+                    obj = await process_one(client, p, raw, pdf_info_map, effective_cfg)
+                    if obj:
+                        write_members(p, obj["blocks"])
+                        out_f.flush()
+                except Exception as e:
+                    errors += len(dup_of[p])
+                    print(f"\r[PAPER_ASSETS] error on {p.name}: {e!r}", end="", flush=True)
+            done += len(dup_of[p])
+            progress.update(done, errors, time.monotonic())
+
+        async def bounded_batch(group: List[Path]) -> None:
+            nonlocal done, errors
+            n_files = sum(len(dup_of[p]) for p in group)
+            async with prefetch:
+                try:
+                    raws = await asyncio.gather(*(loop.run_in_executor(None, _load_md, p) for p in group))
+                    texts = [(p.stem, raw.decode("utf-8", errors="ignore")) for p, raw in zip(group, raws)]
+                    del raws
+                    blocks_map = await extract_blocks_batch(client, texts, effective_cfg, batch_size)
+                    for p in group:
+                        write_members(p, blocks_map[p.stem])
+                    out_f.flush()
+                except Exception as e:
+                    errors += n_files
+                    print(f"\r[PAPER_ASSETS] error on batch {group[0].name}..: {e!r}", end="", flush=True)
+            done += n_files
+            progress.update(done, errors, time.monotonic())
+
+        if batch_size > 1:
+            groups = [pending[i : i + batch_size] for i in range(0, len(pending), batch_size)]
+            await asyncio.gather(*[bounded_batch(g) for g in groups])
+        else:
+            await asyncio.gather(*[bounded(p) for p in pending])
+        progress.close()
+        await client.close()
+        _request_sem = None
+        return errors
+
+    with out_path.open("ab", buffering=1 << 16) as out_f:
+        # 上次中断可能留下半行，先补换行再追加
+        if out_f.tell() > 0:
+            with out_path.open("rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    out_f.write(b"\n")
+        errors = asyncio.run(main())
     print()
 
-    # 按 paper_id 排序写出 JSONL
-    results.sort(key=lambda o: str(o.get("paper_id", "")))
-    with out_path.open("w", encoding="utf-8") as f:
-        for obj in results:
-            f.write(json.dumps(obj, ensure_ascii=False))
-            f.write("\n")
+    # 行顺序为完成顺序（下游按 paper_id 建索引，不依赖顺序）；--finalize 时按 paper_id 排序重写
+    if args.finalize:
+        sort_jsonl_by_paper_id(out_path)
+    if _blocks_cache is not None:
+        _blocks_cache.close()
+        _blocks_cache = None
 
     print(f"[PAPER_ASSETS] out_path={out_path}", flush=True)
-    print(f"[PAPER_ASSETS] total={total} written={len(results)} errors={errors}", flush=True)
+    print(f"[PAPER_ASSETS] total={total} written={written} errors={errors}", flush=True)
     print("============结束生成 paper_assets ============", flush=True)
 
 
@@ -10,11 +10,23 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-import pandas as pd
+try:
+    import orjson
+except ImportError:  # 可选加速依赖，缺失时回落到标准库 json
+    orjson = None
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from config.config import DATA_ROOT  # noqa: E402
 
+# 实验结果 bullet：模式 1 "Task：Metric = Score (±Delta)"（score/delta）与模式 2 "Task：Metric = ±Score"（score2）
+_RESULT_RE = re.compile(
+    r"(?P<task>.*?)[：:](?P<metric>.*?)[=≈]\s*"
+    r"(?:(?P<score>[\d\.]+%?)\s*\((?P<delta>[\+\-↑↓][\d\.]+%?)"
+    r"|(?P<score2>[\+\-↑↓][\d\.]+%?(?:\s*(?:pts|points|分))?))"
+)
+# 方法论 bullet：【Key】：Value 或 【Key】: Value（忽略前导空格）
+_METHOD_KV_RE = re.compile(r"^\s*【(.*?)】[：:]\s*(.*)$")
+
 
 # ---------------------------------------------------------------------------
 # 通用工具
@@ -24,6 +36,19 @@ def today_str() -> str:
     return datetime.now().date().isoformat()
 
 
+def _json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode("utf-8", errors="ignore"))
+
+
+def _json_dumps_str(obj: Any) -> str:
+    """序列化为 str（不转义中文），用于写入 SQLite TEXT 列。"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False)
+
+
 def load_paper_assets(date_str: str) -> List[Dict[str, Any]]:
     """从 data/paper_assets/{date_str}.jsonl 加载全部论文记录。"""
     # 兼容处理：如果没有传日期，尝试读取当前目录下的测试文件，或者构建路径
@@ -39,13 +64,12 @@ def load_paper_assets(date_str: str) -> List[Dict[str, Any]]:
         return []
 
     records: List[Dict[str, Any]] = []
-    with assets_path.open("r", encoding="utf-8") as f:
+    with assets_path.open("rb") as f:
         for line in f:
-            line = line.strip()
-            if not line:
+            if line.isspace():
                 continue
             try:
-                records.append(json.loads(line))
+                records.append(_json_loads(line))
             except json.JSONDecodeError:
                 continue
     return records
@@ -87,42 +111,33 @@ def parse_results_table(paper_json: Dict[str, Any]) -> List[Dict[str, Any]]:
     for bullet in bullets:
         if not isinstance(bullet, str): continue
 
-        # 模式 1: "Task：Metric = Score (±Delta)"
-        m = re.search(r"(.*?)[：:](.*?)[=≈]\s*([\d\.]+%?)\s*\(([\+\-↑↓][\d\.]+%?)", bullet)
-        if m:
-            rows.append({
-                "Paper_ID": paper_id,
-                "Title": title,
-                "Task": m.group(1).strip(),
-                "Metric": m.group(2).strip(),
-                "Score": m.group(3).strip(),
-                "Improvement": m.group(4).strip(),
-            })
-            continue
-
-        # 模式 2: "Task：Metric = ±Score"
-        m = re.search(r"(.*?)[：:](.*?)[=≈]\s*([\+\-↑↓][\d\.]+%?(?:\s*(?:pts|points|分))?)", bullet)
-        if m:
-            rows.append({
-                "Paper_ID": paper_id,
-                "Title": title,
-                "Task": m.group(1).strip(),
-                "Metric": m.group(2).strip(),
-                "Score": m.group(3).strip(),
-                "Improvement": m.group(3).strip(),
-            })
+        m = _RESULT_RE.search(bullet)
+        if not m:
             continue
+        if m.group("score") is not None:
+            # 模式 1: "Task：Metric = Score (±Delta)"
+            score, improvement = m.group("score"), m.group("delta")
+        else:
+            # 模式 2: "Task：Metric = ±Score"
+            score = improvement = m.group("score2")
+        rows.append({
+            "Paper_ID": paper_id,
+            "Title": title,
+            "Task": m.group("task").strip(),
+            "Metric": m.group("metric").strip(),
+            "Score": score.strip(),
+            "Improvement": improvement.strip(),
+        })
 
     return rows
 
 
-def visualize_results(papers: List[Dict[str, Any]]) -> pd.DataFrame:
-    """生成实验结果 DataFrame"""
-    if not papers: return pd.DataFrame()
-    all_rows = []
+def visualize_results(papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """生成实验结果行列表"""
+    all_rows: List[Dict[str, Any]] = []
     for paper in papers:
         all_rows.extend(parse_results_table(paper))
-    return pd.DataFrame(all_rows)
+    return all_rows
 
 
 # ---------------------------------------------------------------------------
@@ -147,13 +162,9 @@ def parse_method_row(paper_json: Dict[str, Any]) -> Dict[str, Any]:
     bullets = method_block.get("bullets", [])
     if not isinstance(bullets, list): return row
 
-    # 正则：匹配 【Key】：Value 或 【Key】: Value
-    # 忽略前导空格
-    pattern = re.compile(r"^\s*【(.*?)】[：:]\s*(.*)$")
-
     for bullet in bullets:
         if not isinstance(bullet, str): continue
-        match = pattern.match(bullet)
+        match = _METHOD_KV_RE.match(bullet)
         if match:
             key = match.group(1).strip()
             val = match.group(2).strip()
@@ -166,43 +177,78 @@ def parse_method_row(paper_json: Dict[str, Any]) -> Dict[str, Any]:
     return row
 
 
-def visualize_methods(papers: List[Dict[str, Any]]) -> pd.DataFrame:
-    """生成方法论对比 DataFrame"""
-    if not papers: return pd.DataFrame()
-    
-    all_rows = []
-    for paper in papers:
-        all_rows.append(parse_method_row(paper))
-    
-    df = pd.DataFrame(all_rows)
-    
+def _normalize_training(val: Any) -> Any:
+    """归一化 "是否训练" 列为 YES / NO。"""
+    if not isinstance(val, str) or not val.strip():
+        return val
+    s = val.strip()
+    if s.startswith("是") or s.lower().startswith("yes"):
+        return "YES"
+    if s.startswith("否") or s.lower().startswith("no"):
+        return "NO"
+    return s
+
+
+def visualize_methods(papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """生成方法论对比行列表（每行的 key 顺序即列顺序）"""
+    if not papers: return []
+
+    all_rows = [parse_method_row(paper) for paper in papers]
+
     # --- 列排序美化 ---
     # 我们希望某些重要的列排在前面，而不是按字母顺序乱排
     priority_cols = ["Paper_ID", "Title", "是否训练", "输入", "架构", "关键机制", "创新点"]
-    
-    # 找出 DataFrame 中实际存在的列
-    existing_cols = df.columns.tolist()
-    
+
+    # 找出所有行中实际出现的列（保持首次出现顺序）
+    existing_cols = list(dict.fromkeys(k for row in all_rows for k in row))
+
     # 1. 先放 Priority 中存在的列
     final_cols = [c for c in priority_cols if c in existing_cols]
-    
+
     # 2. 再放剩下的列
     final_cols += [c for c in existing_cols if c not in final_cols]
-    
-    # --- 归一化 "是否训练" 列 ---
-    if "是否训练" in df.columns:
-        def _normalize_training(val: Any) -> str:
-            if not isinstance(val, str) or not val.strip():
-                return str(val)
-            s = val.strip()
-            if s.startswith("是") or s.lower().startswith("yes"):
-                return "YES"
-            if s.startswith("否") or s.lower().startswith("no"):
-                return "NO"
-            return s
-        df["是否训练"] = df["是否训练"].apply(_normalize_training)
-
-    return df[final_cols]
+
+    # --- 归一化 "是否训练" 列，并按 final_cols 补齐缺失列 ---
+    out: List[Dict[str, Any]] = []
+    for row in all_rows:
+        if "是否训练" in row:
+            row["是否训练"] = _normalize_training(row["是否训练"])
+        out.append({c: row.get(c) for c in final_cols})
+    return out
+
+
+def format_table(rows: List[Dict[str, Any]], max_colwidth: int = 40) -> str:
+    """将行列表格式化为等宽文本表格（替代 DataFrame.to_string）。"""
+    if not rows:
+        return ""
+    cols = list(rows[0].keys())
+
+    def _cell(v: Any) -> str:
+        s = "" if v is None else str(v).replace("\n", " ")
+        return s if len(s) <= max_colwidth else s[: max_colwidth - 3] + "..."
+
+    cells = [[_cell(r.get(c)) for c in cols] for r in rows]
+    widths = [
+        max(len(c), *(len(line[i]) for line in cells))
+        for i, c in enumerate(cols)
+    ]
+    lines = ["  ".join(c.rjust(w) for c, w in zip(cols, widths))]
+    for line in cells:
+        lines.append("  ".join(v.rjust(w) for v, w in zip(line, widths)))
+    return "\n".join(lines)
+
+
+def _print_rows(rows: List[Dict[str, Any]], max_colwidth: int, pretty: bool) -> None:
+    if pretty:
+        # 可选：pandas 渲染（仅在 --pretty 时导入）
+        import pandas as pd
+
+        pd.set_option("display.max_columns", None)
+        pd.set_option("display.width", 200)
+        pd.set_option("display.max_colwidth", max_colwidth)
+        _safe_print(pd.DataFrame(rows).to_string(index=False))
+    else:
+        _safe_print(format_table(rows, max_colwidth=max_colwidth))
 
 
 # ---------------------------------------------------------------------------
@@ -210,7 +256,7 @@ def visualize_methods(papers: List[Dict[str, Any]]) -> pd.DataFrame:
 # ---------------------------------------------------------------------------
 
 def init_db(conn: sqlite3.Connection) -> None:
-    """创建 3 张表（如不存在）。"""
+    """创建 3 张表及日期索引（如不存在）。"""
     conn.executescript("""
         CREATE TABLE IF NOT EXISTS papers (
             paper_id   TEXT    NOT NULL,
@@ -244,10 +290,15 @@ def init_db(conn: sqlite3.Connection) -> None:
             date          TEXT NOT NULL,
             PRIMARY KEY (paper_id, date)
         );
+
+        -- 主键以 paper_id 开头，按日期删除/查询需要单独的 date 索引
+        CREATE INDEX IF NOT EXISTS idx_papers_date  ON papers(date);
+        CREATE INDEX IF NOT EXISTS idx_results_date ON results(date);
+        CREATE INDEX IF NOT EXISTS idx_methods_date ON methods(date);
     """)
 
 
-# 方法论 DataFrame 中文列名 → DB 英文列名 的映射
+# 方法论行中文列名 → DB 英文列名 的映射
 _METHOD_COL_MAP: Dict[str, str] = {
     "Paper_ID":  "paper_id",
     "Title":     "title",
@@ -262,78 +313,88 @@ _METHOD_COL_MAP: Dict[str, str] = {
 def save_to_db(
     date_str: str,
     papers: List[Dict[str, Any]],
-    df_results: pd.DataFrame,
-    df_methods: pd.DataFrame,
+    results: List[Dict[str, Any]],
+    methods: List[Dict[str, Any]],
 ) -> None:
     """将原始论文数据与分析结果写入 SQLite（同日期覆盖模式）。"""
     db_path = get_db_path()
     conn = sqlite3.connect(str(db_path))
     try:
+        # WAL + NORMAL：单事务批量写入时只需一次 fsync；临时表与页缓存放内存（64 MiB）
+        conn.executescript(
+            "PRAGMA journal_mode=WAL;"
+            "PRAGMA synchronous=NORMAL;"
+            "PRAGMA temp_store=MEMORY;"
+            "PRAGMA cache_size=-65536;"
+        )
         init_db(conn)
-        cur = conn.cursor()
-
-        # ---------- 1. 清除该日期旧数据 ----------
-        for table in ("papers", "results", "methods"):
-            cur.execute(f"DELETE FROM {table} WHERE date = ?", (date_str,))
 
-        # ---------- 2. 写入 papers 基表 ----------
-        for p in papers:
-            cur.execute(
+        paper_rows = [
+            (
+                p.get("paper_id", ""),
+                p.get("title", ""),
+                p.get("url", ""),
+                p.get("year"),
+                date_str,
+                _json_dumps_str(p.get("blocks", {})),
+            )
+            for p in papers
+        ]
+        result_rows = [
+            (
+                r.get("Paper_ID", ""),
+                r.get("Title", ""),
+                r.get("Task", ""),
+                r.get("Metric", ""),
+                r.get("Score", ""),
+                r.get("Improvement", ""),
+                date_str,
+            )
+            for r in results
+        ]
+        # 按 _METHOD_COL_MAP 的顺序取列，缺失列填空串
+        method_rows = [
+            (*(r.get(c, "") for c in _METHOD_COL_MAP), date_str)
+            for r in methods
+        ]
+
+        # 删除旧数据 + 写入新数据放在同一个事务里
+        # with conn：成功提交，异常回滚
+        with conn:
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            # ---------- 1. 清除该日期旧数据 ----------
+            for table in ("papers", "results", "methods"):
+                cur.execute(f"DELETE FROM {table} WHERE date = ?", (date_str,))
+
+            # ---------- 2. 写入 papers 基表 ----------
+            cur.executemany(
                 "INSERT INTO papers (paper_id, title, url, year, date, blocks_json) "
                 "VALUES (?, ?, ?, ?, ?, ?)",
-                (
-                    p.get("paper_id", ""),
-                    p.get("title", ""),
-                    p.get("url", ""),
-                    p.get("year"),
-                    date_str,
-                    json.dumps(p.get("blocks", {}), ensure_ascii=False),
-                ),
+                paper_rows,
+            )
+
+            # ---------- 3. 写入 results 表 ----------
+            cur.executemany(
+                "INSERT INTO results "
+                "(paper_id, title, task, metric, score, improvement, date) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                result_rows,
+            )
+
+            # ---------- 4. 写入 methods 表 ----------
+            cur.executemany(
+                "INSERT INTO methods "
+                "(paper_id, title, is_training, input, architecture, "
+                "key_mechanism, innovation, date) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                method_rows,
             )
 
-        # ---------- 3. 写入 results 表 ----------
-        if not df_results.empty:
-            for _, row in df_results.iterrows():
-                cur.execute(
-                    "INSERT INTO results "
-                    "(paper_id, title, task, metric, score, improvement, date) "
-                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
-                    (
-                        row.get("Paper_ID", ""),
-                        row.get("Title", ""),
-                        row.get("Task", ""),
-                        row.get("Metric", ""),
-                        row.get("Score", ""),
-                        row.get("Improvement", ""),
-                        date_str,
-                    ),
-                )
-
-        # ---------- 4. 写入 methods 表 ----------
-        if not df_methods.empty:
-            for _, row in df_methods.iterrows():
-                cur.execute(
-                    "INSERT INTO methods "
-                    "(paper_id, title, is_training, input, architecture, "
-                    "key_mechanism, innovation, date) "
-                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                    (
-                        row.get("Paper_ID", ""),
-                        row.get("Title", ""),
-                        row.get("是否训练", ""),
-                        row.get("输入", ""),
-                        row.get("架构", ""),
-                        row.get("关键机制", ""),
-                        row.get("创新点", ""),
-                        date_str,
-                    ),
-                )
-
-        conn.commit()
         _safe_print(
             f"[PAPER_ASSETS_ANALYSIS] Saved to {db_path} "
-            f"({len(papers)} papers, {len(df_results)} results, "
-            f"{len(df_methods)} methods)"
+            f"({len(papers)} papers, {len(results)} results, "
+            f"{len(methods)} methods)"
         )
     finally:
         conn.close()
@@ -346,6 +407,7 @@ def save_to_db(
 def run() -> None:
     ap = argparse.ArgumentParser("paper_assets_analysis")
     ap.add_argument("--date", default="", help="日期字符串，如 2026-02-07；默认为今天")
+    ap.add_argument("--pretty", action="store_true", help="使用 pandas 渲染表格（需安装 pandas）")
     args = ap.parse_args()
 
     date_str = args.date.strip() if args.date else ""
@@ -362,32 +424,28 @@ def run() -> None:
         return
 
     # 2. 展示实验结果表 (原有功能)
-    df_results = visualize_results(papers)
-    if df_results.empty:
+    results = visualize_results(papers)
+    if not results:
         _safe_print("[PAPER_ASSETS_VIS] 未提取到实验结果数据")
     else:
         _safe_print("\n" + "="*50)
         _safe_print(" >>> 🏆 实验结果排行榜 (Results Leaderboard)")
         _safe_print("="*50)
-        pd.set_option("display.max_columns", None)
-        pd.set_option("display.width", 200)
-        pd.set_option("display.max_colwidth", 40)
-        _safe_print(df_results.to_string(index=False))
+        _print_rows(results, max_colwidth=40, pretty=args.pretty)
 
     # 3. 展示方法论表 (新增功能)
-    df_methods = visualize_methods(papers)
-    if df_methods.empty:
+    methods = visualize_methods(papers)
+    if not methods:
         _safe_print("[PAPER_ASSETS_VIS] 未提取到方法论数据")
     else:
         _safe_print("\n" + "="*50)
         _safe_print(" >>> 🛠️ 技术流派兵器谱 (Methodology Specs)")
         _safe_print("="*50)
         # 调整显示宽度，因为 Method 里的文字通常比较长
-        pd.set_option("display.max_colwidth", 30) 
-        _safe_print(df_methods.to_string(index=False))
+        _print_rows(methods, max_colwidth=30, pretty=args.pretty)
         
     # 4. 持久化到 SQLite
-    save_to_db(date_str, papers, df_results, df_methods)
+    save_to_db(date_str, papers, results, methods)
 
     _safe_print(f"\n[Summary] 共加载 {len(papers)} 篇论文。")
 
@@ -1,18 +1,23 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import copy
+import functools
 import os
+import random
+import re
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
-from openai import OpenAI
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI, RateLimitError
 
 import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from Controller import _llm_cache  # noqa: E402
 from config.config import (
     qwen_api_key,
     summary_base_url,
@@ -38,6 +43,27 @@ from config.config import (
 # User‑override helpers
 # ---------------------------------------------------------------------------
 
+# 缓存层只包住数据库读取：异常直接抛出、不会被缓存，一次瞬时错误不会让后续调用都拿到空配置；
+# 对外返回深拷贝，调用方修改结果不会污染缓存
+@functools.lru_cache(maxsize=128)
+def _fetch_user_config(user_id: int) -> Dict[str, Any]:
+    from services.user_settings_service import get_settings
+    return get_settings(user_id, "paper_recommend")
+
+
+@functools.lru_cache(maxsize=128)
+def _fetch_llm_preset(user_id: int, pid: int) -> Dict[str, Any]:
+    from services.user_presets_service import get_llm_preset
+    return get_llm_preset(user_id, pid) or {}
+
+
+@functools.lru_cache(maxsize=128)
+def _fetch_prompt_preset(user_id: int, pid: int) -> str:
+    from services.user_presets_service import get_prompt_preset
+    p = get_prompt_preset(user_id, pid)
+    return (p or {}).get("prompt_content", "")
+
+
 def _load_user_config(user_id: int) -> Dict[str, Any]:
     """Load merged paper_recommend settings for *user_id*.
 
@@ -45,8 +71,7 @@ def _load_user_config(user_id: int) -> Dict[str, Any]:
     so the caller can safely fall back to config.py defaults.
     """
     try:
-        from services.user_settings_service import get_settings
-        return get_settings(user_id, "paper_recommend")
+        return copy.deepcopy(_fetch_user_config(user_id))
     except Exception:
         return {}
 
@@ -58,8 +83,7 @@ def _resolve_llm_preset(user_id: int, preset_id: Any) -> Dict[str, Any]:
     except (TypeError, ValueError):
         return {}
     try:
-        from services.user_presets_service import get_llm_preset
-        return get_llm_preset(user_id, pid) or {}
+        return copy.deepcopy(_fetch_llm_preset(user_id, pid))
     except Exception:
         return {}
 
@@ -71,14 +95,19 @@ def _resolve_prompt_preset(user_id: int, preset_id: Any) -> str:
     except (TypeError, ValueError):
         return ""
     try:
-        from services.user_presets_service import get_prompt_preset
-        p = get_prompt_preset(user_id, pid)
-        return (p or {}).get("prompt_content", "")
+        return _fetch_prompt_preset(user_id, pid)
     except Exception:
         return ""
 
 
-def make_client_for_user(user_id: Optional[int] = None) -> Tuple[OpenAI, Dict[str, Any]]:
+def clear_caches() -> None:
+    """清空用户配置 / 预设的进程内缓存（配置在运行中被修改时调用）。"""
+    _fetch_user_config.cache_clear()
+    _fetch_llm_preset.cache_clear()
+    _fetch_prompt_preset.cache_clear()
+
+
+def make_client_for_user(user_id: Optional[int] = None) -> Tuple[AsyncOpenAI, Dict[str, Any]]:
     """Return (client, effective_cfg) honouring user overrides when *user_id* is given.
 
     ``effective_cfg`` contains the resolved values for ``system_prompt``,
@@ -166,12 +195,18 @@ def make_client_for_user(user_id: Optional[int] = None) -> Tuple[OpenAI, Dict[st
         raise SystemExit("LLM base URL missing (neither user preset nor config.py)")
 
     cfg["model"] = model
-    return OpenAI(api_key=key, base_url=base), cfg
+    # 系统提示词在一次运行内不变：长度只算一次，供 build_summary_request 复用
+    cfg["_sys_tokens"] = approx_input_tokens(cfg["system_prompt"] or "")
+    # SDK 自身不重试：429/5xx 的退避统一由 _create_with_retry 负责
+    return AsyncOpenAI(api_key=key, base_url=base, max_retries=0), cfg
 
 
 def approx_input_tokens(text: str) -> int:
     if not text:
         return 0
+    # 纯 ASCII 时字节数即字符数，无需复制一份 bytes
+    if text.isascii():
+        return len(text)
     return len(text.encode("utf-8", errors="ignore"))
 
 
@@ -179,57 +214,92 @@ def crop_to_input_tokens(text: str, limit_tokens: int) -> str:
     budget = int(limit_tokens)
     if budget <= 0:
         return ""
+    # UTF-8 每字符至多 4 字节：字符数 ×4 不超预算时必然无需裁剪
+    if len(text) * 4 <= budget:
+        return text
+    if text.isascii():
+        return text[:budget]
+    # 每字符至少 1 字节：前 budget 个字符已覆盖预算内的全部字节，超长文本先截断再编码
+    if len(text) > budget:
+        text = text[:budget]
     b = text.encode("utf-8", errors="ignore")
     if len(b) <= budget:
         return text
-    return b[:budget].decode("utf-8", errors="ignore")
+    i = budget
+    # 回退到字符起始字节（续字节形如 0b10xxxxxx，最多回退 3 次），切片用 memoryview 免复制
+    while i > 0 and (b[i] & 0xC0) == 0x80:
+        i -= 1
+    return str(memoryview(b)[:i], "utf-8")
 
 
 def list_md_files(root: Path) -> List[Path]:
-    return sorted(root.rglob("*.md"))
+    # os.scandir 显式栈遍历：复用目录项自带的类型信息，不再逐项 stat / 构造 Path
+    out: List[Path] = []
+    stack = [os.fspath(root)]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for e in it:
+                if e.is_dir():
+                    stack.append(e.path)
+                elif e.name.endswith(".md"):
+                    out.append(Path(e.path))
+    out.sort()
+    return out
 
 
 def today_str() -> str:
     return datetime.now().date().isoformat()
 
 
+_GATHER_SEP = b"#" * 100 + b"\n"
+
+_SECTION_HEADERS = ("🛎️", "📝", "🔎", "💡")
+_TRAILING_WS_RE = re.compile(r"[^\S\n]+$", re.M)
+_FIRST_LINE_RE = re.compile(r"^[^\S\n]*(\S.*)$", re.M)
+_TITLE_PREFIX_RE = re.compile(r"(?:笔记标题|标题)\s*[:：]?\s*(.*)", re.S)
+# 前一行非空（此时已去尾部空白）且下一行以章节 emoji 开头：在两行之间补一个空行
+_HEADER_GAP_RE = re.compile(r"(?<=\S)\n(?=[^\S\n]*(?:🛎️|📝|🔎|💡))")
+
+
 def write_gather(single_dir: Path, gather_dir: Path, date_str: str) -> Path:
     files = list_md_files(single_dir)
     gather_dir.mkdir(parents=True, exist_ok=True)
     gather_path = gather_dir / f"{date_str}.txt"
-    with gather_path.open("w", encoding="utf-8") as f:
+    # 直接按字节读写，省去逐文件 decode/encode；1 MiB 写缓冲合并小写入
+    with gather_path.open("wb", buffering=1 << 20) as f:
         first = True
         for p in files:
-            text = p.read_text(encoding="utf-8", errors="ignore").strip()
-            if not text:
+            raw = p.read_bytes().strip()
+            if not raw:
                 continue
-            if not first:
-                f.write("\n")
+            f.writelines((
+                b"" if first else b"\n",
+                _GATHER_SEP,
+                p.name.encode("utf-8"),
+                b"\n",
+                _GATHER_SEP,
+                raw,
+                b"\n",
+            ))
             first = False
-            f.write("#" * 100 + "\n")
-            f.write(f"{p.name}\n")
-            f.write("#" * 100 + "\n")
-            f.write(text)
-            f.write("\n")
     return gather_path
 
 
-def make_client() -> OpenAI:
+def make_client() -> AsyncOpenAI:
     """Legacy entry-point – creates a client using config.py (no user overrides)."""
     client, _ = make_client_for_user(user_id=None)
     return client
 
 
-def summarize_one(
-    client: OpenAI,
-    md_path: Path,
-    *,
+def build_summary_request(
+    md_text: str,
     effective_cfg: Optional[Dict[str, Any]] = None,
-) -> Tuple[Path, str]:
-    md_text = md_path.read_text(encoding="utf-8", errors="ignore")
-    if not md_text.strip():
-        return md_path, ""
-
+) -> Dict[str, Any]:
+    """构造 chat.completions 请求体（model / messages / temperature / max_tokens）。"""
     # Use effective_cfg when available (user-overridden); else config.py defaults
     ecfg = effective_cfg or {}
     sys_prompt = ecfg.get("system_prompt") or system_prompt
@@ -241,84 +311,158 @@ def summarize_one(
 
     user_content = md_text
     limit_total = hard_limit - safety_margin
-    sys_tokens = approx_input_tokens(sys_prompt)
+    sys_tokens = ecfg.get("_sys_tokens") or approx_input_tokens(sys_prompt)
     user_budget = max(1, limit_total - sys_tokens)
     user_content = crop_to_input_tokens(user_content, user_budget)
 
-    kwargs: Dict[str, Any] = {}
-    if temp is not None:
-        kwargs["temperature"] = float(temp)
-    if max_tok is not None:
-        kwargs["max_tokens"] = int(max_tok)
-
-    resp = client.chat.completions.create(
-        model=model_name,
-        messages=[
+    body: Dict[str, Any] = {
+        "model": model_name,
+        "messages": [
             {"role": "system", "content": sys_prompt},
             {"role": "user", "content": user_content},
         ],
-        stream=False,
-        **kwargs,
-    )
-    content = resp.choices[0].message.content if resp.choices else ""
+    }
+    if temp is not None:
+        body["temperature"] = float(temp)
+    if max_tok is not None:
+        body["max_tokens"] = int(max_tok)
+    return body
+
+
+def finalize_summary(md_path: Path, content: str) -> str:
+    """修正来源行并规范化格式；空回复返回空串。"""
     if not content:
-        return md_path, ""
+        return ""
     lines = content.splitlines()
     for i, line in enumerate(lines):
         if line.strip().startswith("🌐来源"):
             arxiv_id = md_path.stem
             lines[i] = f"🌐来源：arXiv,{arxiv_id}"
             break
-    content = normalize_summary_format("\n".join(lines))
-    return md_path, content
+    return normalize_summary_format("\n".join(lines))
+
+
+# 可重试：429 / 5xx / 超时 / 连接错误；400 等客户端错误直接抛出
+LLM_MAX_ATTEMPTS = 5
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (RateLimitError, APIConnectionError)):
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code >= 500
+    return False
+
+
+async def _create_with_retry(client: AsyncOpenAI, **kwargs: Any) -> Any:
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        try:
+            return await client.chat.completions.create(**kwargs)
+        except Exception as exc:
+            if attempt == LLM_MAX_ATTEMPTS - 1 or not _is_retryable(exc):
+                raise
+            await asyncio.sleep(min(30.0, 2 ** attempt) + random.random())
+
+
+async def summarize_one(
+    client: AsyncOpenAI,
+    md_path: Path,
+    *,
+    effective_cfg: Optional[Dict[str, Any]] = None,
+) -> Tuple[Path, str]:
+    md_text = md_path.read_text(encoding="utf-8", errors="ignore")
+    if not md_text.strip():
+        return md_path, ""
+
+    body = build_summary_request(md_text, effective_cfg)
+    key = _llm_cache.make_body_key(body)
+    content = _llm_cache.get(key)
+    if content is None:
+        resp = await _create_with_retry(client, stream=False, **body)
+        choice = resp.choices[0] if resp.choices else None
+        content = (choice.message.content or "") if choice else ""
+        # 只缓存完整回复；被 max_tokens 截断的回复下次重跑时重新请求
+        if choice is not None and choice.finish_reason == "stop":
+            _llm_cache.put(key, content)
+    return md_path, finalize_summary(md_path, content or "")
+
+
+def summarize_with_batch_api(
+    client: AsyncOpenAI,
+    files: List[Path],
+    single_dir: Path,
+    effective_cfg: Optional[Dict[str, Any]] = None,
+) -> Optional[Tuple[int, int]]:
+    """通过 Batch API 一次提交全部文件；返回 (写出数, 空回复/失败数)，端点不支持时返回 None。"""
+    from Controller._batch_api import run_chat_batch
+
+    requests: List[Tuple[str, Dict[str, Any]]] = []
+    by_id: Dict[str, Path] = {}
+    keys: Dict[str, str] = {}
+    cached: Dict[str, str] = {}
+    empty = 0
+    for p in files:
+        md_text = p.read_text(encoding="utf-8", errors="ignore")
+        if not md_text.strip():
+            empty += 1
+            continue
+        body = build_summary_request(md_text, effective_cfg)
+        by_id[p.stem] = p
+        keys[p.stem] = _llm_cache.make_body_key(body)
+        hit = _llm_cache.get(keys[p.stem])
+        if hit is not None:
+            cached[p.stem] = hit
+        else:
+            requests.append((p.stem, body))
+
+    batch_out = run_chat_batch(client.api_key, str(client.base_url), requests, tag="SUMMARY")
+    if batch_out is None:
+        return None
+    results: Dict[str, str] = {}
+    for cid, (content, finish_reason) in batch_out.items():
+        if cid not in keys:
+            # 结果文件里出现未提交的 custom_id：跳过，不让一条脏数据毁掉整批结果
+            print(f"[SUMMARY] skip unknown batch custom_id={cid}", flush=True)
+            continue
+        results[cid] = content
+        if finish_reason == "stop":
+            _llm_cache.put(keys[cid], content)
+    results.update(cached)
+    written = 0
+    for cid, p in by_id.items():
+        content = finalize_summary(p, results.get(cid, ""))
+        if not content.strip():
+            empty += 1
+            continue
+        (single_dir / f"{p.stem}.md").write_text(content, encoding="utf-8")
+        written += 1
+    return written, empty
 
 
 def normalize_summary_format(text: str) -> str:
     if not text.strip():
         return text
 
-    lines = text.splitlines()
-    section_headers = ("🛎️", "📝", "🔎", "💡")
-
-    def is_section_header(line: str) -> bool:
-        s = line.strip()
-        return any(s.startswith(h) for h in section_headers)
+    # 1. 各行去尾部空白
+    text = _TRAILING_WS_RE.sub("", text)
 
-    # Ensure the first line uses "笔记标题："
-    first_idx = None
-    for idx, line in enumerate(lines):
-        if line.strip():
-            first_idx = idx
-            break
-    if first_idx is None:
+    # 2. 首个非空行统一为 "笔记标题：..."
+    m = _FIRST_LINE_RE.search(text)
+    if m is None:
         return text
-
-    first = lines[first_idx].strip()
-    if first.startswith("笔记标题"):
-        rest = first[len("笔记标题"):].lstrip()
-        if rest.startswith(":") or rest.startswith("："):
-            rest = rest[1:].lstrip()
-        lines[first_idx] = f"笔记标题：{rest}".rstrip()
-    elif first.startswith("标题"):
-        rest = first[len("标题"):].lstrip()
-        if rest.startswith(":") or rest.startswith("："):
-            rest = rest[1:].lstrip()
-        lines[first_idx] = f"笔记标题：{rest}".rstrip()
-    elif is_section_header(first) or first.startswith("🔸"):
-        lines.insert(first_idx, "笔记标题：")
+    first = m.group(1)
+    t = _TITLE_PREFIX_RE.match(first)
+    if t is not None:
+        head = f"笔记标题：{t.group(1)}".rstrip()
+    elif first.startswith(_SECTION_HEADERS) or first.startswith("🔸"):
+        head = f"笔记标题：\n{m.group(0)}"
     else:
-        lines[first_idx] = f"笔记标题：{first}".rstrip()
+        head = f"笔记标题：{first}"
+    text = text[: m.start()] + head + text[m.end() :]
 
-    # Insert a blank line before each section header
-    out: List[str] = []
-    for line in lines:
-        s = line.strip()
-        if is_section_header(s):
-            if out and out[-1].strip():
-                out.append("")
-        out.append(line.rstrip())
-
-    return "\n".join(out).rstrip() + "\n"
+    # 3. 每个章节标题前保证有一个空行
+    text = _HEADER_GAP_RE.sub("\n\n", text)
+    return text.rstrip() + "\n"
 
 
 def run() -> None:
@@ -328,6 +472,11 @@ def run() -> None:
     ap.add_argument("--date", default="")
     ap.add_argument("--concurrency", type=int, default=summary_concurrency)
     ap.add_argument("--user-id", type=int, default=None, help="User ID for per-user config overrides")
+    ap.add_argument(
+        "--batch-api",
+        action="store_true",
+        help="submit all files through the provider Batch API (async, cheaper); falls back to per-request calls if unsupported",
+    )
     args = ap.parse_args()
 
     in_root = Path(args.input_dir)
@@ -391,33 +540,46 @@ def run() -> None:
     workers = max(1, int(args.concurrency or 0))
     print(f"[SUMMARY] input_dir={in_dir} total={total} concurrency={workers} user_id={args.user_id}", flush=True)
 
-    start = time.monotonic()
-    done = 0
-    empty = 0
+    if args.batch_api:
+        batch_res = summarize_with_batch_api(client, to_run, single_dir, effective_cfg)
+        if batch_res is not None:
+            written, empty = batch_res
+            print(f"[SUMMARY] batch api written={written} empty={empty}", flush=True)
+            to_run = [p for p in to_run if not (single_dir / f"{p.stem}.md").exists()]
+            if to_run:
+                print(f"[SUMMARY] {len(to_run)} files without batch output, retry per-request", flush=True)
+            total = len(to_run)
 
-    def task(md_path: Path) -> Tuple[Path, str]:
-        path, content = summarize_one(client, md_path, effective_cfg=effective_cfg)
-        if not content.strip():
-            return path, ""
-        out_path = single_dir / f"{path.stem}.md"
-        out_path.write_text(content, encoding="utf-8")
-        return path, content
-
-    with ThreadPoolExecutor(max_workers=workers) as ex:
-        future_map = {ex.submit(task, p): p for p in to_run}
-        for fut in as_completed(future_map):
-            src = future_map[fut]
-            try:
-                _, content = fut.result()
-                if not content.strip():
-                    empty += 1
-            except Exception as e:
-                print(f"\r[SUMMARY] error on {src.name}: {e!r}", end="", flush=True)
-            done += 1
-            elapsed = time.monotonic() - start
-            rate = done / elapsed if elapsed > 0 else 0.0
-            print(f"\r[SUMMARY] progress done={done}/{total} empty={empty} rate={rate:.2f}/s", end="", flush=True)
+    start = time.monotonic()
 
+    async def main() -> None:
+        done = 0
+        empty = 0
+        # workers 个协程共享同一迭代器逐个取任务：在途请求数有界，不必一次创建全部协程
+        pending = iter(to_run)
+
+        async def worker() -> None:
+            # 单事件循环内计数器与迭代器无需加锁；本地文件写入很快，保持同步
+            nonlocal done, empty
+            for md_path in pending:
+                try:
+                    path, content = await summarize_one(client, md_path, effective_cfg=effective_cfg)
+                    if content.strip():
+                        out_path = single_dir / f"{path.stem}.md"
+                        out_path.write_text(content, encoding="utf-8")
+                    else:
+                        empty += 1
+                except Exception as e:
+                    print(f"\r[SUMMARY] error on {md_path.name}: {e!r}", end="", flush=True)
+                done += 1
+                elapsed = time.monotonic() - start
+                rate = done / elapsed if elapsed > 0 else 0.0
+                print(f"\r[SUMMARY] progress done={done}/{total} empty={empty} rate={rate:.2f}/s", end="", flush=True)
+
+        await asyncio.gather(*[worker() for _ in range(min(workers, total))])
+        await client.close()
+
+    asyncio.run(main())
     print()
     gather_path = write_gather(single_dir, gather_dir, date_str)
     print(f"[SUMMARY] single_dir={single_dir}", flush=True)
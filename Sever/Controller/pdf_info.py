@@ -1,15 +1,26 @@
 import argparse
 import concurrent.futures
+import copy
+import functools
+import itertools
 import json
 import os
+import random
 import re
 import sys
 import time
+from dataclasses import asdict, dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-import requests
+import httpx
+from openai import APIConnectionError, APIStatusError, OpenAI, RateLimitError
+
+try:
+    import orjson
+except ImportError:  # 可选加速依赖，缺失时回落到标准库 json
+    orjson = None
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from config.config import qwen_api_key as CFG_QWEN_KEY  # noqa: E402
@@ -20,16 +31,77 @@ from config.config import org_max_tokens as CFG_MAX_TOKENS  # noqa: E402
 from config.config import pdf_info_system_prompt as CFG_INFO_PROMPT  # noqa: E402
 from config.config import DATA_ROOT, PAPER_THEME_FILTER_DIR  # noqa: E402
 from config.config import pdf_info_concurrency  # noqa: E402
+from Controller import _llm_cache  # noqa: E402
+
+
+_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_ARXIV_RE = re.compile(r"arxiv,\s*([0-9]+\.[0-9]+)")
+
+
+def _json_loads(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, bytes):
+        data = data.decode("utf-8", errors="ignore")
+    return json.loads(data)
+
+
+def _json_dumps(obj: Any, indent: bool = False) -> bytes:
+    """序列化为 UTF-8 字节（不转义中文）；indent=True 时与原先 indent=2 的排版一致。"""
+    if orjson is not None:
+        # orjson 原生序列化 dataclass，字段顺序即定义顺序
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None, default=asdict).encode("utf-8")
+
+
+@dataclass(slots=True)
+class PaperItem:
+    """单篇论文的机构识别结果；序列化后与原先的 dict 键及顺序一致。"""
+
+    title: str
+    source: str
+    published: str
+    instution: str
+    is_large: bool
+    abstract: str
+
+
+# 旧聚合文件 / 增量 NDJSON 中读回的条目仍为 dict，新产出的条目为 PaperItem
+AggItem = Union[PaperItem, Dict[str, Any]]
+
+
+HTTP_POOL_SIZE = 64
 
 
 # ---------------------------------------------------------------------------
 # User-config helpers
 # ---------------------------------------------------------------------------
 
+# 缓存层只包住数据库读取：异常直接抛出、不会被缓存，一次瞬时错误不会让后续调用都拿到空配置；
+# 对外返回深拷贝，调用方修改结果不会污染缓存
+@functools.lru_cache(maxsize=128)
+def _fetch_user_config(user_id: int) -> Dict[str, Any]:
+    from services.user_settings_service import get_settings
+    return get_settings(user_id, "paper_recommend")
+
+
+@functools.lru_cache(maxsize=128)
+def _fetch_llm_preset(user_id: int, pid: int) -> Dict[str, Any]:
+    from services.user_presets_service import get_llm_preset
+    return get_llm_preset(user_id, pid) or {}
+
+
+@functools.lru_cache(maxsize=128)
+def _fetch_prompt_preset(user_id: int, pid: int) -> str:
+    from services.user_presets_service import get_prompt_preset
+    p = get_prompt_preset(user_id, pid)
+    return (p or {}).get("prompt_content", "")
+
+
 def _load_user_config(user_id: int) -> Dict[str, Any]:
     try:
-        from services.user_settings_service import get_settings
-        return get_settings(user_id, "paper_recommend")
+        return copy.deepcopy(_fetch_user_config(user_id))
     except Exception:
         return {}
 
@@ -40,8 +112,7 @@ def _resolve_llm_preset(user_id: int, preset_id: Any) -> Dict[str, Any]:
     except (TypeError, ValueError):
         return {}
     try:
-        from services.user_presets_service import get_llm_preset
-        return get_llm_preset(user_id, pid) or {}
+        return copy.deepcopy(_fetch_llm_preset(user_id, pid))
     except Exception:
         return {}
 
@@ -52,13 +123,18 @@ def _resolve_prompt_preset(user_id: int, preset_id: Any) -> str:
     except (TypeError, ValueError):
         return ""
     try:
-        from services.user_presets_service import get_prompt_preset
-        p = get_prompt_preset(user_id, pid)
-        return (p or {}).get("prompt_content", "")
+        return _fetch_prompt_preset(user_id, pid)
     except Exception:
         return ""
 
 
+def clear_caches() -> None:
+    """清空用户配置 / 预设的进程内缓存（配置在运行中被修改时调用）。"""
+    _fetch_user_config.cache_clear()
+    _fetch_llm_preset.cache_clear()
+    _fetch_prompt_preset.cache_clear()
+
+
 def _resolve_llm_for_user(user_id: Optional[int]) -> Dict[str, Any]:
     """Return effective LLM connection + prompt config for *user_id*.
 
@@ -125,7 +201,7 @@ def find_latest_date_dir(root: Path) -> Tuple[Path, str]:
     for d in root.iterdir():
         if not d.is_dir():
             continue
-        m = re.fullmatch(r"\d{4}-\d{2}-\d{2}", d.name)
+        m = _DATE_RE.fullmatch(d.name)
         if not m:
             continue
         cand.append((d, d.name))
@@ -136,14 +212,18 @@ def find_latest_date_dir(root: Path) -> Tuple[Path, str]:
 
 
 def list_md_files(in_dir: Path) -> List[Path]:
-    return sorted([p for p in in_dir.glob("*.md") if p.is_file()])
+    # 单层目录：直接用 scandir 的 is_file()，免去每个文件一次额外 stat
+    try:
+        with os.scandir(in_dir) as it:
+            return sorted(Path(e.path) for e in it if e.name.endswith(".md") and e.is_file())
+    except OSError:
+        return []
 
 
 def read_text_clip(path: Path, max_chars: int = 120000) -> str:
-    t = path.read_text(encoding="utf-8", errors="ignore")
-    if len(t) > max_chars:
-        return t[:max_chars]
-    return t
+    # 文本模式 read(n) 按字符计数，只解码前 max_chars 个字符（换行转换与 read_text 一致）
+    with path.open("r", encoding="utf-8", errors="ignore") as f:
+        return f.read(max_chars)
 
 
 def find_latest_json(root: Path) -> Path:
@@ -156,9 +236,9 @@ def find_latest_json(root: Path) -> Path:
 
 
 def parse_arxiv_json(json_path: Path) -> Dict[str, Dict[str, str]]:
-    text = json_path.read_text(encoding="utf-8", errors="ignore")
+    raw = json_path.read_bytes()
     try:
-        obj = json.loads(text) if text.strip() else {}
+        obj = _json_loads(raw) if raw.strip() else {}
     except Exception:
         obj = {}
     papers = obj.get("papers") if isinstance(obj, dict) else None
@@ -180,14 +260,8 @@ def parse_arxiv_json(json_path: Path) -> Dict[str, Dict[str, str]]:
     return meta
 
 
-def call_qwen(api_key: str, base_url: str, model: str, system_prompt: str, user_content: str, temperature: float, max_tokens: int) -> str:
-    url = base_url.rstrip("/") + "/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-    }
-    payload = {
+def build_chat_body(model: str, system_prompt: str, user_content: str, temperature: float, max_tokens: int) -> Dict[str, Any]:
+    return {
         "model": model,
         "messages": [
             {"role": "system", "content": system_prompt},
@@ -195,24 +269,65 @@ def call_qwen(api_key: str, base_url: str, model: str, system_prompt: str, user_
         ],
         "temperature": float(temperature) if temperature is not None else 1.0,
         "max_tokens": int(max_tokens) if max_tokens is not None else 1024,
-        "stream": False,
     }
-    r = requests.post(url, headers=headers, json=payload, timeout=(20, 120))
-    r.raise_for_status()
-    data = r.json()
-    if not isinstance(data, dict):
-        return "{}"
-    choices = data.get("choices") or []
-    if not choices:
-        return "{}"
-    msg = choices[0].get("message") or {}
-    content = msg.get("content") or ""
-    return content or "{}"
+
+
+def make_client(api_key: str, base_url: str) -> OpenAI:
+    # 线程池内所有请求共用一个客户端：HTTP/2 在同一 TLS 连接上多路复用；
+    # SDK 自身不重试（max_retries=0），429/5xx 的退避统一由 _create_with_retry 负责
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE),
+        http2=True,
+        timeout=httpx.Timeout(120.0, connect=20.0),
+    )
+    return OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+
+
+# 可重试：429 / 5xx / 超时 / 连接错误；400 等客户端错误直接抛出
+LLM_MAX_ATTEMPTS = 5
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (RateLimitError, APIConnectionError)):
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code >= 500
+    return False
+
+
+def _create_with_retry(client: OpenAI, **kwargs: Any) -> Any:
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        try:
+            return client.chat.completions.create(**kwargs)
+        except Exception as exc:
+            if attempt == LLM_MAX_ATTEMPTS - 1 or not _is_retryable(exc):
+                raise
+            time.sleep(min(30.0, 2 ** attempt) + random.random())
+
+
+def call_qwen(client: OpenAI, body: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+    """返回 (回复文本, finish_reason)。"""
+    resp = _create_with_retry(client, **body, stream=False)
+    if not resp.choices:
+        return "{}", None
+    choice = resp.choices[0]
+    return choice.message.content or "{}", choice.finish_reason
+
+
+def dedup_by_arxiv_id(items: List[AggItem]) -> Dict[str, AggItem]:
+    """按 source 中的 arxiv_id 去重（后出现者覆盖），无法识别 id 的条目丢弃。"""
+    out: Dict[str, AggItem] = {}
+    for it in items:
+        source = it.source if isinstance(it, PaperItem) else it.get("source")
+        m = _ARXIV_RE.search(str(source or ""))
+        if m:
+            out[m.group(1)] = it
+    return out
 
 
 def parse_json_or_fallback(text: str) -> Dict[str, Any]:
     try:
-        obj = json.loads(text)
+        obj = _json_loads(text)
         if isinstance(obj, dict):
             return obj
     except Exception:
@@ -224,6 +339,23 @@ def parse_json_or_fallback(text: str) -> Dict[str, Any]:
     }
 
 
+def iter_completed_bounded(
+    ex: concurrent.futures.Executor,
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+    window: int,
+) -> Iterator[concurrent.futures.Future]:
+    """滑动窗口提交：最多 window 个任务在途，每完成一个补交一个，按完成顺序产出 future。"""
+    it = iter(items)
+    pending = {ex.submit(fn, x) for x in itertools.islice(it, window)}
+    while pending:
+        done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for fut in done:
+            for x in itertools.islice(it, 1):
+                pending.add(ex.submit(fn, x))
+            yield fut
+
+
 def run(args: argparse.Namespace) -> None:
     preview_root = Path(args.in_md_root)
     preview_dir, date_dir = find_latest_date_dir(preview_root)
@@ -254,31 +386,36 @@ def run(args: argparse.Namespace) -> None:
     model = llm_cfg["model"]
     temperature = llm_cfg["temperature"]
     max_tokens = llm_cfg["max_tokens"]
-    agg: List[Dict[str, Any]] = []
+    agg: List[AggItem] = []
     if out_path.exists():
         try:
-            agg_text = out_path.read_text(encoding="utf-8", errors="ignore")
-            obj = json.loads(agg_text)
+            obj = _json_loads(out_path.read_bytes())
             if isinstance(obj, list):
                 agg = obj
         except Exception:
             agg = []
-    existing_ids: set[str] = set()
-    if agg:
-        for it in agg:
-            src = str(it.get("source") or "")
-            m = re.search(r"arxiv,\s*([0-9]+\.[0-9]+)", src)
-            if m:
-                existing_ids.add(m.group(1))
-    if agg:
-        dedup: Dict[str, Dict[str, Any]] = {}
-        for it in agg:
-            src = str(it.get("source") or "")
-            m = re.search(r"arxiv,\s*([0-9]+\.[0-9]+)", src)
-            if m:
-                dedup[m.group(1)] = it
+    # 上次运行中断时，已完成条目只在增量 NDJSON 中：并入 agg 后统一去重
+    part_path = out_path.with_suffix(".ndjson")
+    merged_part = False
+    if part_path.exists():
+        with part_path.open("rb") as f:
+            for line in f:
+                try:
+                    it = _json_loads(line)
+                except ValueError:
+                    continue
+                if isinstance(it, dict):
+                    agg.append(it)
+                    merged_part = True
+    # 一次遍历完成去重，已处理 id 即去重字典的键
+    dedup = dedup_by_arxiv_id(agg)
+    existing_ids = dedup.keys()
+    # 无重复、无可丢弃条目且未并入增量时，磁盘上的聚合文件已是最终内容，跳过整份重写
+    if merged_part or len(dedup) != len(agg):
         agg = list(dedup.values())
-        out_path.write_text(json.dumps(agg, ensure_ascii=False, indent=2), encoding="utf-8")
+        out_path.write_bytes(_json_dumps(agg, indent=True))
+    if part_path.exists():
+        part_path.unlink()
     remaining_files = [p for p in md_files if p.stem not in existing_ids]
     if args.limit and args.limit > 0:
         remaining_files = remaining_files[: args.limit]
@@ -293,29 +430,83 @@ def run(args: argparse.Namespace) -> None:
     print(f"[process] total={total} concurrency={workers}", flush=True)
     start = time.monotonic()
 
-    def task(p: Path) -> Tuple[str, Dict[str, Any] | None, str]:
+    def build_user_content(p: Path) -> str:
+        content = read_text_clip(p, max_chars=args.max_chars)
+        return f"文件名：{p.name}\n文本：\n{content}"
+
+    def build_item(arxiv_id: str, out_text: str) -> PaperItem:
+        obj_small = parse_json_or_fallback(out_text)
+        meta = meta_map.get(arxiv_id, {"title": "", "source": f"arxiv, {arxiv_id}", "published": ""})
+        return PaperItem(
+            title=meta.get("title", ""),
+            source=meta.get("source", ""),
+            published=meta.get("published", ""),
+            instution=obj_small.get("instution", ""),
+            is_large=bool(obj_small.get("is_large", False)),
+            abstract=obj_small.get("abstract", ""),
+        )
+
+    def save_aggregate() -> None:
+        # 全量美化 JSON 只在结束时写一次；按 arxiv_id 去重（后出现者覆盖）
+        out_path.write_bytes(_json_dumps(list(dedup_by_arxiv_id(agg).values()), indent=True))
+
+    if getattr(args, "batch_api", False):
+        from Controller._batch_api import run_chat_batch
+
+        batch_requests = []
+        cache_keys: Dict[str, str] = {}
+        cached: Dict[str, str] = {}
+        for p in remaining_files:
+            body = build_chat_body(model, system_prompt, build_user_content(p), temperature, max_tokens)
+            cache_keys[p.stem] = _llm_cache.make_body_key(body)
+            hit = _llm_cache.get(cache_keys[p.stem])
+            if hit is not None:
+                cached[p.stem] = hit
+            else:
+                batch_requests.append((p.stem, body))
+        batch_out = run_chat_batch(api_key, base_url, batch_requests, tag="process")
+        if batch_out is not None:
+            results: Dict[str, str] = {}
+            for cid, (content, finish_reason) in batch_out.items():
+                if cid not in cache_keys:
+                    # 结果文件里出现未提交的 custom_id：跳过，不让一条脏数据毁掉整批结果
+                    print(f"[process] skip unknown batch custom_id={cid}", flush=True)
+                    continue
+                results[cid] = content
+                if finish_reason == "stop":
+                    _llm_cache.put(cache_keys[cid], content)
+            results.update(cached)
+            for p in remaining_files:
+                if p.stem in results:
+                    agg.append(build_item(p.stem, results[p.stem] or "{}"))
+            save_aggregate()
+            remaining_files = [p for p in remaining_files if p.stem not in results]
+            print(f"[process] batch api done={total - len(remaining_files)}/{total}", flush=True)
+            total = len(remaining_files)
+            if total == 0:
+                print("============结束机构识别与信息写入==============", flush=True)
+                return
+            print(f"[process] {total} files without batch output, retry per-request", flush=True)
+
+    def task(p: Path) -> Tuple[str, PaperItem | None, str]:
         arxiv_id = p.stem
         try:
-            content = read_text_clip(p, max_chars=args.max_chars)
-            user_content = f"文件名：{p.name}\n文本：\n{content}"
-            out_text = call_qwen(api_key, base_url, model, system_prompt, user_content, temperature, max_tokens)
-            obj_small = parse_json_or_fallback(out_text)
-            meta = meta_map.get(arxiv_id, {"title": "", "source": f"arxiv, {arxiv_id}", "published": ""})
-            item = {
-                "title": meta.get("title", ""),
-                "source": meta.get("source", ""),
-                "published": meta.get("published", ""),
-                "instution": obj_small.get("instution", ""),
-                "is_large": bool(obj_small.get("is_large", False)),
-                "abstract": obj_small.get("abstract", ""),
-            }
-            return arxiv_id, item, ""
+            body = build_chat_body(model, system_prompt, build_user_content(p), temperature, max_tokens)
+            key = _llm_cache.make_body_key(body)
+            out_text = _llm_cache.get(key)
+            if out_text is None:
+                out_text, finish_reason = call_qwen(client, body)
+                # 只缓存完整回复；被 max_tokens 截断的回复下次重跑时重新请求
+                if finish_reason == "stop":
+                    _llm_cache.put(key, out_text)
+            return arxiv_id, build_item(arxiv_id, out_text), ""
         except Exception as e:
             return arxiv_id, None, repr(e)
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
-        futures = [ex.submit(task, p) for p in remaining_files]
-        for fut in concurrent.futures.as_completed(futures):
+    client = make_client(api_key, base_url)
+    # 每完成一条即追加一行 NDJSON 并 flush（O(N) 写入，中断后下次启动会并入）
+    with client, part_path.open("ab") as part_f, concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
+        for fut in iter_completed_bounded(ex, task, remaining_files, workers * 2):
             try:
                 arxiv_id, item, err = fut.result()
             except Exception as e:
@@ -331,11 +522,14 @@ def run(args: argparse.Namespace) -> None:
                 errors += 1
             else:
                 agg.append(item)
-                out_path.write_text(json.dumps(agg, ensure_ascii=False, indent=2), encoding="utf-8")
+                part_f.write(_json_dumps(item) + b"\n")
+                part_f.flush()
             elapsed = time.monotonic() - start
             rate = processed / elapsed if elapsed > 0 else 0.0
             print(f"\r[process] {processed}/{total} err={errors} rate={rate:.2f}/s", end="", flush=True)
     print()
+    save_aggregate()
+    part_path.unlink()
     print("============结束机构识别与信息写入==============", flush=True)
 
 
@@ -348,6 +542,11 @@ def main() -> None:
     ap.add_argument("--concurrency", type=int, default=pdf_info_concurrency)
     ap.add_argument("--max-chars", type=int, default=120000)
     ap.add_argument("--user-id", type=int, default=None, help="user id for per-user LLM/prompt preset override")
+    ap.add_argument(
+        "--batch-api",
+        action="store_true",
+        help="submit all files through the provider Batch API; falls back to per-request calls if unsupported",
+    )
     args = ap.parse_args()
     run(args)
 
@@ -1,20 +1,31 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import copy
+import functools
 import json
 import os
+import random
 import re
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import Any, List, Tuple, Optional, Dict
 
-from openai import OpenAI
+import httpx
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI, RateLimitError
+
+try:
+    import orjson
+except ImportError:  # 可选加速依赖，缺失时回落到标准库 json
+    orjson = None
 
 import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from Controller import _llm_cache  # noqa: E402
 from config.config import (  # noqa: E402
     qwen_api_key,
     summary_limit_base_url,
@@ -46,6 +57,16 @@ from config.config import (  # noqa: E402
     SLLM,
 )
 
+_DATA_ROOT_P = Path(DATA_ROOT)
+
+
+def _json_loads(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, bytes):
+        data = data.decode("utf-8", errors="ignore")
+    return json.loads(data)
+
 
 SECTION_LABELS = {
     "intro": ("🛎️文章简介", "文章简介"),
@@ -54,6 +75,10 @@ SECTION_LABELS = {
     "opinion": ("💡个人观点", "个人观点"),
 }
 
+# 章节标题判定：去掉行首全部非文字字符（空白、#、emoji、标点）后以章节名开头
+_LABEL_TO_KEY: Dict[str, str] = {labels[1]: key for key, labels in SECTION_LABELS.items()}
+_RE_HEADING = re.compile(r"[^\w]*(" + "|".join(map(re.escape, _LABEL_TO_KEY)) + ")")
+
 # Default section limits / prompts from config.py  (may be overridden per-user)
 SECTION_LIMITS_DEFAULT: Dict[str, int] = {
     "intro": summary_limit_section_limit_intro,
@@ -69,6 +94,24 @@ SECTION_PROMPTS_DEFAULT: Dict[str, str] = {
     "opinion": summary_limit_prompt_opinion,
 }
 
+_RE_MD_HEAD = re.compile(r"^#+\s*")
+_RE_BOLD = re.compile(r"\*\*(.*?)\*\*")
+_RE_HR = re.compile(r"^-{3,}\s*$")
+# 元信息行一次匹配：「标题/来源/机构: 值」或单独成行的标签（值在下一非空行）
+_RE_META = re.compile(
+    r"^(?:"
+    r"(?:📖\s*)?标题\s*:\s*(?P<title>.+)"
+    r"|(?:🌐\s*)?(?:来源|source)\s*:\s*(?P<source>.+)"
+    r"|(?:机构|作者机构|单位|机构名)\s*:\s*(?P<inst>.+)"
+    r"|(?P<label>机构|作者机构|单位|机构名|标题|来源|source)"
+    r")$",
+    re.IGNORECASE,
+)
+# 列表前缀：项目符号与编号可单独或依次出现；匹配长度为 0 即非列表行
+_RE_LIST_PREFIX = re.compile(r"^(?:(?:[-*•]|🔹|🔸)\s*)?(?:\d+[.)]\s*)?")
+_RE_SENTENCE_END = re.compile(r"(?<=[。！？.!?])")
+_RE_ARXIV = re.compile(r"(\d{4}\.\d{4,5})(v\d+)?")
+
 # Module-level aliases kept for backward-compat (used by functions that
 # don't receive an explicit effective_cfg).
 SECTION_LIMITS = dict(SECTION_LIMITS_DEFAULT)
@@ -79,10 +122,30 @@ SECTION_PROMPTS = dict(SECTION_PROMPTS_DEFAULT)
 # User‑override helpers  (mirrors paper_summary.py)
 # ---------------------------------------------------------------------------
 
+# 用户配置 / 预设按 (参数, 时间桶) 缓存：同一分钟内的重复查询不再访问设置服务。
+# 缓存层只包住服务调用：异常直接抛出、不会被缓存；对外返回深拷贝，调用方修改结果不会污染缓存
+USER_CONFIG_TTL = 60
+
+
+def _ttl_epoch() -> int:
+    return int(time.time()) // USER_CONFIG_TTL
+
+
+@functools.lru_cache(maxsize=256)
+def _fetch_user_config(user_id: int, epoch: int) -> Dict[str, Any]:
+    from services.user_settings_service import get_settings
+    return get_settings(user_id, "paper_recommend")
+
+
+@functools.lru_cache(maxsize=256)
+def _fetch_llm_preset(user_id: int, pid: int, epoch: int) -> Dict[str, Any]:
+    from services.user_presets_service import get_llm_preset
+    return get_llm_preset(user_id, pid) or {}
+
+
 def _load_user_config(user_id: int) -> Dict[str, Any]:
     try:
-        from services.user_settings_service import get_settings
-        return get_settings(user_id, "paper_recommend")
+        return copy.deepcopy(_fetch_user_config(user_id, _ttl_epoch()))
     except Exception:
         return {}
 
@@ -93,8 +156,7 @@ def _resolve_llm_preset(user_id: int, preset_id: Any) -> Dict[str, Any]:
     except (TypeError, ValueError):
         return {}
     try:
-        from services.user_presets_service import get_llm_preset
-        return get_llm_preset(user_id, pid) or {}
+        return copy.deepcopy(_fetch_llm_preset(user_id, pid, _ttl_epoch()))
     except Exception:
         return {}
 
@@ -196,13 +258,24 @@ def build_effective_cfg(user_id: Optional[int] = None) -> Dict[str, Any]:
     return cfg
 
 
-def make_client_from_cfg(cfg: Dict[str, Any]) -> OpenAI:
-    return OpenAI(api_key=cfg["api_key"], base_url=cfg["base_url"])
+def make_client_from_cfg(cfg: Dict[str, Any], workers: int = 32) -> AsyncOpenAI:
+    # 所有协程共用一个 HTTP/2 连接池：连接保活、同一 TLS 会话上多路复用；
+    # SDK 自身不重试（max_retries=0），每个 429 都交给 _create_with_retry 与 Throttle 处理
+    pool_size = max(1, int(workers)) * 2
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        http2=True,
+        timeout=httpx.Timeout(120.0, connect=10.0),
+    )
+    return AsyncOpenAI(api_key=cfg["api_key"], base_url=cfg["base_url"], http_client=http_client, max_retries=0)
 
 
 def approx_input_tokens(text: str) -> int:
     if not text:
         return 0
+    # 纯 ASCII 时字节数即字符数，无需复制一份 bytes
+    if text.isascii():
+        return len(text)
     return len(text.encode("utf-8", errors="ignore"))
 
 
@@ -210,42 +283,77 @@ def crop_to_input_tokens(text: str, limit_tokens: int) -> str:
     budget = int(limit_tokens)
     if budget <= 0:
         return ""
+    # UTF-8 每字符至多 4 字节：字符数 ×4 不超预算时必然无需裁剪
+    if len(text) * 4 <= budget:
+        return text
+    if text.isascii():
+        return text[:budget]
+    # 每字符至少 1 字节：前 budget 个字符已覆盖预算内的全部字节，超长文本先截断再编码
+    if len(text) > budget:
+        text = text[:budget]
     b = text.encode("utf-8", errors="ignore")
     if len(b) <= budget:
         return text
-    return b[:budget].decode("utf-8", errors="ignore")
+    return str(memoryview(b)[: _utf8_char_boundary(b, budget)], "utf-8")
+
+
+def _utf8_char_boundary(b: bytes, i: int) -> int:
+    # 回退到字符起始字节（续字节形如 0b10xxxxxx，最多回退 3 次），此后切片必为合法 UTF-8
+    while i > 0 and (b[i] & 0xC0) == 0x80:
+        i -= 1
+    return i
+
+
+def list_md_entries(root: Path) -> List[os.DirEntry]:
+    # 单层 scandir：目录项自带类型 / stat 缓存，按文件名排序（与原 sorted(glob) 顺序一致）
+    try:
+        with os.scandir(root) as it:
+            entries = [e for e in it if e.name.endswith(".md")]
+    except OSError:
+        return []
+    entries.sort(key=lambda e: e.name)
+    return entries
 
 
 def list_md_files(root: Path) -> List[Path]:
-    return sorted(root.glob("*.md"))
+    return [Path(e.path) for e in list_md_entries(root)]
 
 
 def today_str() -> str:
     return datetime.now().date().isoformat()
 
 
+GATHER_READ_WORKERS = 16
+
+
+def _read_stripped(p: Path) -> str:
+    return p.read_text(encoding="utf-8", errors="ignore").strip()
+
+
 def write_gather(single_dir: Path, gather_dir: Path, date_str: str) -> Path:
     files = list_md_files(single_dir)
     gather_dir.mkdir(parents=True, exist_ok=True)
     gather_path = gather_dir / f"{date_str}.txt"
-    with gather_path.open("w", encoding="utf-8") as f:
-        first = True
-        for p in files:
-            text = p.read_text(encoding="utf-8", errors="ignore").strip()
-            if not text:
-                continue
-            if not first:
-                f.write("\n")
-            first = False
-            f.write("#" * 100 + "\n")
-            f.write(f"{p.name}\n")
-            f.write("#" * 100 + "\n")
-            f.write(text)
-            f.write("\n")
+    # 多线程并发读取各文件以重叠 I/O 等待
+    with ThreadPoolExecutor(max_workers=GATHER_READ_WORKERS) as pool:
+        texts = list(pool.map(_read_stripped, files))
+    sep = "#" * 100 + "\n"
+    parts: List[str] = []
+    for p, text in zip(files, texts):
+        if not text:
+            continue
+        if parts:
+            parts.append("\n")
+        parts.extend((sep, f"{p.name}\n", sep, text, "\n"))
+    # 先写同目录临时文件再 os.replace 原子替换：中断时不会留下半截 gather；1 MiB 缓冲合并小写入
+    tmp_path = gather_path.with_suffix(".txt.tmp")
+    with tmp_path.open("w", encoding="utf-8", buffering=1 << 20) as f:
+        f.writelines(parts)
+    os.replace(tmp_path, gather_path)
     return gather_path
 
 
-def make_client() -> OpenAI:
+def make_client() -> AsyncOpenAI:
     """Legacy entry-point – creates a client using config.py defaults."""
     cfg = build_effective_cfg(user_id=None)
     return make_client_from_cfg(cfg)
@@ -262,52 +370,128 @@ def get_summary_limit_model(cfg: Optional[Dict[str, Any]] = None) -> str:
     return summary_limit_model
 
 
-def non_ws_len(text: str) -> int:
-    return len(re.sub(r"\s+", "", text))
+# 可重试：429 / 5xx / 超时 / 连接错误；400 等客户端错误直接抛出
+LLM_MAX_ATTEMPTS = 5
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (RateLimitError, APIConnectionError)):
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code >= 500
+    return False
+
+
+class Throttle:
+    """AIMD 并发控制：遇 429 在途上限减半，每连续成功 success_step 次加 1，不超过 ceil。"""
+
+    def __init__(self, initial: int, ceil: int, success_step: int = 8) -> None:
+        self.limit = max(1, int(initial))
+        self.ceil = max(self.limit, int(ceil))
+        self.success_step = max(1, int(success_step))
+        self.in_flight = 0
+        self.successes = 0
+        self.cond = asyncio.Condition()
+
+    async def __aenter__(self) -> "Throttle":
+        async with self.cond:
+            await self.cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        async with self.cond:
+            self.in_flight -= 1
+            self.cond.notify_all()
+
+    async def on_success(self) -> None:
+        async with self.cond:
+            self.successes += 1
+            if self.successes >= self.success_step and self.limit < self.ceil:
+                self.successes = 0
+                self.limit += 1
+                self.cond.notify_all()
+
+    async def on_ratelimit(self) -> None:
+        async with self.cond:
+            self.successes = 0
+            self.limit = max(1, self.limit // 2)
+
+
+# 由 run() 按 --concurrency 初始化；None 表示不做自适应限流
+_throttle: Optional[Throttle] = None
+# 自适应并发上限 = 初始并发 × 该倍数
+THROTTLE_CEIL_FACTOR = 4
+
+
+async def _create_with_retry(client: AsyncOpenAI, **kwargs: Any) -> Any:
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        try:
+            if _throttle is None:
+                return await client.chat.completions.create(**kwargs)
+            async with _throttle:
+                resp = await client.chat.completions.create(**kwargs)
+            await _throttle.on_success()
+            return resp
+        except Exception as exc:
+            if isinstance(exc, RateLimitError) and _throttle is not None:
+                await _throttle.on_ratelimit()
+            if attempt == LLM_MAX_ATTEMPTS - 1 or not _is_retryable(exc):
+                raise
+            await asyncio.sleep(min(30.0, 2 ** attempt) + random.random())
+
+
+async def _chat(
+    client: AsyncOpenAI,
+    sys_prompt: str,
+    user_content: str,
+    ecfg: Dict[str, Any],
+    **kwargs: Any,
+) -> str:
+    """单轮对话；相同 (系统提示词, 模型, 输入, 采样参数) 直接复用持久缓存中的回复，不再请求。"""
+    model = get_summary_limit_model(ecfg)
+    key = _llm_cache.make_key(sys_prompt, model, user_content, kwargs)
+    content = _llm_cache.get(key)
+    if content is not None:
+        return content
+    resp = await _create_with_retry(
+        client,
+        model=model,
+        messages=[
+            {"role": "system", "content": sys_prompt},
+            {"role": "user", "content": user_content},
+        ],
+        stream=False,
+        **kwargs,
+    )
+    if not resp.choices:
+        return ""
+    choice = resp.choices[0]
+    content = choice.message.content or ""
+    # 只缓存完整回复：空回复或被截断（finish_reason != "stop"）的结果下次运行重新请求
+    if content and choice.finish_reason == "stop":
+        _llm_cache.put(key, content)
+    return content
 
 
-def normalize_heading(line: str) -> str:
-    raw = line.strip()
-    raw = re.sub(r"^#+\s*", "", raw)
-    raw = re.sub(r"^[^\w\u4e00-\u9fff]+", "", raw)
-    raw = raw.lstrip(":：- ").strip()
-    return raw
+def non_ws_len(text: str) -> int:
+    # str.split() 无参时按 Unicode 空白切分（与正则 \s 同一字符集），C 层完成，免去 re.sub 拼出整串副本
+    return sum(map(len, text.split()))
 
 
 def heading_key(line: str) -> Optional[str]:
-    norm = normalize_heading(line)
-    for key, labels in SECTION_LABELS.items():
-        if norm.startswith(labels[0]) or norm.startswith(labels[1]):
-            return key
-    return None
+    m = _RE_HEADING.match(line)
+    return _LABEL_TO_KEY[m.group(1)] if m else None
 
 
 def split_sections(lines: List[str]) -> Tuple[List[str], List[Tuple[str, str, List[str]]]]:
-    prefix: List[str] = []
-    sections: List[Tuple[str, str, List[str]]] = []
-    current_key: Optional[str] = None
-    current_heading: str = ""
-    current_lines: List[str] = []
-
-    for line in lines:
-        key = heading_key(line)
-        if key:
-            if current_key:
-                sections.append((current_key, current_heading, current_lines))
-            elif current_lines:
-                prefix.extend(current_lines)
-            current_key = key
-            current_heading = line
-            current_lines = []
-            continue
-        if current_key is None:
-            prefix.append(line)
-        else:
-            current_lines.append(line)
-
-    if current_key:
-        sections.append((current_key, current_heading, current_lines))
-    return prefix, sections
+    # 一次扫描定位全部章节标题行，再按下标切片分段
+    hits = [(i, _LABEL_TO_KEY[m.group(1)]) for i, line in enumerate(lines) if (m := _RE_HEADING.match(line))]
+    if not hits:
+        return list(lines), []
+    ends = [i for i, _ in hits[1:]] + [len(lines)]
+    sections = [(key, lines[i], lines[i + 1 : end]) for (i, key), end in zip(hits, ends)]
+    return lines[: hits[0][0]], sections
 
 
 def ensure_section_spacing(text: str) -> str:
@@ -323,118 +507,79 @@ def ensure_section_spacing(text: str) -> str:
     return "\n".join(out).rstrip() + "\n"
 
 
+# 单独成行的标签 → 输出前缀（机构直接输出值）
+_META_LABEL_PREFIX = {
+    "机构": "", "作者机构": "", "单位": "", "机构名": "",
+    "标题": "📖标题：", "来源": "🌐来源：",
+}
+_CANONICAL_HEADING = {
+    "intro": "🛎️文章简介",
+    "method": "📝重点思路",
+    "findings": "🔎分析总结",
+    "opinion": "💡个人观点",
+}
+
+
 def normalize_style(text: str) -> str:
     lines = text.splitlines()
+    n = len(lines)
     out: List[str] = []
     i = 0
-    while i < len(lines):
+    while i < n:
         raw = lines[i].strip()
+        i += 1
         if not raw:
             out.append("")
-            i += 1
             continue
-        if re.match(r"^-{3,}\s*$", raw):
-            i += 1
+        if raw[0] == "-" and _RE_HR.match(raw):
             continue
-        line = re.sub(r"^#+\s*", "", raw).strip()
-        line = re.sub(r"\*\*(.*?)\*\*", r"\1", line)
+        line = _RE_MD_HEAD.sub("", raw).strip() if raw[0] == "#" else raw
+        if "**" in line:
+            line = _RE_BOLD.sub(r"\1", line)
         line = line.replace("：", ":")
 
-        m = re.match(r"^(?:📖\s*)?标题\s*:\s*(.+)$", line, re.IGNORECASE)
-        if m:
-            out.append(f"📖标题：{m.group(1).strip()}")
-            i += 1
-            continue
-        m = re.match(r"^(?:🌐\s*)?(?:来源|source)\s*:\s*(.+)$", line, re.IGNORECASE)
+        m = _RE_META.match(line)
         if m:
-            out.append(f"🌐来源：{m.group(1).strip()}")
-            i += 1
-            continue
-        m = re.match(r"^(?:机构|作者机构|单位|机构名)\s*:\s*(.+)$", line, re.IGNORECASE)
-        if m:
-            out.append(f"{m.group(1).strip()}")
-            i += 1
-            continue
-
-        if re.match(r"^(?:机构|作者机构|单位|机构名)$", line, re.IGNORECASE):
-            content = ""
-            j = i + 1
-            while j < len(lines):
-                candidate = lines[j].strip()
-                if candidate:
-                    content = re.sub(r"\*\*(.*?)\*\*", r"\1", candidate)
-                    break
-                j += 1
-            out.append(content)
-            i = j + 1
-            continue
-        if re.match(r"^标题$", line, re.IGNORECASE):
-            content = ""
-            j = i + 1
-            while j < len(lines):
-                candidate = lines[j].strip()
-                if candidate:
-                    content = re.sub(r"\*\*(.*?)\*\*", r"\1", candidate)
-                    break
-                j += 1
-            out.append(f"📖标题：{content}" if content else "📖标题：")
-            i = j + 1
-            continue
-        if re.match(r"^(?:来源|source)$", line, re.IGNORECASE):
-            content = ""
-            j = i + 1
-            while j < len(lines):
-                candidate = lines[j].strip()
-                if candidate:
-                    content = re.sub(r"\*\*(.*?)\*\*", r"\1", candidate)
-                    break
-                j += 1
-            out.append(f"🌐来源：{content}" if content else "🌐来源：")
-            i = j + 1
+            kind = m.lastgroup
+            if kind == "title":
+                out.append(f"📖标题：{m.group('title').strip()}")
+            elif kind == "source":
+                out.append(f"🌐来源：{m.group('source').strip()}")
+            elif kind == "inst":
+                out.append(m.group("inst").strip())
+            else:
+                # 标签单独成行：取下一非空行作为值，并跳过该行
+                content = ""
+                while i < n:
+                    candidate = lines[i].strip()
+                    i += 1
+                    if candidate:
+                        content = _RE_BOLD.sub(r"\1", candidate)
+                        break
+                # IGNORECASE 下 source 的其他大小写写法（含 Unicode 折叠）都归到来源
+                out.append(_META_LABEL_PREFIX.get(m.group("label"), "🌐来源：") + content)
             continue
 
         key = heading_key(line)
-        if key == "intro":
-            if out and out[-1].strip():
-                out.append("")
-            out.append("🛎️文章简介")
-            i += 1
-            continue
-        if key == "method":
-            if out and out[-1].strip():
-                out.append("")
-            out.append("📝重点思路")
-            i += 1
-            continue
-        if key == "findings":
-            if out and out[-1].strip():
-                out.append("")
-            out.append("🔎分析总结")
-            i += 1
-            continue
-        if key == "opinion":
+        if key:
             if out and out[-1].strip():
                 out.append("")
-            out.append("💡个人观点")
-            i += 1
+            out.append(_CANONICAL_HEADING[key])
             continue
 
-        if re.match(r"^(?:[-*•]|🔹|🔸)\s*", line) or re.match(r"^\d+[.)]\s*", line):
-            content = re.sub(r"^(?:[-*•]|🔹|🔸)\s*", "", line)
-            content = re.sub(r"^\d+[.)]\s*", "", content)
-            content = re.sub(r"\*\*(.*?)\*\*", r"\1", content).strip()
+        p = _RE_LIST_PREFIX.match(line).end()
+        if p:
+            content = _RE_BOLD.sub(r"\1", line[p:]).strip()
             if content:
                 out.append(f"🔸{content}")
-            i += 1
             continue
 
         out.append(line)
-        i += 1
     return "\n".join(out).strip() + "\n"
 
 
-def rewrite_block(
-    client: OpenAI,
+async def rewrite_block(
+    client: AsyncOpenAI,
     text: str,
     sys_prompt: str,
     limit_chars: int,
@@ -446,40 +591,126 @@ def rewrite_block(
     content = text.strip()
     if not content:
         return content
+    # 预算与请求参数在重试间不变，只算一次；每轮只对当前内容做裁剪
+    hard_limit = int(ecfg.get("input_hard_limit") or summary_limit_input_hard_limit)
+    safety_margin = int(ecfg.get("input_safety_margin") or summary_limit_input_safety_margin)
+    limit_total = hard_limit - safety_margin
+    sys_tokens = approx_input_tokens(sys_prompt)
+    user_budget = max(1, limit_total - sys_tokens)
+    temp = ecfg.get("temperature") if ecfg.get("temperature") is not None else summary_limit_temperature
+    max_tok = ecfg.get("max_tokens") if ecfg.get("max_tokens") is not None else summary_limit_max_tokens
+    kwargs: Dict[str, Any] = {}
+    if temp is not None:
+        kwargs["temperature"] = float(temp)
+    if max_tok is not None:
+        kwargs["max_tokens"] = int(max_tok)
+    prev_len = -1
     for _ in range(max_retries):
-        hard_limit = int(ecfg.get("input_hard_limit") or summary_limit_input_hard_limit)
-        safety_margin = int(ecfg.get("input_safety_margin") or summary_limit_input_safety_margin)
-        limit_total = hard_limit - safety_margin
-        sys_tokens = approx_input_tokens(sys_prompt)
-        user_budget = max(1, limit_total - sys_tokens)
         user_content = crop_to_input_tokens(content, user_budget)
-        temp = ecfg.get("temperature") if ecfg.get("temperature") is not None else summary_limit_temperature
-        max_tok = ecfg.get("max_tokens") if ecfg.get("max_tokens") is not None else summary_limit_max_tokens
-        kwargs: Dict[str, Any] = {}
-        if temp is not None:
-            kwargs["temperature"] = float(temp)
-        if max_tok is not None:
-            kwargs["max_tokens"] = int(max_tok)
-        resp = client.chat.completions.create(
-            model=get_summary_limit_model(ecfg),
-            messages=[
-                {"role": "system", "content": sys_prompt},
-                {"role": "user", "content": user_content},
-            ],
-            stream=False,
-            **kwargs,
-        )
-        new_text = resp.choices[0].message.content if resp.choices else ""
+        new_text = await _chat(client, sys_prompt, user_content, ecfg, **kwargs)
         if not new_text:
             new_text = content
         content = new_text.strip()
-        if non_ws_len(content) <= limit_chars:
+        cur_len = non_ws_len(content)
+        # 达标，或与上一轮长度相同（已收敛，再请求也不会变短）
+        if cur_len <= limit_chars or cur_len == prev_len:
             break
+        prev_len = cur_len
+    if non_ws_len(content) > limit_chars:
+        content = _sentence_truncate(content, limit_chars)
     return content
 
 
-def compress_headline(
-    client: OpenAI,
+def _sentence_truncate(text: str, limit: int) -> str:
+    """确定性兜底：按句末标点截断到不超过 limit 个非空白字符；首句即超限时按字符截断。"""
+    kept: List[str] = []
+    count = 0
+    for seg in _RE_SENTENCE_END.split(text):
+        n = non_ws_len(seg)
+        if count + n > limit:
+            break
+        kept.append(seg)
+        count += n
+    if kept:
+        return "".join(kept).strip()
+    out: List[str] = []
+    count = 0
+    for ch in text:
+        if not ch.isspace():
+            if count >= limit:
+                break
+            count += 1
+        out.append(ch)
+    return "".join(out).strip()
+
+
+BULK_REWRITE_PROMPT = (
+    "你将收到一篇论文笔记中若干需要压缩的章节，以 JSON 对象给出，键为章节名、值为章节正文。\n"
+    "请按下方各章节标签内的要求分别改写，每个章节的非空白字符数不得超过标签中的 limit。\n"
+    "只输出一个 JSON 对象，键与输入完全一致，值为改写后的正文，不要输出任何其他内容。"
+)
+
+# 合并改写依赖 response_format=json_object；后端以 400 拒绝 response_format 时本次运行内关闭，回落到逐章节改写
+_bulk_rewrite: bool = True
+
+
+def _rejects_json_mode(exc: Exception) -> bool:
+    """400 是否因后端不支持 response_format（上下文超长、内容拒绝等其它 400 不算）。"""
+    text = f"{exc} {getattr(exc, 'body', '')}".lower()
+    return "response_format" in text or "json_object" in text
+
+
+async def rewrite_sections_bulk(
+    client: AsyncOpenAI,
+    blocks: Dict[str, str],
+    sec_prompts: Dict[str, str],
+    sec_limits: Dict[str, int],
+    *,
+    effective_cfg: Optional[Dict[str, Any]] = None,
+) -> Dict[str, str]:
+    """一次请求改写全部超长章节；未返回或仍超限的章节再逐个调用 rewrite_block。"""
+    global _bulk_rewrite
+    ecfg = effective_cfg or {}
+    out: Dict[str, str] = {}
+    if _bulk_rewrite and len(blocks) > 1:
+        sys_prompt = BULK_REWRITE_PROMPT + "\n\n" + "\n\n".join(
+            f"<{key} limit={sec_limits[key]}>\n{sec_prompts[key]}\n</{key}>" for key in blocks
+        )
+        user_content = json.dumps(blocks, ensure_ascii=False)
+        hard_limit = int(ecfg.get("input_hard_limit") or summary_limit_input_hard_limit)
+        safety_margin = int(ecfg.get("input_safety_margin") or summary_limit_input_safety_margin)
+        # JSON 输入不能截断：超出预算时直接走逐章节改写
+        if approx_input_tokens(sys_prompt) + approx_input_tokens(user_content) <= hard_limit - safety_margin:
+            max_tok = ecfg.get("max_tokens") if ecfg.get("max_tokens") is not None else summary_limit_max_tokens
+            try:
+                reply = await _chat(
+                    client, sys_prompt, user_content, ecfg,
+                    max_tokens=max_tok or 2048,
+                    temperature=0,
+                    response_format={"type": "json_object"},
+                )
+            except APIStatusError as exc:
+                if exc.status_code != 400 or not _rejects_json_mode(exc):
+                    raise
+                _bulk_rewrite = False
+                reply = ""
+            try:
+                obj = json.loads(reply) if reply else {}
+            except json.JSONDecodeError:
+                obj = {}
+            if isinstance(obj, dict):
+                for key in blocks:
+                    new_text = str(obj.get(key) or "").strip()
+                    if new_text and non_ws_len(new_text) <= sec_limits[key]:
+                        out[key] = new_text
+    for key, text in blocks.items():
+        if key not in out:
+            out[key] = await rewrite_block(client, text, sec_prompts[key], limit_chars=sec_limits[key], effective_cfg=ecfg)
+    return out
+
+
+async def compress_headline(
+    client: AsyncOpenAI,
     text: str,
     *,
     effective_cfg: Optional[Dict[str, Any]] = None,
@@ -496,22 +727,12 @@ def compress_headline(
     user_budget = max(1, limit_total - sys_tokens)
     user_content = crop_to_input_tokens(content, user_budget)
     max_tok = ecfg.get("max_tokens") if ecfg.get("max_tokens") is not None else summary_limit_max_tokens
-    resp = client.chat.completions.create(
-        model=get_summary_limit_model(ecfg),
-        messages=[
-            {"role": "system", "content": sys_prompt},
-            {"role": "user", "content": user_content},
-        ],
-        stream=False,
-        max_tokens=max_tok or 2048,
-        temperature=0,
-    )
-    new_text = resp.choices[0].message.content if resp.choices else ""
+    new_text = await _chat(client, sys_prompt, user_content, ecfg, max_tokens=max_tok or 2048, temperature=0)
     return new_text.strip() if new_text else text
 
 
-def apply_headline_limit(
-    client: OpenAI,
+async def apply_headline_limit(
+    client: AsyncOpenAI,
     lines: List[str],
     *,
     effective_cfg: Optional[Dict[str, Any]] = None,
@@ -531,7 +752,7 @@ def apply_headline_limit(
             continue
         if non_ws_len(candidate) <= hl_limit:
             return lines
-        lines[prev_idx] = compress_headline(client, candidate, effective_cfg=ecfg) + "\n"
+        lines[prev_idx] = await compress_headline(client, candidate, effective_cfg=ecfg) + "\n"
         return lines
     return lines
 
@@ -539,7 +760,7 @@ def apply_headline_limit(
 def extract_arxiv_id(source: str) -> Optional[str]:
     if not source:
         return None
-    m = re.search(r"(\d{4}\.\d{4,5})(v\d+)?", source)
+    m = _RE_ARXIV.search(source)
     if not m:
         return None
     version = m.group(2) or ""
@@ -547,12 +768,13 @@ def extract_arxiv_id(source: str) -> Optional[str]:
 
 
 def load_pdf_info_map(date_str: str) -> Dict[str, Dict[str, str]]:
-    info_path = Path(DATA_ROOT) / "pdf_info" / f"{date_str}.json"
+    info_path = _DATA_ROOT_P / "pdf_info" / f"{date_str}.json"
     if not info_path.exists():
         return {}
     try:
-        data = json.loads(info_path.read_text(encoding="utf-8", errors="ignore"))
-    except json.JSONDecodeError:
+        # 直接解析字节，省去一次 UTF-8 解码
+        data = _json_loads(info_path.read_bytes())
+    except ValueError:
         return {}
     if not isinstance(data, list):
         return {}
@@ -565,6 +787,10 @@ def load_pdf_info_map(date_str: str) -> Dict[str, Dict[str, str]]:
         if not arxiv_id:
             continue
         out[arxiv_id] = item
+        # 带版本号的条目同时以无版本 id 建索引（不覆盖已有条目），查询时无需再跑正则
+        base_id, sep, _ = arxiv_id.rpartition("v")
+        if sep:
+            out.setdefault(base_id, item)
     return out
 
 
@@ -574,8 +800,9 @@ def inject_pdf_info(text: str, md_path: Path, pdf_info_map: Dict[str, Dict[str,
     key = md_path.stem
     info = pdf_info_map.get(key)
     if info is None:
-        key_no_version = re.sub(r"v\d+$", "", key)
-        info = pdf_info_map.get(key_no_version)
+        base_id, sep, ver = key.rpartition("v")
+        if sep and ver.isdigit():
+            info = pdf_info_map.get(base_id)
     if not info:
         return text
 
@@ -632,8 +859,13 @@ def inject_pdf_info(text: str, md_path: Path, pdf_info_map: Dict[str, Dict[str,
     return "\n".join(lines).rstrip() + "\n"
 
 
-def structure_matches_example(
-    client: OpenAI,
+def structure_matches_local(lines: List[str]) -> bool:
+    """四个章节标题齐全即视为结构已符合示例，无需再请求模型判定。"""
+    return {heading_key(line) for line in lines} >= SECTION_LABELS.keys()
+
+
+async def structure_matches_example(
+    client: AsyncOpenAI,
     text: str,
     *,
     effective_cfg: Optional[Dict[str, Any]] = None,
@@ -651,22 +883,12 @@ def structure_matches_example(
     sys_tokens = approx_input_tokens(sys_prompt)
     user_budget = max(1, limit_total - sys_tokens)
     user_content = crop_to_input_tokens(content, user_budget)
-    resp = client.chat.completions.create(
-        model=get_summary_limit_model(ecfg),
-        messages=[
-            {"role": "system", "content": sys_prompt},
-            {"role": "user", "content": user_content},
-        ],
-        stream=False,
-        max_tokens=8,
-        temperature=0,
-    )
-    reply = resp.choices[0].message.content.strip().upper() if resp.choices else ""
+    reply = (await _chat(client, sys_prompt, user_content, ecfg, max_tokens=8, temperature=0)).strip().upper()
     return reply.startswith("YES")
 
 
-def restructure_to_example(
-    client: OpenAI,
+async def restructure_to_example(
+    client: AsyncOpenAI,
     text: str,
     *,
     effective_cfg: Optional[Dict[str, Any]] = None,
@@ -685,22 +907,12 @@ def restructure_to_example(
     user_budget = max(1, limit_total - sys_tokens)
     user_content = crop_to_input_tokens(content, user_budget)
     max_tok = ecfg.get("max_tokens") if ecfg.get("max_tokens") is not None else summary_limit_max_tokens
-    resp = client.chat.completions.create(
-        model=get_summary_limit_model(ecfg),
-        messages=[
-            {"role": "system", "content": sys_prompt},
-            {"role": "user", "content": user_content},
-        ],
-        stream=False,
-        max_tokens=max_tok or 2048,
-        temperature=0,
-    )
-    new_text = resp.choices[0].message.content if resp.choices else ""
+    new_text = await _chat(client, sys_prompt, user_content, ecfg, max_tokens=max_tok or 2048, temperature=0)
     return new_text.strip() if new_text else text
 
 
-def process_one(
-    client: OpenAI,
+async def process_one(
+    client: AsyncOpenAI,
     md_path: Path,
     out_path: Path,
     pdf_info_map: Dict[str, Dict[str, str]],
@@ -719,24 +931,40 @@ def process_one(
     text = inject_pdf_info(text, md_path, pdf_info_map)
     base_text = normalize_style(text)
     lines = base_text.splitlines(keepends=True)
-    lines = apply_headline_limit(client, lines, effective_cfg=ecfg)
+    lines = await apply_headline_limit(client, lines, effective_cfg=ecfg)
     base_text = "".join(lines)
-    if structure_matches_example(client, base_text, effective_cfg=ecfg):
+    # 本地判定通过时短路，省掉一次 YES/NO 请求；仅在标题不全时交给模型判断
+    if structure_matches_local(lines) or await structure_matches_example(client, base_text, effective_cfg=ecfg):
         prefix, sections = split_sections(lines)
         if sections:
+            # 先收集全部超长章节（同名章节重复出现时仅首个参与合并），一次请求改写，再按原顺序拼回
+            over_limit: Dict[str, str] = {}
+            bulk_idx: Dict[str, int] = {}
+            for idx, (key, _, content_lines) in enumerate(sections):
+                block_text = "".join(content_lines).strip()
+                limit = sec_limits.get(key, 0)
+                if key not in bulk_idx and limit and sec_prompts.get(key, "") and non_ws_len(block_text) > limit:
+                    over_limit[key] = block_text
+                    bulk_idx[key] = idx
+            rewritten = (
+                await rewrite_sections_bulk(client, over_limit, sec_prompts, sec_limits, effective_cfg=ecfg)
+                if over_limit else {}
+            )
             out_lines: List[str] = []
             out_lines.extend(prefix)
-            rewritten_any = False
-            for key, heading, content_lines in sections:
+            rewritten_any = bool(rewritten)
+            for idx, (key, heading, content_lines) in enumerate(sections):
                 if out_lines and out_lines[-1].strip():
                     out_lines.append("\n")
                 out_lines.append(heading)
                 block_text = "".join(content_lines).strip()
                 limit = sec_limits.get(key, 0)
-                if limit and non_ws_len(block_text) > limit:
+                if bulk_idx.get(key) == idx:
+                    block_text = rewritten[key]
+                elif limit and non_ws_len(block_text) > limit:
                     sys_prompt = sec_prompts.get(key, "")
                     if sys_prompt:
-                        block_text = rewrite_block(
+                        block_text = await rewrite_block(
                             client, block_text, sys_prompt, limit_chars=limit,
                             effective_cfg=ecfg,
                         )
@@ -748,7 +976,7 @@ def process_one(
             out_text = ensure_section_spacing("".join(out_lines))
             status = "rewritten" if rewritten_any else "copied"
     else:
-        out_text = restructure_to_example(client, base_text, effective_cfg=ecfg)
+        out_text = await restructure_to_example(client, base_text, effective_cfg=ecfg)
         out_text = ensure_section_spacing(normalize_style(out_text))
         status = "rewritten"
 
@@ -759,8 +987,8 @@ def process_one(
 
 def run() -> None:
     ap = argparse.ArgumentParser("summary_limit")
-    ap.add_argument("--input-dir", default=str(Path(DATA_ROOT) / "paper_summary" / "single"))
-    ap.add_argument("--out-root", default=str(Path(DATA_ROOT) / "summary_limit"))
+    ap.add_argument("--input-dir", default=str(_DATA_ROOT_P / "paper_summary" / "single"))
+    ap.add_argument("--out-root", default=str(_DATA_ROOT_P / "summary_limit"))
     ap.add_argument("--date", default="")
     ap.add_argument("--concurrency", type=int, default=summary_limit_concurrency)
     ap.add_argument("--user-id", type=int, default=None, help="User ID for per-user config overrides")
@@ -798,8 +1026,8 @@ def run() -> None:
                 in_dir = in_root
                 date_str = today
 
-    files = list_md_files(in_dir)
-    if not files:
+    entries = list_md_entries(in_dir)
+    if not entries:
         print(f"[SUMMARY_LIMIT] no md files in {in_dir}, skip summary_limit", flush=True)
         return
     print("============开始生成 summary_limit ============", flush=True)
@@ -811,12 +1039,12 @@ def run() -> None:
 
     pdf_info_map = load_pdf_info_map(date_str)
 
-    to_run: List[Path] = []
-    for p in files:
-        out_path = single_dir / f"{p.stem}.md"
-        if out_path.exists():
-            continue
-        to_run.append(p)
+    # 已处理判定：一次列出输出目录，代替逐文件 exists()
+    done_names = {e.name for e in list_md_entries(single_dir)}
+    pending_entries = [e for e in entries if e.name not in done_names]
+    # LPT 调度：按文件大小降序，耗时长的先开始，缩短并发尾部等待
+    pending_entries.sort(key=lambda e: e.stat().st_size, reverse=True)
+    to_run: List[Path] = [Path(e.path) for e in pending_entries]
 
     total = len(to_run)
     if total == 0:
@@ -826,9 +1054,14 @@ def run() -> None:
         return
 
     ecfg = build_effective_cfg(user_id=args.user_id)
-    client = make_client_from_cfg(ecfg)
     workers = max(1, int(args.concurrency or 0))
-    print(f"[SUMMARY_LIMIT] input_dir={in_dir} total={total} concurrency={workers} user_id={args.user_id}", flush=True)
+    # 协程数按上限开满，实际在途请求数由 Throttle 依据 429 / 成功情况自适应调整
+    max_workers = workers * THROTTLE_CEIL_FACTOR
+    client = make_client_from_cfg(ecfg, max_workers)
+    print(
+        f"[SUMMARY_LIMIT] input_dir={in_dir} total={total} concurrency={workers} (max {max_workers}) user_id={args.user_id}",
+        flush=True,
+    )
 
     start = time.monotonic()
     done = 0
@@ -836,28 +1069,38 @@ def run() -> None:
     copied = 0
     rewritten = 0
 
-    with ThreadPoolExecutor(max_workers=workers) as ex:
-        future_map = {
-            ex.submit(process_one, client, p, single_dir / f"{p.stem}.md", pdf_info_map, effective_cfg=ecfg): p
-            for p in to_run
-        }
-        for fut in as_completed(future_map):
-            src = future_map[fut]
-            try:
-                _, status = fut.result()
-                if not status:
-                    empty += 1
-                elif status == "copied":
-                    copied += 1
-                elif status == "rewritten":
-                    rewritten += 1
-            except Exception as e:
-                print(f"\r[SUMMARY_LIMIT] error on {src.name}: {e!r}", end="", flush=True)
-            done += 1
-            elapsed = time.monotonic() - start
-            rate = done / elapsed if elapsed > 0 else 0.0
-            print(f"\r[SUMMARY_LIMIT] progress done={done}/{total} empty={empty} rate={rate:.2f}/s", end="", flush=True)
-
+    async def main() -> None:
+        global _throttle
+        # Condition 须在事件循环内创建
+        _throttle = Throttle(workers, max_workers)
+        # workers 个协程共享同一迭代器逐个取任务：在途请求数有界，不必一次创建全部协程
+        pending = iter(to_run)
+
+        async def worker() -> None:
+            # 单事件循环内计数器与迭代器无需加锁；本地文件读写很快，保持同步
+            nonlocal done, empty, copied, rewritten
+            for src in pending:
+                try:
+                    _, status = await process_one(
+                        client, src, single_dir / f"{src.stem}.md", pdf_info_map, effective_cfg=ecfg
+                    )
+                    if not status:
+                        empty += 1
+                    elif status == "copied":
+                        copied += 1
+                    elif status == "rewritten":
+                        rewritten += 1
+                except Exception as e:
+                    print(f"\r[SUMMARY_LIMIT] error on {src.name}: {e!r}", end="", flush=True)
+                done += 1
+                elapsed = time.monotonic() - start
+                rate = done / elapsed if elapsed > 0 else 0.0
+                print(f"\r[SUMMARY_LIMIT] progress done={done}/{total} empty={empty} rate={rate:.2f}/s", end="", flush=True)
+
+        await asyncio.gather(*[worker() for _ in range(min(max_workers, total))])
+        await client.close()
+
+    asyncio.run(main())
     print()
     gather_path = write_gather(single_dir, gather_dir, date_str)
     print(
@@ -7,21 +7,62 @@ Usage:
     (run from the Sever/ directory)
 """
 
+import functools
+import hashlib
 import json
 import os
 import subprocess
 import sys
 import threading
-from datetime import datetime, timezone
-from typing import Optional
+import time
+from collections import deque, namedtuple
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import MappingProxyType
+from typing import Final, Mapping, Optional
 
 from fastapi import Depends, FastAPI, File, HTTPException, Query, Request, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel, Field
-
-from fastapi.responses import StreamingResponse
 
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # 可选加速依赖，缺失时回落到标准库 json
+    orjson = None
+
+from api_schemas import (
+    AuthCredentialBody,
+    UpdateUserTierBody,
+    UpdateUserRoleBody,
+    RunPipelineBody,
+    ScheduleConfigBody,
+    UserSettingsBody,
+    UserLlmPresetBody,
+    UserPromptPresetBody,
+    SystemConfigBody,
+    LlmConfigBody,
+    ApplyLlmConfigBody,
+    PromptConfigBody,
+    ApplyPromptConfigBody,
+    CreateFolderBody,
+    RenameFolderBody,
+    AddPaperBody,
+    MoveFolderBody,
+    MovePapersBody,
+    CreateNoteBody,
+    UpdateNoteBody,
+    AddLinkBody,
+    ComparePapersBody,
+    DismissPaperBody,
+    RenamePaperBody,
+    SaveCompareResultBody,
+    RenameCompareResultBody,
+    MoveCompareResultBody,
+    CreateAnnotationBody,
+    UpdateAnnotationBody,
+)
 from services import auth_service
 from services import data_service
 from services import kb_service
@@ -32,11 +73,13 @@ from services import llm_config_service
 from services import prompt_config_service
 from services import config_mapper
 from services import user_presets_service
+from services import db_pool
 
 app = FastAPI(
     title="ArxivPaper4 API",
     description="Backend API for ArxivPaper4 paper digest system",
     version="1.0.0",
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse,
 )
 
 
@@ -47,6 +90,12 @@ async def startup_event():
     llm_config_service.init_db()
     prompt_config_service.init_db()
 
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """关闭服务层共享的 SQLite 连接池。"""
+    db_pool.close_all()
+
 # CORS — allow Vue dev server
 app.add_middleware(
     CORSMiddleware,
@@ -80,41 +129,17 @@ if os.path.isdir(_PDFJS_DIR):
 # API Endpoints
 # ---------------------------------------------------------------------------
 
-class AuthCredentialBody(BaseModel):
-    username: str = Field(..., min_length=3, max_length=32)
-    password: str = Field(..., min_length=8, max_length=128)
-
-class UpdateUserTierBody(BaseModel):
-    tier: str = Field(..., pattern="^(free|pro|pro_plus)$")
+_SESSION_COOKIE: Final[str] = auth_service.SESSION_COOKIE_NAME
 
-class UpdateUserRoleBody(BaseModel):
-    role: str = Field(..., pattern="^(user|admin|superadmin)$")
 
-class RunPipelineBody(BaseModel):
-    pipeline: str = Field(default="default")
-    date: Optional[str] = None
-    sllm: Optional[int] = None
-    zo: Optional[str] = Field(default="F", pattern="^[TF]$")
-    user_id: Optional[int] = Field(default=None, description="User ID for per-user config overrides (paper_recommend)")
-    # Arxiv 检索参数（透传给第一步 arxiv_search04.py）
-    days: Optional[int] = Field(default=None, ge=1, le=30, description="时间窗口天数（--days），默认 1 天")
-    categories: Optional[str] = Field(default=None, description="arXiv 分类列表，逗号分隔，如 cs.AI,cs.LG")
-    extra_query: Optional[str] = Field(default=None, description="附加关键词/高级表达式（--query）")
-    max_papers: Optional[int] = Field(default=None, ge=1, le=5000, description="最多获取论文数（--max-papers）")
-    anchor_tz: Optional[str] = Field(default=None, description="锚定时区（--anchor-tz），如 Asia/Shanghai")
-
-class ScheduleConfigBody(BaseModel):
-    enabled: bool
-    hour: int = Field(default=6, ge=0, le=23)
-    minute: int = Field(default=0, ge=0, le=59)
-    pipeline: str = Field(default="daily")
-    sllm: Optional[int] = None
-    zo: Optional[str] = Field(default="F", pattern="^[TF]$")
+def get_session_id(request: Request) -> str:
+    """Session cookie value; FastAPI resolves this once per request for all dependents."""
+    return request.cookies.get(_SESSION_COOKIE, "")
 
 
 def _set_session_cookie(resp: Response, session_id: str) -> None:
     resp.set_cookie(
-        key=auth_service.SESSION_COOKIE_NAME,
+        key=_SESSION_COOKIE,
         value=session_id,
         httponly=True,
         samesite="lax",
@@ -125,29 +150,42 @@ def _set_session_cookie(resp: Response, session_id: str) -> None:
 
 
 def _clear_session_cookie(resp: Response) -> None:
-    resp.delete_cookie(key=auth_service.SESSION_COOKIE_NAME, path="/")
+    resp.delete_cookie(key=_SESSION_COOKIE, path="/")
 
 
-def _get_optional_user(request: Request) -> Optional[dict]:
-    session_id = request.cookies.get(auth_service.SESSION_COOKIE_NAME, "")
+def _get_optional_user(session_id: str = Depends(get_session_id)) -> Optional[dict]:
     return auth_service.get_user_by_session(session_id)
 
 
-def _tier_quota_limit(user: Optional[dict]) -> Optional[int]:
+# tier -> daily paper quota (None = unlimited); unknown tiers get the free quota
+_TIER_QUOTA: Final[dict[str, Optional[int]]] = {"free": 3, "pro": 15, "pro_plus": None}
+_ANONYMOUS_TIER_INFO: Final[tuple[Optional[int], str]] = (3, "anonymous")
+
+
+def _tier_info(user: Optional[dict]) -> tuple[Optional[int], str]:
+    """(quota_limit, tier label) for the current user."""
     if not user:
-        return 3
+        return _ANONYMOUS_TIER_INFO
     tier = user.get("tier", "free")
-    if tier == "pro":
-        return 15
-    if tier == "pro_plus":
-        return None
-    return 3
+    return _TIER_QUOTA.get(tier, 3), tier
 
 
-def _tier_label(user: Optional[dict]) -> str:
-    if not user:
-        return "anonymous"
-    return user.get("tier", "free")
+def _etag(*parts) -> str:
+    """Weak ETag over the inputs that determine a response body."""
+    digest = hashlib.sha1("|".join(map(str, parts)).encode("utf-8")).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _check_not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Return a 304 if the client's If-None-Match matches, else tag ``response``."""
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    inm = request.headers.get("if-none-match")
+    if inm:
+        tags = {t.strip().removeprefix("W/") for t in inm.split(",")}
+        if "*" in tags or etag.removeprefix("W/") in tags:
+            return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
 
 
 @app.post("/api/auth/register", summary="Register")
@@ -173,19 +211,16 @@ def api_auth_login(body: AuthCredentialBody, request: Request, response: Respons
 
 
 @app.post("/api/auth/logout", summary="Logout")
-def api_auth_logout(request: Request, response: Response):
+def api_auth_logout(response: Response, session_id: str = Depends(get_session_id)):
     """Logout and clear session cookie."""
-    session_id = request.cookies.get(auth_service.SESSION_COOKIE_NAME, "")
     auth_service.delete_session(session_id)
     _clear_session_cookie(response)
     return {"ok": True}
 
 
 @app.get("/api/auth/me", summary="Current user")
-def api_auth_me(request: Request):
+def api_auth_me(user: Optional[dict] = Depends(_get_optional_user)):
     """Return current authenticated user if session exists."""
-    session_id = request.cookies.get(auth_service.SESSION_COOKIE_NAME, "")
-    user = auth_service.get_user_by_session(session_id)
     return {"authenticated": user is not None, "user": user}
 
 
@@ -193,10 +228,6 @@ def api_auth_me(request: Request):
 # User Settings
 # ---------------------------------------------------------------------------
 
-class UserSettingsBody(BaseModel):
-    settings: dict
-
-
 @app.get("/api/user/settings/{feature}", summary="Get user settings for a feature")
 def api_get_user_settings(feature: str, _user=Depends(auth_service.require_user)):
     """Return merged settings (user overrides + defaults) for the given feature."""
@@ -217,17 +248,6 @@ def api_save_user_settings(feature: str, body: UserSettingsBody, _user=Depends(a
 # User LLM Presets
 # ---------------------------------------------------------------------------
 
-class UserLlmPresetBody(BaseModel):
-    name: str = Field(..., min_length=1, max_length=64)
-    base_url: str = ""
-    api_key: str = ""
-    model: str = ""
-    max_tokens: Optional[int] = None
-    temperature: Optional[float] = None
-    input_hard_limit: Optional[int] = None
-    input_safety_margin: Optional[int] = None
-
-
 @app.get("/api/user/llm-presets", summary="List user LLM presets")
 def api_user_list_llm_presets(_user=Depends(auth_service.require_user)):
     presets = user_presets_service.list_llm_presets(_user["id"])
@@ -260,11 +280,6 @@ def api_user_delete_llm_preset(preset_id: int, _user=Depends(auth_service.requir
 # User Prompt Presets
 # ---------------------------------------------------------------------------
 
-class UserPromptPresetBody(BaseModel):
-    name: str = Field(..., min_length=1, max_length=64)
-    prompt_content: str = ""
-
-
 @app.get("/api/user/prompt-presets", summary="List user prompt presets")
 def api_user_list_prompt_presets(_user=Depends(auth_service.require_user)):
     presets = user_presets_service.list_prompt_presets(_user["id"])
@@ -337,13 +352,16 @@ def api_admin_update_user_role(
 
 _SEVER_DIR = os.path.dirname(os.path.abspath(__file__))
 _APP_PY_PATH = os.path.join(_SEVER_DIR, "app.py")
-_SCHEDULE_CONFIG_PATH = os.path.join(_SEVER_DIR, "database", "schedule_config.json")
+_SCHEDULE_CONFIG_FILE = Path(_SEVER_DIR) / "database" / "schedule_config.json"
+# Environment for pipeline subprocesses, snapshotted once at import
+_BASE_ENV: Mapping[str, str] = MappingProxyType({**os.environ, "PYTHONIOENCODING": "utf-8"})
 
 # In-memory pipeline run state
 _pipeline_state: dict = {
     "running": False,
     "current_step": None,
-    "logs": [],
+    "logs": deque(maxlen=500),  # keep last 500 lines
+    "log_seq": 0,  # total lines ever appended; SSE cursor
     "started_at": None,
     "finished_at": None,
     "exit_code": None,
@@ -352,6 +370,13 @@ _pipeline_state: dict = {
 }
 _pipeline_lock = threading.Lock()
 
+PipelineSnapshot = namedtuple(
+    "PipelineSnapshot", "running current_step logs started_at finished_at exit_code params",
+)
+# Notified (under _pipeline_lock) whenever the log buffer or run state changes
+_log_cond = threading.Condition(_pipeline_lock)
+_LOG_STREAM_KEEPALIVE = 15.0
+
 # Scheduler state
 _scheduler_state: dict = {
     "enabled": False,
@@ -364,24 +389,45 @@ _scheduler_state: dict = {
 }
 _scheduler_thread: Optional[threading.Thread] = None
 _scheduler_stop_event = threading.Event()
+# Set on config change (or stop) so the scheduler recomputes its next wake-up
+_scheduler_wake_event = threading.Event()
+_SCHEDULER_MAX_SLEEP = 3600.0
+
+
+@functools.lru_cache(maxsize=1)
+def _load_schedule_config_cached(mtime_ns: int) -> dict:
+    # Parse/read errors propagate so a failed read is never cached for this mtime
+    data = _SCHEDULE_CONFIG_FILE.read_bytes()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
 
 
 def _load_schedule_config() -> dict:
-    """Load schedule config from disk."""
-    if os.path.isfile(_SCHEDULE_CONFIG_PATH):
-        try:
-            with open(_SCHEDULE_CONFIG_PATH, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, OSError):
-            pass
-    return {}
+    """Load schedule config from disk (parsed once per file mtime)."""
+    try:
+        mtime_ns = _SCHEDULE_CONFIG_FILE.stat().st_mtime_ns
+        return dict(_load_schedule_config_cached(mtime_ns))
+    except (ValueError, OSError):
+        return {}
 
 
 def _save_schedule_config(cfg: dict) -> None:
     """Save schedule config to disk."""
-    os.makedirs(os.path.dirname(_SCHEDULE_CONFIG_PATH), exist_ok=True)
-    with open(_SCHEDULE_CONFIG_PATH, "w", encoding="utf-8") as f:
-        json.dump(cfg, f, ensure_ascii=False, indent=2)
+    _SCHEDULE_CONFIG_FILE.parent.mkdir(parents=True, exist_ok=True)
+    if orjson is not None:
+        data = orjson.dumps(cfg, option=orjson.OPT_INDENT_2)
+    else:
+        data = json.dumps(cfg, ensure_ascii=False, indent=2).encode("utf-8")
+    # Write-then-rename so readers never see a partially written file
+    tmp_path = _SCHEDULE_CONFIG_FILE.with_suffix(".json.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, _SCHEDULE_CONFIG_FILE)
+
+
+def _append_log_locked(line: str) -> None:
+    """Append a log line; caller holds _pipeline_lock."""
+    _pipeline_state["logs"].append(line)
+    _pipeline_state["log_seq"] += 1
+    _log_cond.notify_all()
 
 
 def _run_pipeline_thread(
@@ -415,16 +461,18 @@ def _run_pipeline_thread(
     if anchor_tz:
         cmd.extend(["--anchor-tz", anchor_tz])
 
-    env = {**os.environ, "RUN_DATE": date_str, "PYTHONIOENCODING": "utf-8"}
+    overrides = {"RUN_DATE": date_str}
     if sllm is not None:
-        env["SLLM"] = str(sllm)
+        overrides["SLLM"] = str(sllm)
     if user_id is not None:
-        env["PIPELINE_USER_ID"] = str(user_id)
+        overrides["PIPELINE_USER_ID"] = str(user_id)
+    env = {**_BASE_ENV, **overrides}
 
     with _pipeline_lock:
         _pipeline_state["running"] = True
         _pipeline_state["current_step"] = "启动中..."
-        _pipeline_state["logs"] = [f"[{datetime.now().strftime('%H:%M:%S')}] 启动 Pipeline: {pipeline}  日期: {date_str}"]
+        _pipeline_state["logs"].clear()
+        _append_log_locked(f"[{datetime.now().strftime('%H:%M:%S')}] 启动 Pipeline: {pipeline}  日期: {date_str}")
         _pipeline_state["started_at"] = datetime.now(timezone.utc).isoformat()
         _pipeline_state["finished_at"] = None
         _pipeline_state["exit_code"] = None
@@ -459,10 +507,17 @@ def _run_pipeline_thread(
             """Return True if s looks like an in-place progress update."""
             return " progress done=" in s or "[PROGRESS] " in s
 
+        # Timestamp prefix only changes once per second; reformat it lazily
+        last_ts_sec = 0
+        last_ts_str = ""
         for line in proc.stdout:
             line = line.rstrip("\n")
+            now_s = int(time.time())
+            if now_s != last_ts_sec:
+                last_ts_sec = now_s
+                last_ts_str = time.strftime("%H:%M:%S", time.localtime(now_s))
+            log_line = f"[{last_ts_str}] {line}"
             with _pipeline_lock:
-                log_line = f"[{datetime.now().strftime('%H:%M:%S')}] {line}"
                 # If both the current line and the last logged line are progress
                 # updates, replace the last entry instead of appending, so the
                 # log stays compact (mirrors \r in-place terminal behaviour).
@@ -472,11 +527,9 @@ def _run_pipeline_thread(
                     and _is_progress_line(_pipeline_state["logs"][-1])
                 ):
                     _pipeline_state["logs"][-1] = log_line
+                    _log_cond.notify_all()
                 else:
-                    _pipeline_state["logs"].append(log_line)
-                # Keep last 500 lines
-                if len(_pipeline_state["logs"]) > 500:
-                    _pipeline_state["logs"] = _pipeline_state["logs"][-500:]
+                    _append_log_locked(log_line)
                 # Detect current step from output
                 if line.startswith("RUN step:"):
                     _pipeline_state["current_step"] = line.replace("RUN step:", "").strip()
@@ -488,7 +541,7 @@ def _run_pipeline_thread(
     except Exception as exc:
         exit_code = -1
         with _pipeline_lock:
-            _pipeline_state["logs"].append(f"[ERROR] {exc}")
+            _append_log_locked(f"[ERROR] {exc}")
     finally:
         with _pipeline_lock:
             _pipeline_state["running"] = False
@@ -496,35 +549,50 @@ def _run_pipeline_thread(
             _pipeline_state["exit_code"] = exit_code
             _pipeline_state["current_step"] = "已完成" if exit_code == 0 else f"异常退出 (code={exit_code})"
             _pipeline_state["process"] = None
+            _log_cond.notify_all()
+
+
+def _next_run_datetime(cfg: dict, now: datetime) -> datetime:
+    """Next local time the daily schedule should fire, skipping a day already run."""
+    target = now.replace(hour=cfg.get("hour", 6), minute=cfg.get("minute", 0), second=0, microsecond=0)
+    if target <= now - timedelta(minutes=1) or cfg.get("last_run_date") == target.date().isoformat():
+        target += timedelta(days=1)
+    return target
 
 
 def _scheduler_loop():
     """Background thread that triggers daily pipeline runs."""
     while not _scheduler_stop_event.is_set():
-        now = datetime.now()
         cfg = _scheduler_state
-        if (
-            cfg.get("enabled")
-            and now.hour == cfg.get("hour", 6)
-            and now.minute == cfg.get("minute", 0)
-            and cfg.get("last_run_date") != now.date().isoformat()
-        ):
-            # Time to run!
-            with _pipeline_lock:
-                if _pipeline_state["running"]:
-                    # Already running, skip
-                    pass
-                else:
-                    date_str = now.date().isoformat()
-                    cfg["last_run_date"] = date_str
-                    t = threading.Thread(
-                        target=_run_pipeline_thread,
-                        args=(cfg.get("pipeline", "daily"), date_str, cfg.get("sllm"), cfg.get("zo", "F")),
-                        daemon=True,
-                    )
-                    t.start()
-        # Sleep 30 seconds before checking again
-        _scheduler_stop_event.wait(30)
+        if not cfg.get("enabled"):
+            # Disabled: sleep until a config change wakes us
+            _scheduler_wake_event.wait()
+            _scheduler_wake_event.clear()
+            continue
+        target = _next_run_datetime(cfg, datetime.now())
+        delay = (target - datetime.now()).total_seconds()
+        # Capped so wall-clock jumps (DST, NTP) are picked up within the hour
+        if _scheduler_wake_event.wait(min(max(delay, 0.0), _SCHEDULER_MAX_SLEEP)):
+            _scheduler_wake_event.clear()
+            continue  # stop requested or config changed: recompute
+        if datetime.now() < target - timedelta(seconds=1):
+            continue
+        # Time to run!
+        with _pipeline_lock:
+            busy = _pipeline_state["running"]
+            if not busy:
+                date_str = target.date().isoformat()
+                cfg["last_run_date"] = date_str
+                t = threading.Thread(
+                    target=_run_pipeline_thread,
+                    args=(cfg.get("pipeline", "daily"), date_str, cfg.get("sllm"), cfg.get("zo", "F")),
+                    daemon=True,
+                )
+                t.start()
+        if busy:
+            # Already running: retry within the scheduled minute, as before
+            _scheduler_wake_event.wait(30)
+            _scheduler_wake_event.clear()
 
 
 def _start_scheduler():
@@ -580,19 +648,93 @@ def api_admin_run_pipeline(
 
 @app.get("/api/admin/pipeline/status", summary="Get pipeline run status")
 def api_admin_pipeline_run_status(
+    response: Response,
     _admin=Depends(auth_service.require_admin_user),
 ):
     """Get current pipeline execution status and logs."""
+    response.headers["Cache-Control"] = "no-store"
     with _pipeline_lock:
-        return {
-            "running": _pipeline_state["running"],
-            "current_step": _pipeline_state["current_step"],
-            "logs": list(_pipeline_state["logs"]),
-            "started_at": _pipeline_state["started_at"],
-            "finished_at": _pipeline_state["finished_at"],
-            "exit_code": _pipeline_state["exit_code"],
-            "params": _pipeline_state["params"],
-        }
+        # Keep the critical section to field reads + one C-level deque copy
+        snap = PipelineSnapshot(
+            _pipeline_state["running"],
+            _pipeline_state["current_step"],
+            tuple(_pipeline_state["logs"]),
+            _pipeline_state["started_at"],
+            _pipeline_state["finished_at"],
+            _pipeline_state["exit_code"],
+            _pipeline_state["params"],
+        )
+    return snap._asdict()
+
+
+def _pipeline_log_events(cursor: int):
+    """
+    Yield SSE events for log lines with seq >= cursor, then follow new ones.
+
+    ``id`` carries the next seq so EventSource reconnects resume via
+    Last-Event-ID; ``event: replace`` rewrites the last sent line (in-place
+    progress updates); ``data: [DONE]`` is sent once no pipeline is running.
+    """
+    last_sent: Optional[str] = None
+    while True:
+        with _log_cond:
+            def _pending() -> bool:
+                logs = _pipeline_state["logs"]
+                if _pipeline_state["log_seq"] != cursor or not _pipeline_state["running"]:
+                    return True
+                return last_sent is not None and bool(logs) and logs[-1] != last_sent
+
+            _log_cond.wait_for(_pending, timeout=_LOG_STREAM_KEEPALIVE)
+            logs = _pipeline_state["logs"]
+            seq = _pipeline_state["log_seq"]
+            first = seq - len(logs)
+            if cursor > seq:
+                # Stale cursor (server restarted): replay the whole buffer
+                cursor = first
+                last_sent = None
+            replaced = None
+            if last_sent is not None and first < cursor <= seq:
+                prev = logs[cursor - 1 - first]
+                if prev != last_sent:
+                    replaced = prev
+            new_lines = list(logs)[max(cursor, first) - first:]
+            running = _pipeline_state["running"]
+
+        if replaced is not None:
+            last_sent = replaced
+            yield f"event: replace\ndata: {json.dumps(replaced, ensure_ascii=False)}\n\n"
+        for line in new_lines:
+            last_sent = line
+            yield f"data: {json.dumps(line, ensure_ascii=False)}\n\n"
+        if new_lines:
+            cursor = seq
+            yield f"id: {seq}\n\n"
+        if not running:
+            yield "data: [DONE]\n\n"
+            return
+        if replaced is None and not new_lines:
+            yield ": keepalive\n\n"
+
+
+@app.get("/api/admin/pipeline/logs/stream", summary="Stream pipeline logs (SSE)")
+def api_admin_pipeline_log_stream(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="Resume from this log seq"),
+    _admin=Depends(auth_service.require_admin_user),
+):
+    """Push pipeline log lines as they are produced instead of re-polling the status endpoint."""
+    cursor = since
+    if cursor is None:
+        last_id = request.headers.get("last-event-id", "")
+        cursor = int(last_id) if last_id.isdigit() else 0
+    return StreamingResponse(
+        _pipeline_log_events(cursor),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
 
 
 @app.post("/api/admin/pipeline/stop", summary="Stop running pipeline")
@@ -652,6 +794,7 @@ def api_admin_update_schedule(
 
     if body.enabled:
         _start_scheduler()
+    _scheduler_wake_event.set()
 
     return {"ok": True, "schedule": {
         "enabled": body.enabled,
@@ -667,10 +810,6 @@ def api_admin_update_schedule(
 # System Config Management
 # ---------------------------------------------------------------------------
 
-class SystemConfigBody(BaseModel):
-    config: dict = Field(..., description="配置项字典")
-
-
 @app.get("/api/admin/config", summary="Get system configuration")
 def api_admin_get_config(
     _admin=Depends(auth_service.require_admin_user),
@@ -714,27 +853,6 @@ def api_admin_reset_config(
 # LLM Config Management
 # ---------------------------------------------------------------------------
 
-class LlmConfigBody(BaseModel):
-    name: str = Field(..., description="配置名称")
-    remark: Optional[str] = Field(None, description="备注")
-    base_url: str = Field(..., description="API基础地址")
-    api_key: str = Field(..., description="API密钥")
-    model: str = Field(..., description="模型名称")
-    max_tokens: Optional[int] = None
-    temperature: Optional[float] = None
-    concurrency: Optional[int] = None
-    input_hard_limit: Optional[int] = None
-    input_safety_margin: Optional[int] = None
-    endpoint: Optional[str] = None
-    completion_window: Optional[str] = None
-    out_root: Optional[str] = None
-    jsonl_root: Optional[str] = None
-
-
-class ApplyLlmConfigBody(BaseModel):
-    usage_prefix: str = Field(..., description="使用前缀（如 theme_select, org, summary 等）")
-
-
 @app.get("/api/admin/llm-configs", summary="Get all LLM configs")
 def api_admin_list_llm_configs(
     _admin=Depends(auth_service.require_admin_user),
@@ -836,16 +954,6 @@ def api_admin_apply_llm_config(
 # Prompt Config Management
 # ---------------------------------------------------------------------------
 
-class PromptConfigBody(BaseModel):
-    name: str = Field(..., description="配置名称")
-    remark: Optional[str] = Field(None, description="备注")
-    prompt_content: str = Field(..., description="提示词内容")
-
-
-class ApplyPromptConfigBody(BaseModel):
-    variable_name: str = Field(..., description="目标变量名（如 theme_select_system_prompt, system_prompt 等）")
-
-
 @app.get("/api/admin/prompt-configs", summary="Get all prompt configs")
 def api_admin_list_prompt_configs(
     _admin=Depends(auth_service.require_admin_user),
@@ -944,32 +1052,40 @@ def api_admin_apply_prompt_config(
 
 
 @app.get("/api/dates", summary="List available dates")
-def api_list_dates():
+def api_list_dates(request: Request, response: Response):
     """Return all dates that have paper summary data available."""
+    not_modified = _check_not_modified(request, response, _etag("dates", data_service.get_dates_version()))
+    if not_modified is not None:
+        return not_modified
     dates = data_service.list_dates()
     return {"dates": dates}
 
 
 @app.get("/api/papers", summary="List papers for a date")
 def api_list_papers(
+    request: Request,
+    response: Response,
     date: str = Query(..., description="Date in YYYY-MM-DD format"),
     search: str = Query(None, description="Search in title / paper_id / institution"),
     institution: str = Query(None, description="Filter by institution name"),
     user: Optional[dict] = Depends(_get_optional_user),
 ):
     """Get all papers for a given date, with optional search and filter."""
-    papers = data_service.get_papers_by_date(date, search=search, institution=institution)
-    total_available = len(papers)
-    quota_limit = _tier_quota_limit(user)
-    if quota_limit is not None:
-        papers = papers[:quota_limit]
+    quota_limit, tier = _tier_info(user)
+    etag = _etag("papers", date, data_service.get_date_version(date), search, institution, quota_limit, tier)
+    not_modified = _check_not_modified(request, response, etag)
+    if not_modified is not None:
+        return not_modified
+    papers, total_available = data_service.get_papers_page(
+        date, limit=quota_limit, search=search, institution=institution,
+    )
     return {
         "date": date,
         "count": len(papers),
         "papers": papers,
         "total_available": total_available,
         "quota_limit": quota_limit,
-        "tier": _tier_label(user),
+        "tier": tier,
     }
 
 
@@ -985,32 +1101,25 @@ def api_paper_detail(paper_id: str):
 @app.get("/api/digest/{date}", summary="Daily digest")
 def api_daily_digest(
     date: str,
+    request: Request,
+    response: Response,
     user: Optional[dict] = Depends(_get_optional_user),
 ):
     """Get daily digest: paper count, institution distribution, all papers."""
-    digest = data_service.get_daily_digest(date)
-    papers = digest.get("papers", [])
+    quota_limit, tier = _tier_info(user)
+    user_id = user["id"] if user else None
+    kb_version = kb_service.get_kb_version(user_id) if user else 0
+    etag = _etag("digest", date, data_service.get_date_version(date), user_id, kb_version, quota_limit, tier)
+    not_modified = _check_not_modified(request, response, etag)
+    if not_modified is not None:
+        return not_modified
 
     # Filter out papers already in KB or dismissed by the current user
-    kb_ids: set[str] = set()
-    dismissed_ids: set[str] = set()
-    if user:
-        kb_ids = kb_service.get_kb_paper_ids(user["id"])
-        dismissed_ids = kb_service.get_dismissed_paper_ids(user["id"])
-    exclude_ids = kb_ids | dismissed_ids
-    if exclude_ids:
-        papers = [p for p in papers if p.get("paper_id") not in exclude_ids]
-
-    total_available = len(papers)
-    quota_limit = _tier_quota_limit(user)
-    if quota_limit is not None:
-        digest["papers"] = papers[:quota_limit]
-    else:
-        digest["papers"] = papers
-    digest["total_available"] = total_available
+    exclude_ids = kb_service.get_excluded_paper_ids(user["id"]) if user else None
+    digest = data_service.get_daily_digest(date, exclude_ids=exclude_ids, limit=quota_limit)
     digest["total_papers"] = len(digest["papers"])
     digest["quota_limit"] = quota_limit
-    digest["tier"] = _tier_label(user)
+    digest["tier"] = tier
     return digest
 
 
@@ -1027,34 +1136,18 @@ def api_pipeline_status(
 # Knowledge Base Endpoints
 # ---------------------------------------------------------------------------
 
-class CreateFolderBody(BaseModel):
-    name: str
-    parent_id: Optional[int] = None
-    scope: str = "kb"
-
-class RenameFolderBody(BaseModel):
-    name: str
-    scope: str = "kb"
-
-class AddPaperBody(BaseModel):
-    paper_id: str
-    paper_data: dict
-    folder_id: Optional[int] = None
-    scope: str = "kb"
-
-class MoveFolderBody(BaseModel):
-    target_parent_id: Optional[int] = None
-    scope: str = "kb"
-
-class MovePapersBody(BaseModel):
-    paper_ids: list[str]
-    target_folder_id: Optional[int] = None
-    scope: str = "kb"
-
-
 @app.get("/api/kb/tree", summary="Get knowledge base tree")
-def api_kb_tree(scope: str = Query("kb"), _user=Depends(auth_service.require_user)):
+def api_kb_tree(
+    request: Request,
+    response: Response,
+    scope: str = Query("kb"),
+    _user=Depends(auth_service.require_user),
+):
     """Return full knowledge base tree: folders (nested) + root-level papers."""
+    etag = _etag("kb_tree", _user["id"], scope, kb_service.get_kb_version(_user["id"]))
+    not_modified = _check_not_modified(request, response, etag)
+    if not_modified is not None:
+        return not_modified
     return kb_service.get_tree(_user["id"], scope=scope)
 
 
@@ -1124,21 +1217,6 @@ def api_kb_move_papers(body: MovePapersBody, _user=Depends(auth_service.require_
 # Note / File Endpoints
 # ---------------------------------------------------------------------------
 
-class CreateNoteBody(BaseModel):
-    title: str = "未命名笔记"
-    content: str = ""
-    scope: str = "kb"
-
-class UpdateNoteBody(BaseModel):
-    title: Optional[str] = None
-    content: Optional[str] = None
-
-class AddLinkBody(BaseModel):
-    title: str
-    url: str
-    scope: str = "kb"
-
-
 @app.get("/api/kb/papers/{paper_id}/notes", summary="List notes for a paper")
 def api_kb_list_notes(paper_id: str, scope: str = Query("kb"), _user=Depends(auth_service.require_user)):
     """Return all notes / files attached to a paper."""
@@ -1183,7 +1261,7 @@ def api_kb_delete_note(note_id: int, _user=Depends(auth_service.require_user)):
 
 
 @app.post("/api/kb/papers/{paper_id}/notes/upload", summary="Upload file")
-async def api_kb_upload_file(
+def api_kb_upload_file(
     paper_id: str,
     scope: str = Query("kb"),
     file: UploadFile = File(...),
@@ -1192,9 +1270,9 @@ async def api_kb_upload_file(
     """Upload a file and attach it to a paper."""
     if not kb_service.is_paper_in_kb(_user["id"], paper_id, scope=scope):
         raise HTTPException(status_code=404, detail="Paper not in knowledge base")
-    file_bytes = await file.read()
     mime = file.content_type or "application/octet-stream"
-    note = kb_service.add_note_file(_user["id"], paper_id, file.filename or "upload", file_bytes, mime, scope=scope)
+    # Sync endpoint (threadpool): copy the spooled upload to disk chunk by chunk
+    note = kb_service.add_note_file(_user["id"], paper_id, file.filename or "upload", file.file, mime, scope=scope)
     return note
 
 
@@ -1211,11 +1289,6 @@ def api_kb_add_link(paper_id: str, body: AddLinkBody, _user=Depends(auth_service
 # Dismiss paper (not interested)
 # ---------------------------------------------------------------------------
 
-class ComparePapersBody(BaseModel):
-    paper_ids: list[str] = Field(..., min_length=2, max_length=5)
-    scope: str = "kb"
-
-
 @app.post("/api/kb/compare", summary="Compare papers via LLM (SSE)")
 def api_kb_compare(body: ComparePapersBody, _user=Depends(auth_service.require_user)):
     """Stream a comparative analysis of 2-5 KB papers using an LLM."""
@@ -1229,10 +1302,6 @@ def api_kb_compare(body: ComparePapersBody, _user=Depends(auth_service.require_u
     )
 
 
-class DismissPaperBody(BaseModel):
-    paper_id: str
-
-
 @app.post("/api/kb/dismiss", summary="Dismiss paper")
 def api_kb_dismiss_paper(body: DismissPaperBody, user=Depends(auth_service.require_user)):
     """Record that the current user is not interested in a paper."""
@@ -1244,11 +1313,6 @@ def api_kb_dismiss_paper(body: DismissPaperBody, user=Depends(auth_service.requi
 # Paper rename
 # ---------------------------------------------------------------------------
 
-class RenamePaperBody(BaseModel):
-    title: str
-    scope: str = "kb"
-
-
 @app.patch("/api/kb/papers/{paper_id}/rename", summary="Rename paper")
 def api_kb_rename_paper(paper_id: str, body: RenamePaperBody, _user=Depends(auth_service.require_user)):
     """Rename a paper's display title (short_title)."""
@@ -1262,21 +1326,6 @@ def api_kb_rename_paper(paper_id: str, body: RenamePaperBody, _user=Depends(auth
 # Compare Results Endpoints
 # ---------------------------------------------------------------------------
 
-class SaveCompareResultBody(BaseModel):
-    title: str
-    markdown: str
-    paper_ids: list[str]
-    folder_id: Optional[int] = None
-
-
-class RenameCompareResultBody(BaseModel):
-    title: str
-
-
-class MoveCompareResultBody(BaseModel):
-    target_folder_id: Optional[int] = None
-
-
 @app.get("/api/kb/compare-results/tree", summary="Get compare results tree")
 def api_kb_compare_results_tree(_user=Depends(auth_service.require_user)):
     """Return the full compare results tree: folders + results."""
@@ -1332,19 +1381,6 @@ def api_kb_delete_compare_result(result_id: int, _user=Depends(auth_service.requ
 # Annotation Endpoints (PDF highlights / notes)
 # ---------------------------------------------------------------------------
 
-class CreateAnnotationBody(BaseModel):
-    page: int
-    type: str = "highlight"
-    content: str = ""
-    color: str = "#FFFF00"
-    position_data: str = ""
-    scope: str = "kb"
-
-class UpdateAnnotationBody(BaseModel):
-    content: Optional[str] = None
-    color: Optional[str] = None
-
-
 @app.get("/api/kb/papers/{paper_id}/annotations", summary="List annotations")
 def api_kb_list_annotations(paper_id: str, scope: str = Query("kb"), _user=Depends(auth_service.require_user)):
     """Return all annotations for a paper's PDF."""
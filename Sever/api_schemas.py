@@ -0,0 +1,239 @@
+"""
+Request body schemas for the FastAPI endpoints in api.py.
+"""
+
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+# ---------------------------------------------------------------------------
+# Auth, Users & Pipeline
+# ---------------------------------------------------------------------------
+
+class AuthCredentialBody(BaseModel):
+    username: str = Field(..., min_length=3, max_length=32)
+    password: str = Field(..., min_length=8, max_length=128)
+
+
+class UpdateUserTierBody(BaseModel):
+    tier: str = Field(..., pattern="^(free|pro|pro_plus)$")
+
+
+class UpdateUserRoleBody(BaseModel):
+    role: str = Field(..., pattern="^(user|admin|superadmin)$")
+
+
+class RunPipelineBody(BaseModel):
+    pipeline: str = Field(default="default")
+    date: Optional[str] = None
+    sllm: Optional[int] = None
+    zo: Optional[str] = Field(default="F", pattern="^[TF]$")
+    user_id: Optional[int] = Field(default=None, description="User ID for per-user config overrides (paper_recommend)")
+    # Arxiv 检索参数（透传给第一步 arxiv_search04.py）
+    days: Optional[int] = Field(default=None, ge=1, le=30, description="时间窗口天数（--days），默认 1 天")
+    categories: Optional[str] = Field(default=None, description="arXiv 分类列表，逗号分隔，如 cs.AI,cs.LG")
+    extra_query: Optional[str] = Field(default=None, description="附加关键词/高级表达式（--query）")
+    max_papers: Optional[int] = Field(default=None, ge=1, le=5000, description="最多获取论文数（--max-papers）")
+    anchor_tz: Optional[str] = Field(default=None, description="锚定时区（--anchor-tz），如 Asia/Shanghai")
+
+
+class ScheduleConfigBody(BaseModel):
+    enabled: bool
+    hour: int = Field(default=6, ge=0, le=23)
+    minute: int = Field(default=0, ge=0, le=59)
+    pipeline: str = Field(default="daily")
+    sllm: Optional[int] = None
+    zo: Optional[str] = Field(default="F", pattern="^[TF]$")
+
+
+# ---------------------------------------------------------------------------
+# User Settings
+# ---------------------------------------------------------------------------
+
+class UserSettingsBody(BaseModel):
+    settings: dict
+
+
+# ---------------------------------------------------------------------------
+# User LLM Presets
+# ---------------------------------------------------------------------------
+
+class UserLlmPresetBody(BaseModel):
+    name: str = Field(..., min_length=1, max_length=64)
+    base_url: str = ""
+    api_key: str = ""
+    model: str = ""
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+    input_hard_limit: Optional[int] = None
+    input_safety_margin: Optional[int] = None
+
+
+# ---------------------------------------------------------------------------
+# User Prompt Presets
+# ---------------------------------------------------------------------------
+
+class UserPromptPresetBody(BaseModel):
+    name: str = Field(..., min_length=1, max_length=64)
+    prompt_content: str = ""
+
+
+# ---------------------------------------------------------------------------
+# System Config Management
+# ---------------------------------------------------------------------------
+
+class SystemConfigBody(BaseModel):
+    config: dict = Field(..., description="配置项字典")
+
+
+# ---------------------------------------------------------------------------
+# LLM Config Management
+# ---------------------------------------------------------------------------
+
+class LlmConfigBody(BaseModel):
+    name: str = Field(..., description="配置名称")
+    remark: Optional[str] = Field(None, description="备注")
+    base_url: str = Field(..., description="API基础地址")
+    api_key: str = Field(..., description="API密钥")
+    model: str = Field(..., description="模型名称")
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+    concurrency: Optional[int] = None
+    input_hard_limit: Optional[int] = None
+    input_safety_margin: Optional[int] = None
+    endpoint: Optional[str] = None
+    completion_window: Optional[str] = None
+    out_root: Optional[str] = None
+    jsonl_root: Optional[str] = None
+
+
+class ApplyLlmConfigBody(BaseModel):
+    usage_prefix: str = Field(..., description="使用前缀（如 theme_select, org, summary 等）")
+
+
+# ---------------------------------------------------------------------------
+# Prompt Config Management
+# ---------------------------------------------------------------------------
+
+class PromptConfigBody(BaseModel):
+    name: str = Field(..., description="配置名称")
+    remark: Optional[str] = Field(None, description="备注")
+    prompt_content: str = Field(..., description="提示词内容")
+
+
+class ApplyPromptConfigBody(BaseModel):
+    variable_name: str = Field(..., description="目标变量名（如 theme_select_system_prompt, system_prompt 等）")
+
+
+# ---------------------------------------------------------------------------
+# Knowledge Base Endpoints
+# ---------------------------------------------------------------------------
+
+class CreateFolderBody(BaseModel):
+    name: str
+    parent_id: Optional[int] = None
+    scope: str = "kb"
+
+
+class RenameFolderBody(BaseModel):
+    name: str
+    scope: str = "kb"
+
+
+class AddPaperBody(BaseModel):
+    paper_id: str
+    paper_data: dict
+    folder_id: Optional[int] = None
+    scope: str = "kb"
+
+
+class MoveFolderBody(BaseModel):
+    target_parent_id: Optional[int] = None
+    scope: str = "kb"
+
+
+class MovePapersBody(BaseModel):
+    paper_ids: list[str]
+    target_folder_id: Optional[int] = None
+    scope: str = "kb"
+
+
+# ---------------------------------------------------------------------------
+# Note / File Endpoints
+# ---------------------------------------------------------------------------
+
+class CreateNoteBody(BaseModel):
+    title: str = "未命名笔记"
+    content: str = ""
+    scope: str = "kb"
+
+
+class UpdateNoteBody(BaseModel):
+    title: Optional[str] = None
+    content: Optional[str] = None
+
+
+class AddLinkBody(BaseModel):
+    title: str
+    url: str
+    scope: str = "kb"
+
+
+# ---------------------------------------------------------------------------
+# Dismiss paper (not interested)
+# ---------------------------------------------------------------------------
+
+class ComparePapersBody(BaseModel):
+    paper_ids: list[str] = Field(..., min_length=2, max_length=5)
+    scope: str = "kb"
+
+
+class DismissPaperBody(BaseModel):
+    paper_id: str
+
+
+# ---------------------------------------------------------------------------
+# Paper rename
+# ---------------------------------------------------------------------------
+
+class RenamePaperBody(BaseModel):
+    title: str
+    scope: str = "kb"
+
+
+# ---------------------------------------------------------------------------
+# Compare Results Endpoints
+# ---------------------------------------------------------------------------
+
+class SaveCompareResultBody(BaseModel):
+    title: str
+    markdown: str
+    paper_ids: list[str]
+    folder_id: Optional[int] = None
+
+
+class RenameCompareResultBody(BaseModel):
+    title: str
+
+
+class MoveCompareResultBody(BaseModel):
+    target_folder_id: Optional[int] = None
+
+
+# ---------------------------------------------------------------------------
+# Annotation Endpoints (PDF highlights / notes)
+# ---------------------------------------------------------------------------
+
+class CreateAnnotationBody(BaseModel):
+    page: int
+    type: str = "highlight"
+    content: str = ""
+    color: str = "#FFFF00"
+    position_data: str = ""
+    scope: str = "kb"
+
+
+class UpdateAnnotationBody(BaseModel):
+    content: Optional[str] = None
+    color: Optional[str] = None
@@ -94,6 +94,8 @@ theme_select_model = "qwen-plus"
 theme_select_max_tokens = 16
 theme_select_temperature = 1.0
 theme_select_concurrency = 8
+# [Controller/llm_select_theme.py] 每分钟请求数上限（令牌桶，在发请求前限速；0 表示不限速）
+theme_select_rpm = 0
 
 # [Controller/pdf_info.py] 机构判别模型参数
 org_base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1"
@@ -115,6 +117,12 @@ summary_temperature = 1.0
 summary_input_hard_limit = 129024
 summary_input_safety_margin = 4096
 summary_concurrency = 16
+# [Controller/paper_assets.py] 以 response_format={"type": "json_object"} 请求 blocks（JSON 模式）
+# 后端不支持时设为 False；运行中遇到明确拒绝 response_format 的 400 也会自动关闭并改用普通模式
+summary_json_mode = True
+# [Controller/paper_assets.py] Anthropic 端点（base_url 含 anthropic）：系统提示词附带 cache_control 以命中提示词缓存
+# 默认关闭：许多 OpenAI 兼容网关不接受列表形式的 system content，会直接返回 400
+summary_prompt_cache = False
 
 
 
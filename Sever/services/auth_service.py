@@ -13,11 +13,16 @@ import os
 import re
 import secrets
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from fastapi import HTTPException, Request
 
+from services import db_pool
+
 _BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 _DB_PATH = os.path.join(_BASE_DIR, "database", "paper_analysis.db")
 
@@ -27,17 +32,19 @@ SESSION_TOUCH_HOURS = 24
 PBKDF2_ROUNDS = 200_000
 VALID_TIERS = {"free", "pro", "pro_plus"}
 VALID_ROLES = {"user", "admin", "superadmin"}
+SESSION_CACHE_TTL = 30  # seconds
+SESSION_CACHE_SIZE = 4096
 
 _USERNAME_RE = re.compile(r"^[A-Za-z0-9_.-]{3,32}$")
 
+# session_id -> (cached_at monotonic, expires_at, public user dict)
+_session_cache: "OrderedDict[str, tuple[float, datetime, dict]]" = OrderedDict()
+_session_cache_lock = threading.Lock()
+
 
 def _connect() -> sqlite3.Connection:
-    os.makedirs(os.path.dirname(_DB_PATH), exist_ok=True)
-    conn = sqlite3.connect(_DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
-    conn.execute("PRAGMA foreign_keys=ON")
-    return conn
+    # Pooled long-lived connection; conn.close() hands it back to the pool.
+    return db_pool.get_pool(_DB_PATH).connect()
 
 
 def _now() -> datetime:
@@ -221,9 +228,45 @@ def create_session(
         conn.close()
 
 
+def _session_cache_get(session_id: str) -> Optional[dict]:
+    with _session_cache_lock:
+        entry = _session_cache.get(session_id)
+        if entry is None:
+            return None
+        cached_at, expires_at, user = entry
+        if time.monotonic() - cached_at >= SESSION_CACHE_TTL or expires_at <= _now():
+            del _session_cache[session_id]
+            return None
+        _session_cache.move_to_end(session_id)
+        return dict(user)
+
+
+def _session_cache_put(session_id: str, expires_at: datetime, user: dict) -> None:
+    with _session_cache_lock:
+        _session_cache[session_id] = (time.monotonic(), expires_at, dict(user))
+        _session_cache.move_to_end(session_id)
+        if len(_session_cache) > SESSION_CACHE_SIZE:
+            _session_cache.popitem(last=False)
+
+
+def invalidate_session_cache(session_id: Optional[str] = None, user_id: Optional[int] = None) -> None:
+    """Drop cached session lookups for one session, one user, or everything."""
+    with _session_cache_lock:
+        if session_id is None and user_id is None:
+            _session_cache.clear()
+            return
+        if session_id is not None:
+            _session_cache.pop(session_id, None)
+        if user_id is not None:
+            stale = [sid for sid, (_, _, u) in _session_cache.items() if u["id"] == user_id]
+            for sid in stale:
+                del _session_cache[sid]
+
+
 def delete_session(session_id: str) -> None:
     if not session_id:
         return
+    invalidate_session_cache(session_id=session_id)
     conn = _connect()
     try:
         conn.execute("DELETE FROM auth_sessions WHERE session_id = ?", (session_id,))
@@ -235,6 +278,9 @@ def delete_session(session_id: str) -> None:
 def get_user_by_session(session_id: str, touch: bool = True) -> Optional[dict]:
     if not session_id:
         return None
+    cached = _session_cache_get(session_id)
+    if cached is not None:
+        return cached
     conn = _connect()
     try:
         _cleanup_expired_sessions(conn)
@@ -266,7 +312,9 @@ def get_user_by_session(session_id: str, touch: bool = True) -> Optional[dict]:
                 )
                 conn.commit()
 
-        return _row_user_public(row)
+        user = _row_user_public(row)
+        _session_cache_put(session_id, expires_at, user)
+        return user
     finally:
         conn.close()
 
@@ -320,6 +368,7 @@ def update_user_tier(user_id: int, tier: str) -> Optional[dict]:
             (tier, _now_iso(), user_id),
         )
         conn.commit()
+        invalidate_session_cache(user_id=user_id)
         row = conn.execute("SELECT * FROM auth_users WHERE id = ?", (user_id,)).fetchone()
         if row is None:
             return None
@@ -339,6 +388,7 @@ def update_user_role(user_id: int, role: str) -> Optional[dict]:
             (role, _now_iso(), user_id),
         )
         conn.commit()
+        invalidate_session_cache(user_id=user_id)
         row = conn.execute("SELECT * FROM auth_users WHERE id = ?", (user_id,)).fetchone()
         if row is None:
             return None
@@ -60,6 +60,7 @@ _CONFIG_GROUPS = {
         "theme_select_max_tokens",
         "theme_select_temperature",
         "theme_select_concurrency",
+        "theme_select_rpm",
         "org_base_url",
         "org_model",
         "org_max_tokens",
@@ -72,6 +73,8 @@ _CONFIG_GROUPS = {
         "summary_input_hard_limit",
         "summary_input_safety_margin",
         "summary_concurrency",
+        "summary_json_mode",
+        "summary_prompt_cache",
         "summary_base_url_2",
         "summary_gptgod_apikey",
         "summary_model_2",
@@ -10,6 +10,7 @@ Secondary sources (for relevance scores):
   - data/llm_select_theme/{date}.json → theme_relevant_score
 """
 
+import hashlib
 import json
 import os
 import re
@@ -222,57 +223,117 @@ def list_dates() -> list[str]:
     return dates
 
 
-def get_papers_by_date(
-    date: str,
-    search: Optional[str] = None,
-    institution: Optional[str] = None,
-) -> list[dict]:
-    """
-    Get all papers for a given date from file_collect.
-    Each paper is parsed from {paper_id}_limit.md + pdf_info.json.
-    """
+def _list_paper_dirs(date: str) -> list[tuple[str, str, str]]:
+    """(paper_id, paper_dir, limit_md_path) for every paper of a date, in listing order."""
     fc_date_dir = _get_file_collect_dir(date)
     if not os.path.isdir(fc_date_dir):
         return []
-
-    papers: list[dict] = []
+    out: list[tuple[str, str, str]] = []
     for paper_id in os.listdir(fc_date_dir):
         paper_dir = os.path.join(fc_date_dir, paper_id)
         if not os.path.isdir(paper_dir):
             continue
-
-        # Find and parse _limit.md
         limit_path = _find_limit_md(paper_dir, paper_id)
         if limit_path is None:
             continue
-        md_text = _read_text(limit_path)
-        if md_text is None:
-            continue
+        out.append((paper_id, paper_dir, limit_path))
+    return out
 
-        data = _parse_limit_md(md_text, paper_id)
 
-        # Merge pdf_info.json (institution, is_large, abstract)
-        pdf_info = _read_json(os.path.join(paper_dir, "pdf_info.json"))
-        if pdf_info:
-            # pdf_info.json has the authoritative institution/is_large
-            if pdf_info.get("instution"):
-                data["institution"] = pdf_info["instution"]
-            data["is_large_institution"] = pdf_info.get("is_large", False)
-            data["abstract"] = pdf_info.get("abstract", "")
+def _load_paper(paper_id: str, paper_dir: str, limit_path: str) -> Optional[dict]:
+    """Parse {paper_id}_limit.md and merge pdf_info.json + image list."""
+    md_text = _read_text(limit_path)
+    if md_text is None:
+        return None
 
-        # List images
-        data["images"] = _list_paper_images(paper_dir)
-        data["image_count"] = len(data["images"])
+    data = _parse_limit_md(md_text, paper_id)
 
-        papers.append(data)
+    # Merge pdf_info.json (institution, is_large, abstract)
+    pdf_info = _read_json(os.path.join(paper_dir, "pdf_info.json"))
+    if pdf_info:
+        # pdf_info.json has the authoritative institution/is_large
+        if pdf_info.get("instution"):
+            data["institution"] = pdf_info["instution"]
+        data["is_large_institution"] = pdf_info.get("is_large", False)
+        data["abstract"] = pdf_info.get("abstract", "")
 
-    # Merge theme relevance scores
+    # List images
+    data["images"] = _list_paper_images(paper_dir)
+    data["image_count"] = len(data["images"])
+    return data
+
+
+def _merge_theme_scores(date: str, papers: list[dict]) -> None:
     theme_scores = _load_theme_scores(date)
     if theme_scores:
         for p in papers:
             pid = p.get("paper_id", "")
             p["relevance_score"] = theme_scores.get(pid)
 
+
+def get_dates_version() -> str:
+    """Change token for list_dates(): mtime of the file_collect directory."""
+    try:
+        return str(os.stat(os.path.join(_DATA_ROOT, "file_collect")).st_mtime_ns)
+    except OSError:
+        return "0"
+
+
+def get_date_version(date: str) -> str:
+    """
+    Cheap change token for a date's papers, without parsing anything.
+
+    Hashes the mtimes of every path the paper loader reads: the date and
+    paper directories, the _limit.md that _find_limit_md resolves (exact
+    name or fallback), each pdf_info.json / image dir, and the theme-score
+    file.
+    """
+    h = hashlib.sha1(date.encode("utf-8"))
+
+    def _mtime(path: str) -> None:
+        try:
+            h.update(b"%d;" % os.stat(path).st_mtime_ns)
+        except OSError:
+            h.update(b"-;")
+
+    fc_date_dir = _get_file_collect_dir(date)
+    _mtime(fc_date_dir)
+    _mtime(os.path.join(_DATA_ROOT, "llm_select_theme", f"{date}.json"))
+    if os.path.isdir(fc_date_dir):
+        for paper_id in sorted(os.listdir(fc_date_dir)):
+            paper_dir = os.path.join(fc_date_dir, paper_id)
+            h.update(paper_id.encode("utf-8", errors="ignore"))
+            # Directories without a _limit.md still count: their mtime moves
+            # when one appears, which adds the paper to _list_paper_dirs.
+            _mtime(paper_dir)
+            limit_path = _find_limit_md(paper_dir, paper_id)
+            if limit_path is None:
+                continue
+            h.update(os.path.basename(limit_path).encode("utf-8", errors="ignore"))
+            _mtime(limit_path)
+            _mtime(os.path.join(paper_dir, "pdf_info.json"))
+            _mtime(os.path.join(paper_dir, "image"))
+    return h.hexdigest()
+
+
+def get_papers_by_date(
+    date: str,
+    search: Optional[str] = None,
+    institution: Optional[str] = None,
+) -> list[dict]:
+    """
+    Get all papers for a given date from file_collect.
+    Each paper is parsed from {paper_id}_limit.md + pdf_info.json.
+    """
+    papers: list[dict] = []
+    for paper_id, paper_dir, limit_path in _list_paper_dirs(date):
+        data = _load_paper(paper_id, paper_dir, limit_path)
+        if data is not None:
+            papers.append(data)
+
+    # Merge theme relevance scores
+    _merge_theme_scores(date, papers)
+
     # Apply search filter
     if search:
         q = search.lower()
@@ -295,6 +356,44 @@ def get_papers_by_date(
     return papers
 
 
+def get_papers_page(
+    date: str,
+    exclude_ids: Optional[set[str]] = None,
+    limit: Optional[int] = None,
+    search: Optional[str] = None,
+    institution: Optional[str] = None,
+) -> tuple[list[dict], int]:
+    """
+    Papers for a date minus ``exclude_ids``, truncated to ``limit``.
+
+    Returns ``(papers, total_available)``.  Without search/institution filters
+    only the returned papers are parsed; the total comes from the directory
+    listing alone.
+    """
+    if search or institution:
+        papers = get_papers_by_date(date, search=search, institution=institution)
+        if exclude_ids:
+            papers = [p for p in papers if p.get("paper_id") not in exclude_ids]
+        total = len(papers)
+        return (papers if limit is None else papers[:limit]), total
+
+    entries = _list_paper_dirs(date)
+    if exclude_ids:
+        entries = [e for e in entries if e[0] not in exclude_ids]
+    total = len(entries)
+    papers: list[dict] = []
+    for paper_id, paper_dir, limit_path in entries:
+        if limit is not None and len(papers) >= limit:
+            break
+        data = _load_paper(paper_id, paper_dir, limit_path)
+        if data is None:
+            total -= 1
+            continue
+        papers.append(data)
+    _merge_theme_scores(date, papers)
+    return papers, total
+
+
 def get_paper_detail(paper_id: str) -> Optional[dict]:
     """
     Get full detail for a single paper from file_collect.
@@ -351,9 +450,17 @@ def get_paper_detail(paper_id: str) -> Optional[dict]:
     return None
 
 
-def get_daily_digest(date: str) -> dict:
+def get_daily_digest(
+    date: str,
+    exclude_ids: Optional[set[str]] = None,
+    limit: Optional[int] = None,
+) -> dict:
     """
     Build a daily digest from file_collect data.
+
+    Statistics cover every paper of the date; the returned ``papers`` list
+    drops ``exclude_ids`` and is truncated to ``limit`` (``total_available``
+    is the count after exclusion).
     """
     papers = get_papers_by_date(date)
     total = len(papers)
@@ -378,6 +485,12 @@ def get_daily_digest(date: str) -> dict:
     ]
     avg_score = sum(scores) / len(scores) if scores else None
 
+    if exclude_ids:
+        papers = [p for p in papers if p.get("paper_id") not in exclude_ids]
+    total_available = len(papers)
+    if limit is not None:
+        papers = papers[:limit]
+
     return {
         "date": date,
         "total_papers": total,
@@ -385,6 +498,7 @@ def get_daily_digest(date: str) -> dict:
         "avg_relevance_score": round(avg_score, 3) if avg_score is not None else None,
         "institution_distribution": inst_distribution,
         "papers": papers,
+        "total_available": total_available,
     }
 
 
@@ -0,0 +1,106 @@
+"""
+Bounded pool of long-lived SQLite connections.
+
+Services keep their ``conn = _connect(); try: ... finally: conn.close()``
+pattern unchanged: ``close()`` on a pooled connection hands it back to the
+pool instead of closing the file, so the page cache stays warm and hot
+endpoints (session lookup, KB tree) skip ``sqlite3.connect`` + PRAGMAs on
+every request.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose ``close()`` returns it to its pool."""
+
+    _pool: "SQLitePool | None" = None
+
+    def close(self) -> None:
+        pool = self._pool
+        if pool is None:
+            super().close()
+            return
+        pool._release(self)
+
+
+class SQLitePool:
+    def __init__(self, db_path: str, max_size: int = 20) -> None:
+        self.db_path = db_path
+        self.max_size = max_size
+        self._idle: "queue.LifoQueue[PooledConnection]" = queue.LifoQueue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _open(self) -> PooledConnection:
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, factory=PooledConnection, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn._pool = self
+        return conn
+
+    def connect(self) -> PooledConnection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._open()
+
+    def _release(self, conn: PooledConnection) -> None:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            # A caller (e.g. a migration) may have switched FK enforcement off
+            # and bailed out before restoring it; never pool it that way.
+            conn.execute("PRAGMA foreign_keys=ON")
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._lock:
+            if self._closed:
+                self._discard(conn)
+                return
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                self._discard(conn)
+
+    @staticmethod
+    def _discard(conn: PooledConnection) -> None:
+        conn._pool = None
+        sqlite3.Connection.close(conn)
+
+    def close(self) -> None:
+        """Close every idle connection; connections still checked out close on release."""
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    self._discard(self._idle.get_nowait())
+                except queue.Empty:
+                    break
+
+
+_pools: dict[str, SQLitePool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str, max_size: int = 20) -> SQLitePool:
+    """Process-wide pool per database file, shared by every service using it."""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None or pool._closed:
+            pool = _pools[db_path] = SQLitePool(db_path, max_size=max_size)
+        return pool
+
+
+def close_all() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
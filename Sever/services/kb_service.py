@@ -18,12 +18,15 @@ kb_dismissed_papers  – per-user record of papers the user is not interested in
 kb_annotations       – PDF highlight / annotation storage
 """
 
+import functools
 import json
 import os
 import shutil
 import sqlite3
 from datetime import datetime, timezone
-from typing import Any, Optional
+from typing import Any, BinaryIO, Optional
+
+from services import db_pool
 
 _BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -35,14 +38,12 @@ _FILE_COLLECT_DIR = os.path.join(_BASE_DIR, "data", "file_collect")
 
 _DEFAULT_SCOPE = "kb"
 
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+
 
 def _connect() -> sqlite3.Connection:
-    os.makedirs(os.path.dirname(_DB_PATH), exist_ok=True)
-    conn = sqlite3.connect(_DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
-    conn.execute("PRAGMA foreign_keys=ON")
-    return conn
+    # Pooled long-lived connection; conn.close() hands it back to the pool.
+    return db_pool.get_pool(_DB_PATH).connect()
 
 
 # ---------------------------------------------------------------------------
@@ -115,6 +116,11 @@ def init_db() -> None:
                 updated_at    TEXT    NOT NULL
             );
 
+            CREATE TABLE IF NOT EXISTS kb_versions (
+                user_id INTEGER PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            );
+
             CREATE TABLE IF NOT EXISTS kb_compare_results (
                 id         INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id    INTEGER NOT NULL,
@@ -261,6 +267,40 @@ init_db()
 # Helpers
 # ---------------------------------------------------------------------------
 
+def get_kb_version(user_id: int) -> int:
+    """Per-user counter bumped by every call that changes the KB tree or dismissals."""
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT version FROM kb_versions WHERE user_id = ?", (user_id,)).fetchone()
+        return row["version"] if row else 0
+    finally:
+        conn.close()
+
+
+def _bump_kb_version(user_id: int) -> None:
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT INTO kb_versions (user_id, version) VALUES (?, 1) "
+            "ON CONFLICT(user_id) DO UPDATE SET version = version + 1",
+            (user_id,),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _bumps_kb_version(fn):
+    """Decorator for mutating calls whose first argument is user_id."""
+    @functools.wraps(fn)
+    def wrapper(user_id: int, *args, **kwargs):
+        try:
+            return fn(user_id, *args, **kwargs)
+        finally:
+            _bump_kb_version(user_id)
+    return wrapper
+
+
 def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
@@ -273,6 +313,7 @@ def _row_to_dict(row: sqlite3.Row) -> dict:
 # Folder CRUD
 # ---------------------------------------------------------------------------
 
+@_bumps_kb_version
 def create_folder(user_id: int, name: str, parent_id: Optional[int] = None, scope: str = _DEFAULT_SCOPE) -> dict:
     """Create a new folder. Returns the created folder dict."""
     now = _now_iso()
@@ -297,6 +338,7 @@ def create_folder(user_id: int, name: str, parent_id: Optional[int] = None, scop
         conn.close()
 
 
+@_bumps_kb_version
 def rename_folder(user_id: int, folder_id: int, name: str, scope: str = _DEFAULT_SCOPE) -> Optional[dict]:
     """Rename a folder. Returns updated folder or None if not found."""
     now = _now_iso()
@@ -317,6 +359,7 @@ def rename_folder(user_id: int, folder_id: int, name: str, scope: str = _DEFAULT
         conn.close()
 
 
+@_bumps_kb_version
 def move_folder(user_id: int, folder_id: int, target_parent_id: Optional[int], scope: str = _DEFAULT_SCOPE) -> Optional[dict]:
     """
     Move a folder under a new parent (or to root when target_parent_id is None).
@@ -366,6 +409,7 @@ def move_folder(user_id: int, folder_id: int, target_parent_id: Optional[int], s
         conn.close()
 
 
+@_bumps_kb_version
 def delete_folder(user_id: int, folder_id: int, scope: str = _DEFAULT_SCOPE) -> bool:
     """
     Delete a folder.  Its child folders and papers are re-parented to
@@ -406,6 +450,7 @@ def delete_folder(user_id: int, folder_id: int, scope: str = _DEFAULT_SCOPE) ->
 # Paper CRUD
 # ---------------------------------------------------------------------------
 
+@_bumps_kb_version
 def add_paper(user_id: int, paper_id: str, paper_data: dict, folder_id: Optional[int] = None, scope: str = _DEFAULT_SCOPE) -> dict:
     """
     Add a paper to the user's knowledge base.  If the paper already exists
@@ -452,6 +497,7 @@ def add_paper(user_id: int, paper_id: str, paper_data: dict, folder_id: Optional
         conn.close()
 
 
+@_bumps_kb_version
 def remove_paper(user_id: int, paper_id: str, scope: str = _DEFAULT_SCOPE) -> bool:
     """Remove a paper from the user's knowledge base. Also removes associated
     notes (and their files) and annotations. Returns True if deleted."""
@@ -492,6 +538,7 @@ def remove_paper(user_id: int, paper_id: str, scope: str = _DEFAULT_SCOPE) -> bo
         conn.close()
 
 
+@_bumps_kb_version
 def move_papers(user_id: int, paper_ids: list[str], target_folder_id: Optional[int], scope: str = _DEFAULT_SCOPE) -> int:
     """
     Move one or more papers to a target folder (or root when target_folder_id
@@ -646,6 +693,7 @@ def get_note(user_id: int, note_id: int) -> Optional[dict]:
         conn.close()
 
 
+@_bumps_kb_version
 def create_note(user_id: int, paper_id: str, title: str, content: str = "", scope: str = _DEFAULT_SCOPE) -> dict:
     """Create a new markdown note attached to a paper."""
     now = _now_iso()
@@ -663,6 +711,7 @@ def create_note(user_id: int, paper_id: str, title: str, content: str = "", scop
         conn.close()
 
 
+@_bumps_kb_version
 def update_note(user_id: int, note_id: int, title: Optional[str] = None, content: Optional[str] = None) -> Optional[dict]:
     """Update the title and/or content of a note. Returns updated row or None.
     Note: scope is not needed here since note_id is globally unique."""
@@ -691,6 +740,7 @@ def update_note(user_id: int, note_id: int, title: Optional[str] = None, content
         conn.close()
 
 
+@_bumps_kb_version
 def delete_note(user_id: int, note_id: int) -> bool:
     """Delete a note/file. If it's an uploaded file, also remove from disk.
     Note: scope is not needed here since note_id is globally unique."""
@@ -720,17 +770,21 @@ def delete_note(user_id: int, note_id: int) -> bool:
         conn.close()
 
 
+@_bumps_kb_version
 def add_note_file(
     user_id: int,
     paper_id: str,
     filename: str,
-    file_bytes: bytes,
+    src: BinaryIO,
     mime_type: str,
     scope: str = _DEFAULT_SCOPE,
 ) -> dict:
     """
     Save an uploaded file to disk and create a 'file' note entry.
     Files are stored under  data/kb_files/{user_id}/{paper_id}/{filename}.
+
+    ``src`` is a readable binary file object; it is copied to disk in
+    ``UPLOAD_CHUNK_SIZE`` chunks, never held in memory as a whole.
     """
     paper_dir = os.path.join(_KB_FILES_DIR, str(user_id), paper_id)
     os.makedirs(paper_dir, exist_ok=True)
@@ -739,16 +793,24 @@ def add_note_file(
     base, ext = os.path.splitext(filename)
     dest = os.path.join(paper_dir, filename)
     counter = 1
-    while os.path.exists(dest):
-        filename = f"{base}_{counter}{ext}"
-        dest = os.path.join(paper_dir, filename)
-        counter += 1
+    while True:
+        try:
+            out = open(dest, "xb")
+            break
+        except FileExistsError:
+            filename = f"{base}_{counter}{ext}"
+            dest = os.path.join(paper_dir, filename)
+            counter += 1
 
-    with open(dest, "wb") as f:
-        f.write(file_bytes)
+    try:
+        with out:
+            shutil.copyfileobj(src, out, UPLOAD_CHUNK_SIZE)
+            file_size = out.tell()
+    except BaseException:
+        os.remove(dest)
+        raise
 
     rel_path = f"{user_id}/{paper_id}/{filename}"
-    file_size = len(file_bytes)
     now = _now_iso()
     conn = _connect()
     try:
@@ -764,6 +826,7 @@ def add_note_file(
         conn.close()
 
 
+@_bumps_kb_version
 def add_note_link(user_id: int, paper_id: str, title: str, url: str, scope: str = _DEFAULT_SCOPE) -> dict:
     """Create a 'link' note entry pointing to an external URL."""
     now = _now_iso()
@@ -798,6 +861,7 @@ def get_note_counts_by_paper(user_id: int, scope: str = _DEFAULT_SCOPE) -> dict[
 # Dismissed papers (per-user) — scope-independent
 # ---------------------------------------------------------------------------
 
+@_bumps_kb_version
 def dismiss_paper(user_id: int, paper_id: str) -> bool:
     """Record that a user is not interested in a paper. Returns True on success."""
     now = _now_iso()
@@ -840,6 +904,23 @@ def get_kb_paper_ids(user_id: int, scope: str = _DEFAULT_SCOPE) -> set[str]:
         conn.close()
 
 
+def get_excluded_paper_ids(user_id: int, scope: str = _DEFAULT_SCOPE) -> set[str]:
+    """Paper ids the user has saved in the KB or dismissed, in one query."""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            """
+            SELECT paper_id FROM kb_papers WHERE user_id = ? AND scope = ?
+            UNION
+            SELECT paper_id FROM kb_dismissed_papers WHERE user_id = ?
+            """,
+            (user_id, scope, user_id),
+        ).fetchall()
+        return {r["paper_id"] for r in rows}
+    finally:
+        conn.close()
+
+
 # ---------------------------------------------------------------------------
 # Auto-attach PDF from file_collect
 # ---------------------------------------------------------------------------
@@ -858,6 +939,7 @@ def _find_pdf_in_file_collect(paper_id: str) -> Optional[str]:
     return None
 
 
+@_bumps_kb_version
 def auto_attach_pdf(user_id: int, paper_id: str, scope: str = _DEFAULT_SCOPE) -> Optional[dict]:
     """
     Find the paper's PDF in file_collect and copy it to kb_files/{user_id}/{paper_id}/.
@@ -1004,6 +1086,7 @@ def delete_annotation(user_id: int, annotation_id: int) -> bool:
 # Paper rename
 # ---------------------------------------------------------------------------
 
+@_bumps_kb_version
 def rename_paper(user_id: int, paper_id: str, new_title: str, scope: str = _DEFAULT_SCOPE) -> Optional[dict]:
     """Rename a paper's display title (short_title inside paper_data JSON).
     Returns the updated paper dict or None if not found."""